@@ -2,15 +2,15 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from streamlit_folium import st_folium
 import plotly.express as px
 
 # =============================================================
 # IMPORTS LOCAUX
 # =============================================================
-from constants import eruptions, station_coords
-from data_loader import load_eruption_file
-from mapping import create_station_map
+from constants import eruptions, PLOT_RENDER_MODE
+from data_loader import eruption_stations, load_eruption_file
+from downsample import downsample_frame
+from mapping import show_station_map
 from graphing import show_graphics
 from real_time_update import start_realtime_update, run_realtime_update
 
@@ -73,6 +73,8 @@ if "df_realtime" in st.session_state and not st.session_state.df_realtime.empty:
     df_plot = df_plot[df_plot["station"].isin(stations_valides)]
 
     if not df_plot.empty:
+        # Niveau de la pyramide min/max adapté à la largeur du graphique (pics conservés)
+        df_plot = downsample_frame(df_plot, "time_min", "RSAM", by="station")
         fig_24h = px.line(
             df_plot,
             x="time_min",
@@ -80,7 +82,8 @@ if "df_realtime" in st.session_state and not st.session_state.df_realtime.empty:
             color="station",
             title="RSAM en temps réel — Dernières 24 heures",
             labels={"time_min": "Date/Heure", "RSAM": "RSAM"},
-            height=500
+            height=500,
+            render_mode="webgl" if PLOT_RENDER_MODE == "webgl" else "svg"
         )
         fig_24h.update_traces(line=dict(width=1.8))
         fig_24h.update_layout(
@@ -186,8 +189,8 @@ st.markdown("### Stations sismiques sélectionnées pour l'étude des éruptions
 )
 st.session_state.selected_eruption_map = éruption_carte
 
-carte = create_station_map(éruption_carte)
-st_folium(carte, width="100%", height=530)
+# HTML mis en cache : changer d'éruption ne recharge pas les séries temporelles
+show_station_map(éruption_carte, height=530)
 
 # =============================================================
 # GRAPHIQUES HISTORIQUES
@@ -202,14 +205,18 @@ st.sidebar.subheader("Comparaison des éruptions passées")
     key="selected_eruptions"
 )
 
+# Stations présentes dans les archives (index de présence) : toutes par défaut
+stations_archives = sorted({s for nom in eruptions for s in eruption_stations(nom)})
 stations_historiques = st.sidebar.multiselect(
     "Stations (graphiques historiques)",
-    options=list(station_coords.keys()),
-    default=list(station_coords.keys()),
+    options=stations_archives,
+    default=stations_archives,
     key="stations_historiques"
 )
 
-show_graphics(éruptions_sélectionnées)
+# Sélection complète → moyenne réseau sur toutes les stations du CSV (stations=None)
+show_graphics(éruptions_sélectionnées,
+              None if set(stations_historiques) >= set(stations_archives) else stations_historiques)
 
 # =============================================================
 # PIED DE PAGE
@@ -0,0 +1,176 @@
+# ============================================
+# backtest.py — rejeu des éruptions archivées minute par minute
+# Le modèle (prediction._risk_from_stats) est réévalué à chaque minute à partir
+# d'un état glissant O(1) par ligne, au lieu de recopier et retrier le frame.
+# Usage : python backtest.py [seed]
+# ============================================
+
+import math
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from constants import eruptions
+from prediction import WINDOW_ROWS, RECENT_ROWS, _risk_from_stats
+from rolling import RollingMean
+
+
+class StreamingRisk:
+    """
+    Statistiques de run_model sur les WINDOW_ROWS dernières lignes, tenues à jour
+    ligne par ligne : RSAM courant, moyenne des RECENT_ROWS dernières lignes,
+    moyenne des lignes précédentes de la fenêtre, maximum (file monotone).
+    NaN ignorés comme dans pandas (mean / max).
+    Comme run_model (head(n - 180) avec n < 180 = tout sauf les 180 - n
+    dernières lignes), la moyenne "ancienne" porte sur les 2n - 180 premières
+    lignes tant que la fenêtre compte entre 91 et 179 lignes.
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.current = math.nan
+        self._recent = RollingMean(RECENT_ROWS, 1)
+        self._older = RollingMean(WINDOW_ROWS - RECENT_ROWS, 1)
+        self._delay = deque()   # lignes encore "récentes", en attente de passer dans _older
+        self._max = deque()     # (indice, valeur) décroissants
+        self._first = []        # RECENT_ROWS premières lignes (début de flux)
+        self._head = RollingMean(RECENT_ROWS, 1)
+        self._head_fed = 0
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        i = self.n_rows
+        self.n_rows += 1
+        self.current = value
+
+        self._recent.update(value)
+        if len(self._first) < RECENT_ROWS:
+            self._first.append(value)
+        self._delay.append(value)
+        if len(self._delay) > RECENT_ROWS:
+            self._older.update(self._delay.popleft())
+
+        if value == value:
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((i, value))
+        while self._max and self._max[0][0] <= i - WINDOW_ROWS:
+            self._max.popleft()
+
+    def stats(self) -> tuple:
+        """(n, rsam_current, rsam_recent, rsam_older, rsam_max) comme dans run_model."""
+        n = min(self.n_rows, WINDOW_ROWS)
+        recent = self._recent.value
+        if n > RECENT_ROWS:
+            older = self._older.value
+        elif 2 * n > RECENT_ROWS and n < RECENT_ROWS:
+            while self._head_fed < 2 * n - RECENT_ROWS:
+                self._head.update(self._first[self._head_fed])
+                self._head_fed += 1
+            older = self._head.value
+        else:
+            older = self.current
+        peak = self._max[0][1] if self._max else math.nan
+        return n, self.current, recent, older, peak
+
+    def risk(self, rng=np.random) -> float:
+        return _risk_from_stats(*self.stats(), rng=rng)
+
+
+def replay(df: pd.DataFrame, rng=np.random, time_col: str = "time_min") -> pd.DataFrame:
+    """
+    Rejoue df minute par minute : après les lignes de chaque minute, le risque
+    que run_model donnerait sur toutes les lignes reçues jusque-là.
+    Un seul tri (stable) du frame ; renvoie (time_min, risk).
+    """
+    df = df.sort_values(time_col, kind="stable")
+    times = df[time_col]
+    if isinstance(times.dtype, pd.DatetimeTZDtype):
+        times = times.dt.tz_convert(None)
+    times = times.to_numpy()
+    rsam = df["RSAM"].to_numpy(dtype=float)
+    ends = np.r_[np.flatnonzero(times[1:] != times[:-1]) + 1, len(times)] if len(times) else []
+
+    state = StreamingRisk()
+    risks, start = np.empty(len(ends)), 0
+    for k, end in enumerate(ends):
+        for value in rsam[start:end]:
+            state.add(value)
+        risks[k] = state.risk(rng)
+        start = end
+
+    last_rows = df[time_col].iloc[np.asarray(ends, dtype=np.intp) - 1].reset_index(drop=True)
+    return pd.DataFrame({time_col: last_rows, "risk": risks})
+
+
+def lead_time_metrics(series: pd.DataFrame, eruption_time, threshold: float = 70,
+                      persistence: int = 30, horizon_h: float = 48) -> dict:
+    """
+    Métriques d'alerte d'une série de risque :
+    - alerte = risque >= threshold pendant au moins `persistence` minutes consécutives
+    - lead_time_h : avance de la première alerte débutant dans les horizon_h
+      heures avant l'éruption (NaN si aucune)
+    - false_alarms : alertes terminées avant cet horizon
+    """
+    before = series[series["time_min"] < eruption_time].reset_index(drop=True)
+    above = (before["risk"] >= threshold).to_numpy()
+
+    # Plages consécutives au-dessus du seuil
+    edges = np.diff(np.r_[0, above.astype(np.int8), 0])
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    keep = stops - starts >= persistence
+    starts, stops = starts[keep], stops[keep]
+
+    horizon = eruption_time - pd.Timedelta(hours=horizon_h)
+    in_horizon = [s for s, e in zip(starts, stops) if before["time_min"].iloc[e - 1] >= horizon]
+    onset = before["time_min"].iloc[in_horizon[0]] if in_horizon else None
+
+    last_24h = before[before["time_min"] >= eruption_time - pd.Timedelta(hours=24)]
+    return {
+        "minutes": len(series),
+        "alarm_onset": onset,
+        "lead_time_h": (eruption_time - onset).total_seconds() / 3600 if onset is not None else np.nan,
+        "false_alarms": len(starts) - len(in_horizon),
+        "alarm_fraction_before": float(above.mean()) if len(above) else np.nan,
+        "max_risk_before": float(before["risk"].max()) if len(before) else np.nan,
+        "mean_risk_24h_before": float(last_24h["risk"].mean()) if len(last_24h) else np.nan,
+    }
+
+
+def backtest_eruption(eruption_name: str, rng=None, **metrics_kwargs):
+    """Rejeu d'une éruption archivée : (série de risque, métriques d'avance)."""
+    from data_loader import load_eruption_file
+
+    rng = np.random.default_rng(0) if rng is None else rng
+    df = load_eruption_file(eruption_name)
+    if df.empty:
+        return pd.DataFrame(columns=["time_min", "risk"]), {}
+    if "RSAM" not in df.columns:
+        # Même définition que preprocess.compute_rsam, station par station
+        df = df.assign(RSAM=df.groupby("station")["amplitude_mean"].transform(
+            lambda x: x.rolling(10, min_periods=3).mean()))
+
+    series = replay(df, rng)
+    return series, lead_time_metrics(series, eruptions[eruption_name]["time"], **metrics_kwargs)
+
+
+def backtest_all(seed: int = 0, **metrics_kwargs):
+    """Rejeu des éruptions archivées : ({éruption: série}, tableau des métriques)."""
+    rng = np.random.default_rng(seed)
+    series, rows = {}, []
+    for name in eruptions:
+        series[name], metrics = backtest_eruption(name, rng, **metrics_kwargs)
+        if metrics:
+            rows.append({"eruption": name, **metrics})
+    return series, pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import time
+
+    t0 = time.perf_counter()
+    _, table = backtest_all(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    print(table.to_string(index=False))
+    print(f"\n{table['minutes'].sum():,} minutes rejouées en {time.perf_counter() - t0:.2f} s")
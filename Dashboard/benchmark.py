@@ -0,0 +1,902 @@
+# ============================================
+# benchmark.py — mesures de performance du dashboard
+# Usage : python benchmark.py <nom> [<nom> ...]   (sans argument : tout)
+# ============================================
+
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from constants import DATA_DIR, eruptions
+
+
+def _timeit(fn, repeat: int = 1):
+    """Renvoie (meilleur temps en secondes, résultat du dernier appel)."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+# --------------------------------------------
+# Cache colonnaire : chargement à froid vs à chaud
+# --------------------------------------------
+
+def bench_columnar_cache(repeat: int = 5):
+    from data_loader import read_eruption_csv, _cache_dir
+
+    print(f"{'Éruption':<28} {'lignes':>8} {'froid (ms)':>11} {'chaud (ms)':>11} {'gain':>6}")
+    for name, info in eruptions.items():
+        path = DATA_DIR / info["file"]
+        if not path.exists():
+            print(f"{name:<28} fichier absent ({path})")
+            continue
+
+        shutil.rmtree(_cache_dir(path), ignore_errors=True)
+        cold, df = _timeit(lambda: read_eruption_csv(path))
+        warm, _ = _timeit(lambda: read_eruption_csv(path), repeat=repeat)
+        print(f"{name:<28} {len(df):>8,} {cold * 1e3:>11.1f} {warm * 1e3:>11.1f} {cold / warm:>5.1f}x")
+
+
+# --------------------------------------------
+# Cache mémoire : un rendu de page = 5 appels par éruption
+# --------------------------------------------
+
+def bench_frame_cache(calls_per_render: int = 5):
+    from data_loader import load_eruption_file, clear_frame_cache, frame_cache_stats
+
+    clear_frame_cache()
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    for render in range(2):
+        t, _ = _timeit(lambda: [load_eruption_file(n) for n in names for _ in range(calls_per_render)])
+        print(f"rendu {render + 1} : {t * 1e3:.1f} ms")
+    print(frame_cache_stats())
+
+
+# --------------------------------------------
+# Fenêtres : lecture ciblée vs chargement complet + masque
+# --------------------------------------------
+
+def bench_window_pushdown(repeat: int = 10):
+    import pandas as pd
+    from data_loader import load_eruption_file, load_window, clear_frame_cache
+
+    cols = ["time_min", "station", "amplitude_mean"]
+    print(f"{'Éruption':<28} {'lignes':>8} {'complet (ms)':>13} {'ciblé (ms)':>11} {'Mo':>6}")
+    for name, info in eruptions.items():
+        if not (DATA_DIR / info["file"]).exists():
+            continue
+        erupt = info["time"]
+
+        def full():
+            clear_frame_cache()
+            df = load_eruption_file(name)
+            mask = (df["time_min"] >= erupt - pd.Timedelta(hours=48)) & (df["time_min"] <= erupt + pd.Timedelta(hours=6))
+            return df.loc[mask, cols]
+
+        t_full, _ = _timeit(full, repeat)
+        t_win, win = _timeit(lambda: load_window(name, 48, 6, columns=cols), repeat)
+        mb = win.memory_usage(deep=True).sum() / 1024**2
+        print(f"{name:<28} {len(win):>8,} {t_full * 1e3:>13.1f} {t_win * 1e3:>11.1f} {mb:>6.2f}")
+
+
+# --------------------------------------------
+# FDSN : requête unique vs tranches parallèles (serveur local simulé)
+# --------------------------------------------
+
+def _mock_fdsn_server(stations, delay: float, per_hour: float):
+    """
+    Serveur dataselect local : chaque requête répond après delay + per_hour
+    secondes par heure×station demandée, avec un bloc miniSEED d'1 h à 100 Hz
+    (pré-généré) par heure et par station.
+    """
+    import io
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+    from obspy import Trace, UTCDateTime
+
+    rng = np.random.default_rng(0)
+    blocks = {}
+    for station in stations:
+        tr = Trace(data=rng.normal(0, 500, 360_000).astype(np.int32))
+        tr.stats.update({"network": "PF", "station": station, "channel": "HHZ",
+                         "sampling_rate": 100.0, "starttime": UTCDateTime(2024, 1, 1)})
+        buf = io.BytesIO()
+        tr.write(buf, format="MSEED")
+        blocks[station] = buf.getvalue()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            q = parse_qs(urlparse(self.path).query)
+            hours = max(1, int(np.ceil((UTCDateTime(q["endtime"][0]) - UTCDateTime(q["starttime"][0])) / 3600)))
+            names = q["station"][0].split(",")
+            time.sleep(delay + per_hour * hours * len(names))
+            body = b"".join(blocks[n] * hours for n in names)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_fdsn_fetch(n_stations: int = 8, hours: int = 6, delay: float = 0.2, per_hour: float = 0.05):
+    import requests
+    from io import BytesIO
+    from obspy import read, UTCDateTime
+    from fdsn_client import fetch_stations
+
+    stations = [f"S{i:02d}" for i in range(n_stations)]
+    server = _mock_fdsn_server(stations, delay, per_hour)
+    url = f"http://127.0.0.1:{server.server_port}/fdsnws/dataselect/1/query"
+    endtime = UTCDateTime(2024, 1, 2)
+    starttime = endtime - hours * 3600
+
+    def single():
+        params = {"network": "PF", "station": ",".join(stations), "location": "*", "channel": "HHZ",
+                  "starttime": starttime.isoformat(), "endtime": endtime.isoformat()}
+        content = requests.get(url, params=params, timeout=900).content
+        read(BytesIO(content), format="MSEED")
+        return len(content)
+
+    t_single, size = _timeit(single)
+    t_par, (_, stats) = _timeit(lambda: fetch_stations({s: starttime for s in stations}, endtime, url=url))
+    lat = np.array(stats["latencies"]) * 1e3
+    mb = size / 1024**2
+    print(f"{n_stations} stations × {hours} h — {mb:.1f} Mo")
+    print(f"requête unique   : {t_single:6.2f} s  ({mb / t_single:6.1f} Mo/s)")
+    print(f"tranches ({stats['chunks']:>3})  : {t_par:6.2f} s  ({stats['bytes'] / 1024**2 / t_par:6.1f} Mo/s)"
+          f"  latence p50 {np.percentile(lat, 50):.0f} ms, p95 {np.percentile(lat, 95):.0f} ms, max {lat.max():.0f} ms")
+    server.shutdown()
+
+
+# --------------------------------------------
+# Étape 2 temps réel : agrégation par minute (25 stations × 24 h à 4 Hz)
+# --------------------------------------------
+
+def bench_minute_aggregation(n_stations: int = 25, hours: int = 24):
+    import tracemalloc
+    import pandas as pd
+    from obspy import UTCDateTime
+    from real_time_update import minute_means
+
+    rng = np.random.default_rng(0)
+    t0 = UTCDateTime(2024, 1, 1, 0, 0, 17.5)
+    traces = [(f"S{i:02d}", np.abs(rng.normal(0, 500, hours * 3600 * 4)) / 25.0) for i in range(n_stations)]
+
+    def per_row():
+        data_list = []
+        for station, data in traces:
+            times = pd.date_range(t0.datetime, periods=len(data), freq="250ms")
+            series = pd.Series(data, index=times).resample("1min").mean()
+            for ts, val in series.items():
+                data_list.append({"time_min": ts, "station": station, "amplitude_mean": float(val)})
+        return pd.DataFrame(data_list)
+
+    def vectorized():
+        parts = [(station, *minute_means(data, t0.ns, 250_000_000)) for station, data in traces]
+        return pd.DataFrame({
+            "time_min": np.concatenate([m for _, m, _ in parts]).astype("datetime64[m]").astype("datetime64[ns]"),
+            "station": np.repeat(np.array([s for s, _, _ in parts], dtype=object), [len(m) for _, m, _ in parts]),
+            "amplitude_mean": np.concatenate([v for _, _, v in parts]),
+        })
+
+    for label, fn in [("dict par ligne", per_row), ("reduceat", vectorized)]:
+        tracemalloc.start()
+        t, df = _timeit(fn)
+        peak = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+        print(f"{label:<15} {t * 1e3:8.1f} ms  pic {peak:7.1f} Mo  ({len(df):,} lignes)")
+
+
+# --------------------------------------------
+# Features glissantes : recalcul batch vs ajout incrémental d'une minute
+# --------------------------------------------
+
+def bench_incremental_features(n_stations: int = 25, hours: int = 24, repeat: int = 20):
+    import pandas as pd
+    import preprocess as pp
+
+    rng = np.random.default_rng(0)
+    n = hours * 60
+    df = pd.DataFrame({
+        "time_min": np.repeat(pd.date_range("2024-01-01", periods=n + 1, freq="min", tz="UTC"), n_stations),
+        "station": np.tile([f"S{i:02d}" for i in range(n_stations)], n + 1),
+        "amplitude_mean": np.abs(rng.normal(100, 30, (n + 1) * n_stations)),
+    })
+    history, last = df.iloc[:-n_stations], df.iloc[-n_stations:]
+
+    def batch():
+        parts = []
+        for _, g in df.groupby("station", sort=False):
+            g = g.copy()
+            for fn in (pp.compute_rsam, pp.compute_frequency_index, pp.compute_kurtosis, pp.smooth_envelopes):
+                g = fn(g)
+            parts.append(g)
+        return pd.concat(parts).sort_index()
+
+    states = {}
+    data = pp.append_features(history.iloc[:0], history, states)
+    t_batch, _ = _timeit(batch, repeat)
+    t_inc, _ = _timeit(lambda: pp.append_features(data, last, {k: v.copy() for k, v in states.items()}), repeat)
+    print(f"{n_stations} stations × {hours} h ({len(df):,} lignes), ajout d'une minute")
+    print(f"recalcul batch : {t_batch * 1e3:8.1f} ms")
+    print(f"incrémental    : {t_inc * 1e3:8.1f} ms  ({t_batch / t_inc:.0f}x)")
+
+
+# --------------------------------------------
+# Quantiles glissants : P10 + P90 (fenêtre 20), pandas vs une passe triée
+# --------------------------------------------
+
+def bench_rolling_quantiles(sizes=(10**6, 10**7, 10**8), window: int = 20, stream_n: int = 10**5):
+    import gc
+    import pandas as pd
+    from rolling import rolling_quantiles, RollingQuantiles
+
+    qs = [0.10, 0.90]
+    rng = np.random.default_rng(0)
+    print(f"{'lignes':>13} {'pandas (s)':>11} {'une passe (s)':>14} {'gain':>6}")
+    for n in sizes:
+        # Un seul jeu de résultats en mémoire à la fois (10^8 lignes = 800 Mo par colonne)
+        x = rng.normal(100, 30, n)
+        s = pd.Series(x, copy=False)
+        t_pd = sum(_timeit(lambda: s.rolling(window, min_periods=5).quantile(q).to_numpy())[0] for q in qs)
+        t_one, out = _timeit(lambda: rolling_quantiles(x, window, qs, min_periods=5))
+        print(f"{n:>13,} {t_pd:>11.2f} {t_one:>14.2f} {t_pd / t_one:>5.1f}x")
+        del x, s, out
+        gc.collect()
+
+    rq = RollingQuantiles(window, qs, min_periods=5)
+    t_stream, _ = _timeit(lambda: [rq.update(v) for v in rng.normal(100, 30, stream_n).tolist()])
+    print(f"flux (RollingQuantiles) : {stream_n / t_stream:,.0f} échantillons/s")
+
+
+# --------------------------------------------
+# Entropie spectrale glissante : boucle welch par fenêtre vs appel batché
+# --------------------------------------------
+
+def bench_spectral_entropy(n_stations: int = 25, days: int = 7, loop_windows: int = 2000):
+    from scipy.signal import welch
+    from preprocess import sliding_spectral_entropy
+
+    rng = np.random.default_rng(0)
+    series = [np.abs(rng.normal(100, 30, days * 1440)) for _ in range(n_stations)]
+    window = 256
+
+    def loop():
+        x = series[0]
+        for i in range(window - 1, window - 1 + loop_windows):
+            _, Pxx = welch(x[i - window + 1:i + 1], fs=1/60, nperseg=64)
+            p = Pxx / (np.sum(Pxx) + 1e-12)
+            -np.sum(p * np.log2(p + 1e-12))
+
+    t_loop, _ = _timeit(loop)
+    t_batch, _ = _timeit(lambda: [sliding_spectral_entropy(x, window=window) for x in series])
+    n_windows = n_stations * (days * 1440 - window + 1)
+    print(f"boucle  : {loop_windows / t_loop:>12,.0f} fenêtres/s")
+    print(f"batché  : {n_windows / t_batch:>12,.0f} fenêtres/s  ({n_windows:,} fenêtres, {t_batch:.2f} s)")
+
+
+# --------------------------------------------
+# Features par fenêtre : boucle des notebooks vs calcul batché (+ pool)
+# --------------------------------------------
+
+def bench_window_features(n_groups: int = 16, days: int = 14, loop_groups: int = 2):
+    import pandas as pd
+    from scipy.stats import kurtosis
+    from preprocess import compute_window_features
+
+    rng = np.random.default_rng(0)
+    n = days * 1440
+    df = pd.DataFrame({
+        "time_min": np.tile(pd.date_range("2024-01-01", periods=n, freq="min", tz="UTC"), n_groups),
+        "station": np.repeat([f"S{i:02d}" for i in range(n_groups // 2)], 2 * n),
+        "channel": np.tile(np.repeat(["HHZ", "HHE"], n), n_groups // 2),
+        "amplitude_mean": np.abs(rng.normal(100, 30, n * n_groups)),
+    })
+
+    def loop():
+        # Boucle "for i in indices" des notebooks, sur loop_groups groupes seulement
+        for _, g in list(df.groupby(["station", "channel"]))[:loop_groups]:
+            sig = g["amplitude_mean"].to_numpy()
+            for i in range(0, len(sig) - 10 + 1, 10):
+                seg = sig[i:i + 10]
+                p, _ = np.histogram(seg, bins=50, density=True)
+                p = p[p > 0]
+                -np.sum(p * np.log2(p))
+                float(kurtosis(seg, fisher=True, bias=False))
+                med = np.median(np.abs(seg))
+                np.sum(seg[np.abs(seg) > med] ** 2) / np.sum(seg[np.abs(seg) <= med] ** 2)
+                np.std(seg), np.mean(seg), np.median(seg), np.percentile(seg, 90), np.percentile(seg, 10)
+
+    per_group = n // 10
+    t_loop, _ = _timeit(loop)
+    t_batch, feat = _timeit(lambda: compute_window_features(df))
+    t_pool, _ = _timeit(lambda: compute_window_features(df, workers=4))
+    print(f"{n_groups} groupes × {days} j, fenêtres de 10 min ({len(feat):,} fenêtres)")
+    print(f"boucle notebook : {loop_groups * per_group / t_loop:>12,.0f} fenêtres/s")
+    print(f"batché          : {len(feat) / t_batch:>12,.0f} fenêtres/s")
+    print(f"batché, 4 proc. : {len(feat) / t_pool:>12,.0f} fenêtres/s")
+
+
+# --------------------------------------------
+# Séquences ML : boucle de slices + np.stack (notebooks) vs vue strided
+# --------------------------------------------
+
+def bench_sequences(days: int = 60, years: int = 3, n_features: int = 8, seq_len: int = 60):
+    import tracemalloc
+    from preprocess import make_sequences
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(days * 1440, n_features))
+
+    def loop():
+        return np.stack([X[i:i + seq_len] for i in range(0, len(X) - seq_len)])
+
+    for label, fn in [("slices + stack", loop), ("vue strided", lambda: make_sequences(X, seq_len=seq_len)),
+                      ("vue + padding", lambda: make_sequences(X, seq_len=seq_len, pad=True))]:
+        tracemalloc.start()
+        t, seqs = _timeit(fn)
+        peak = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+        print(f"{label:<15} {days} j : {t * 1e3:8.1f} ms  pic {peak:8.1f} Mo  {seqs.shape}")
+
+    X = rng.normal(size=(years * 365 * 1440, n_features)).astype(np.float32)
+    t, seqs = _timeit(lambda: make_sequences(X, seq_len=1380, pad=True))
+    dense = np.prod(seqs.shape) * X.itemsize / 1024**3
+    print(f"{years} ans, seq_len=1380 : {t * 1e3:.2f} ms, {seqs.shape} (matérialisé : {dense:,.0f} Go)")
+
+
+# --------------------------------------------
+# Backtest : run_model appelé à chaque minute vs rejeu incrémental
+# --------------------------------------------
+
+def bench_backtest(naive_minutes: int = 600):
+    from backtest import backtest_all, replay
+    from data_loader import load_eruption_file
+    from prediction import run_model
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+    df = load_eruption_file(names[0])
+    df = df.assign(RSAM=df.groupby("station")["amplitude_mean"].transform(
+        lambda x: x.rolling(10, min_periods=3).mean()))
+    minutes = np.sort(df["time_min"].unique())
+    head = df[df["time_min"] <= minutes[min(naive_minutes, len(minutes)) - 1]]
+
+    rng = np.random.default_rng(0)
+    t_naive, naive = _timeit(lambda: [run_model(head[head["time_min"] <= m], rng) for m in minutes[:naive_minutes]])
+    t_replay, _ = _timeit(lambda: replay(head, np.random.default_rng(0)))
+    print(f"{len(naive)} minutes ({names[0]}) : run_model {t_naive:.2f} s, rejeu {t_replay * 1e3:.1f} ms")
+
+    t_all, (_, table) = _timeit(lambda: backtest_all(0))
+    total = int(table["minutes"].sum())
+    # Coût de run_model ~ proportionnel au nombre de lignes vues : extrapolation quadratique
+    estimate = t_naive * (len(df) / len(head)) ** 2 * len(table)
+    print(f"{len(table)} éruptions, {total:,} minutes : rejeu {t_all:.2f} s "
+          f"(run_model minute par minute estimé à ~{estimate / 60:.0f} min)")
+
+
+# --------------------------------------------
+# Inférence par lots : run_model fenêtre par fenêtre vs run_model_batch (+ cache)
+# --------------------------------------------
+
+def bench_batch_inference(n_windows: int = 20000, loop_windows: int = 500):
+    import pandas as pd
+    from prediction import WINDOW_ROWS, run_model, run_model_batch, risk_cache_stats
+
+    windows = np.abs(np.random.default_rng(0).normal(500, 300, (n_windows, WINDOW_ROWS)))
+    frames = [pd.DataFrame({"time_min": np.arange(WINDOW_ROWS), "RSAM": w}) for w in windows[:loop_windows]]
+
+    rng = np.random.default_rng(1)
+    t_loop, _ = _timeit(lambda: [run_model(f, rng) for f in frames])
+    key = ("bench", n_windows)
+    t_batch, _ = _timeit(lambda: run_model_batch(windows, np.random.default_rng(42), cache_key=key))
+    t_hit, _ = _timeit(lambda: run_model_batch(windows, np.random.default_rng(42), cache_key=key))
+    print(f"run_model : {t_loop / loop_windows * 1e3:.3f} ms/fenêtre ; lot de {n_windows:,} : "
+          f"{t_batch:.2f} s ({t_batch / n_windows * 1e3:.4f} ms/fenêtre), "
+          f"rejoué depuis le cache {t_hit * 1e3:.2f} ms — {risk_cache_stats()}")
+
+
+# --------------------------------------------
+# CNNTransformer : passe avant NumPy vs torch, par taille de lot
+# --------------------------------------------
+
+def _peak_rss_mb(fn):
+    """(temps, pic de RSS au-dessus du niveau initial en Mo, résultat), RSS échantillonné (Linux)."""
+    import os
+    import threading
+
+    page = os.sysconf("SC_PAGE_SIZE")
+
+    def rss():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * page
+
+    base, peak, done = rss(), [0], threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], rss())
+            done.wait(0.001)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    return elapsed, max(peak[0], rss()) - base, result
+
+
+def bench_numpy_model(feature_dim: int = 9, seq_len: int = 480, num_classes: int = 5,
+                      batch_sizes=(1, 8, 32, 128, 256)):
+    import os
+    import tempfile
+    from cnn_transformer import NumpyCNNTransformer, export_weights, torch_model
+
+    try:
+        import torch
+    except ImportError:
+        torch = None
+        print("torch absent : poids aléatoires, NumPy seul")
+
+    # Poids : modèle torch initialisé (même forme que le notebook) ou tirage aléatoire équivalent
+    rng = np.random.default_rng(0)
+    if torch is not None:
+        torch.manual_seed(0)
+        reference = torch_model(feature_dim, num_classes).eval()
+        state = reference.state_dict()
+    else:
+        e, ff = 128, 2048
+        shapes = {"conv.0.weight": (e, feature_dim, 3), "conv.0.bias": (e,), "conv.2.weight": (e, e, 3),
+                  "conv.2.bias": (e,), "cls_head.0.weight": (e,), "cls_head.0.bias": (e,),
+                  "cls_head.1.weight": (num_classes, e), "cls_head.1.bias": (num_classes,)}
+        for i in range(4):
+            p = f"transformer.layers.{i}."
+            shapes.update({p + "self_attn.in_proj_weight": (3 * e, e), p + "self_attn.in_proj_bias": (3 * e,),
+                           p + "self_attn.out_proj.weight": (e, e), p + "self_attn.out_proj.bias": (e,),
+                           p + "linear1.weight": (ff, e), p + "linear1.bias": (ff,),
+                           p + "linear2.weight": (e, ff), p + "linear2.bias": (e,),
+                           p + "norm1.weight": (e,), p + "norm1.bias": (e,),
+                           p + "norm2.weight": (e,), p + "norm2.bias": (e,)})
+        state = {name: rng.normal(0, 1 / np.sqrt(shape[-1]), shape) for name, shape in shapes.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cnn_transformer.npz")
+        export_weights(state, path)
+        t_load, model = _timeit(lambda: NumpyCNNTransformer.from_npz(path))
+        print(f".npz {os.path.getsize(path) / 1e6:.1f} Mo, chargement {t_load * 1e3:.0f} ms, "
+              f"poids en mémoire {model.nbytes / 1e6:.1f} Mo")
+
+    for batch in batch_sizes:
+        x = rng.normal(0, 1, (batch, seq_len, feature_dim)).astype(np.float32)
+        t_np, mem_np, _ = _peak_rss_mb(lambda: model.predict_logits(x))
+        line = f"lot {batch:>3} : numpy {t_np * 1e3:8.1f} ms, +{mem_np / 1e6:6.0f} Mo"
+        if torch is not None:
+            with torch.inference_mode():
+                t_torch, mem_torch, _ = _peak_rss_mb(lambda: reference(torch.from_numpy(x)).numpy())
+            line += f" | torch {t_torch * 1e3:8.1f} ms, +{mem_torch / 1e6:6.0f} Mo"
+        print(line)
+
+
+# --------------------------------------------
+# Service de prédiction : run_model par session vs micro-lots partagés
+# --------------------------------------------
+
+def bench_prediction_service(clients: int = 32, requests_per_client: int = 25):
+    import threading
+    import pandas as pd
+    from prediction import WINDOW_ROWS, run_model
+    from prediction_service import make_server, remote_run_model
+
+    rng = np.random.default_rng(0)
+    frames = [pd.DataFrame({"time_min": np.arange(WINDOW_ROWS), "RSAM": np.abs(rng.normal(500, 300, WINDOW_ROWS))})
+              for _ in range(clients)]
+
+    def load(predict):
+        latencies = []
+
+        def client(df):
+            for _ in range(requests_per_client):
+                t0 = time.perf_counter()
+                predict(df)
+                latencies.append(time.perf_counter() - t0)
+
+        threads = [threading.Thread(target=client, args=(df,)) for df in frames]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        lat = np.array(latencies) * 1e3
+        return (f"{len(lat) / (time.perf_counter() - t0):6.0f} req/s, "
+                f"latence p50 {np.percentile(lat, 50):6.1f} ms / p95 {np.percentile(lat, 95):6.1f} ms")
+
+    print(f"{clients} sessions × {requests_per_client} requêtes (fenêtres de {WINDOW_ROWS} RSAM)")
+    print(f"run_model dans chaque session : {load(run_model)}")
+    for max_batch, max_wait_ms in ((1, 0), (64, 10)):
+        server = make_server(port=0, max_batch=max_batch, max_wait_ms=max_wait_ms, seed=0, model_path="absent.npz")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        line = load(lambda df: remote_run_model(df, url))
+        metrics = server.batchers["/predict"].metrics()
+        server.shutdown()
+        server.server_close()
+        server.batchers["/predict"].close()
+        print(f"service max_batch={max_batch:>2}, max_wait={max_wait_ms:>2} ms : {line}, "
+              f"lot moyen {metrics['mean_batch_size']:.1f}, file max {metrics['max_queue_depth']}, "
+              f"lot p95 {metrics['batch_latency_ms']['p95']:.2f} ms")
+
+
+# --------------------------------------------
+# Cube aligné : resample à chaque rerun vs tranche du cube
+# --------------------------------------------
+
+def bench_aligned_cube(repeat: int = 5):
+    import pandas as pd
+    from constants import CACHE_DIR, color_map
+    from data_loader import aligned_slice, load_aligned_cube, load_eruption_file
+    import data_loader
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+
+    def resample_path():
+        # Ancien graphing.load_aligned_data : filtrage + resample à chaque rerun
+        frames = []
+        for name in names:
+            df = load_eruption_file(name)
+            info = eruptions[name]
+            df["hours_to_eruption"] = (df["time_min"] - info["time"]).dt.total_seconds() / 3600
+            df = df[(df["hours_to_eruption"] >= -80) & (df["hours_to_eruption"] <= 24)]
+            res = df.set_index("time_min").resample("10min").mean(numeric_only=True).reset_index()
+            res["hours_to_eruption"] = (res["time_min"] - info["time"]).dt.total_seconds() / 3600
+            res["eruption"] = name
+            res["color"] = color_map[name]
+            frames.append(res)
+        return pd.concat(frames, ignore_index=True)
+
+    shutil.rmtree(CACHE_DIR / "aligned", ignore_errors=True)
+    data_loader._cube_cache.clear()
+    t_build, cube = _timeit(load_aligned_cube)
+    t_old, old = _timeit(resample_path, repeat)
+    t_new, new = _timeit(lambda: aligned_slice(names), repeat)
+    some = cube["stations"][: max(1, len(cube["stations"]) // 2)]
+    t_sub, _ = _timeit(lambda: aligned_slice(names, some), repeat)
+    print(f"cube {cube['sums'].shape} construit en {t_build:.2f} s ; "
+          f"{len(names)} éruptions : resample {t_old * 1e3:.1f} ms → tranche {t_new * 1e3:.1f} ms "
+          f"({len(new)} pas, {len(old)} avant) ; {len(some)} stations : {t_sub * 1e3:.1f} ms")
+
+
+# --------------------------------------------
+# Sous-échantillonnage : taille des figures avant / après pyramide min/max
+# --------------------------------------------
+
+def bench_downsampling(n_stations: int = 20):
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from downsample import downsample_frame, downsample_xy
+
+    def report(label, before, after):
+        b, a = len(before.to_json()), len(after.to_json())
+        print(f"{label:<28} {b / 1e3:8.0f} ko → {a / 1e3:6.0f} ko (÷{b / a:4.1f})")
+
+    # RSAM temps réel 24 h : une trace par station, 1 point / min
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2024-01-01", periods=1440, freq="min", tz="UTC")
+    df = pd.DataFrame({"time_min": np.tile(times, n_stations),
+                       "station": np.repeat([f"S{i:02d}" for i in range(n_stations)], len(times)),
+                       "RSAM": np.abs(rng.normal(300, 80, n_stations * len(times))).cumsum() % 5000})
+    t_ds, reduced = _timeit(lambda: downsample_frame(df, "time_min", "RSAM", by="station"))
+    report(f"temps réel ({n_stations} stations)", px.line(df, x="time_min", y="RSAM", color="station"),
+           px.line(reduced, x="time_min", y="RSAM", color="station"))
+    print(f"  réduction {t_ds * 1e3:.1f} ms ({len(df):,} → {len(reduced):,} points)")
+
+    # Tremor : 84 h d'une station à la minute (amplitude brute bruitée)
+    hours = np.arange(-72 * 60, 12 * 60) / 60
+    amplitude = np.abs(rng.standard_cauchy(len(hours))) * 100
+    x, y = downsample_xy(pd.Series(hours), pd.Series(amplitude), x_unit="1h")
+    report("tremor (1 trace brute)", go.Figure(go.Scatter(x=hours, y=amplitude, mode="lines")),
+           go.Figure(go.Scatter(x=x, y=y, mode="lines")))
+
+    # Kurtosis : texte par point → nom de trace dans le hovertemplate
+    k = np.abs(rng.normal(3, 1, 625))
+    template = "Heures: %{x:.1f}<br>Kurtosis: %{y:.2f}<extra></extra>"
+    report("kurtosis (marqueurs)",
+           go.Figure(go.Scatter(x=hours[:625], y=k, mode="markers", name="éruption",
+                                hovertemplate="<b>%{text}</b><br>" + template, text=["éruption"] * 625)),
+           go.Figure(go.Scatter(x=hours[:625], y=k, mode="markers", name="éruption",
+                                hovertemplate="<b>%{fullData.name}</b><br>" + template)))
+
+
+# --------------------------------------------
+# Rendu des courbes : go.Scatter (SVG) vs Scattergl + tableaux typés
+# --------------------------------------------
+
+def _capture_figures(fn, *args):
+    """Figures passées à st.plotly_chart par une fonction d'affichage de graphing."""
+    import streamlit as st
+
+    figures, emit = [], st.plotly_chart
+    st.plotly_chart = lambda fig, *a, **kw: figures.append(fig)
+    try:
+        fn(*args)
+    finally:
+        st.plotly_chart = emit
+    return figures
+
+
+def bench_render_modes(repeat: int = 3):
+    import graphing
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+    df = graphing.load_aligned_data(names)
+    # Colonnes dérivées absentes des CSV d'exemple : valeurs de substitution de même taille
+    for col in ("RSAM", "SE_env", "Kurt_env"):
+        if col not in df.columns:
+            df[col] = df["amplitude_mean"].abs()
+
+    charts = {
+        "kurtosis": lambda: [graphing.plot_kurtosis(df)],
+        "entropie": lambda: [graphing.plot_shannon_entropy(df)],
+        "rsam": lambda: [graphing.plot_rsam(df)],
+        "énergie": lambda: [graphing.plot_cumulative_energy(df)],
+        "amplitude ± IC": lambda: [graphing.plot_amplitude_with_ci(df)],
+        "dV/V": lambda: _capture_figures(graphing.plot_dvv, df),
+        "événements": lambda: _capture_figures(graphing.plot_event_count),
+        "waterfall 3D": lambda: _capture_figures(graphing.plot_3d_waterfall),
+        "tremor": lambda: _capture_figures(graphing.display_spectrogram),
+    }
+    saved = graphing.PLOT_RENDER_MODE
+    totals = {}
+    try:
+        for mode in ("svg", "webgl"):
+            graphing.PLOT_RENDER_MODE = mode
+            for name, build in charts.items():
+                try:
+                    t_build, figures = _timeit(build, repeat)
+                except Exception as e:
+                    print(f"{name} ({mode}) : échec — {e}")
+                    continue
+                t_json, payload = _timeit(lambda: sum(len(f.to_json()) for f in figures), repeat)
+                totals.setdefault(name, {})[mode] = (t_build, t_json, payload)
+    finally:
+        graphing.PLOT_RENDER_MODE = saved
+
+    print(f"{'graphique':<16}{'svg : construction / JSON / taille':>40}{'webgl : construction / JSON / taille':>42}")
+    for name, modes in totals.items():
+        if len(modes) < 2:
+            continue
+        cells = [f"{b * 1e3:7.1f} ms {j * 1e3:7.1f} ms {p / 1e3:7.0f} ko" for b, j, p in modes.values()]
+        print(f"{name:<16}{cells[0]:>40}{cells[1]:>42}")
+    for mode in ("svg", "webgl"):
+        build = sum(m[mode][0] + m[mode][1] for m in totals.values() if len(m) == 2)
+        size = sum(m[mode][2] for m in totals.values() if len(m) == 2)
+        print(f"total {mode:<5} : {build * 1e3:.0f} ms, {size / 1e3:.0f} ko")
+
+
+# --------------------------------------------
+# Mémo des figures : rerun de show_graphics à froid vs servi par le cache
+# --------------------------------------------
+
+def bench_chart_memo():
+    import graphing
+    from data_loader import data_version
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+    df = graphing.load_aligned_data(names)
+    for col in ("RSAM", "SE_env", "Kurt_env"):
+        if col not in df.columns:
+            df[col] = df["amplitude_mean"].abs()
+
+    key = (tuple(names), None, data_version(names))
+    charts = {
+        "kurtosis": lambda: graphing.plot_kurtosis(df),
+        "entropy": lambda: graphing.plot_shannon_entropy(df),
+        "rsam": lambda: graphing.plot_rsam(df),
+        "energy": lambda: graphing.plot_cumulative_energy(df),
+        "amplitude_ci": lambda: graphing.plot_amplitude_with_ci(df),
+        "dvv": lambda: graphing.figure_dvv(df),
+        "waterfall": lambda: graphing.figure_3d_waterfall(names[0]),
+        "tremor": lambda: graphing.figure_tremor(names[0], "RER"),
+    }
+
+    def rerun():
+        for chart, build in charts.items():
+            try:
+                graphing.memo_figure(chart, key, build)
+            except Exception as e:
+                print(f"{chart} : échec — {e}")
+
+    t_cold, _ = _timeit(rerun, 1)
+    t_warm, _ = _timeit(rerun, 5)
+    print(f"rerun à froid : {t_cold * 1e3:.0f} ms | rerun servi par le cache : {t_warm * 1e3:.2f} ms")
+    print(graphing.chart_report().to_string(index=False))
+
+
+# --------------------------------------------
+# Figures comparatives (sans cache) : l'une après l'autre vs pool de compute_figures
+# --------------------------------------------
+
+def bench_parallel_figures(repeat: int = 3):
+    import os
+
+    import graphing
+    from constants import FIGURE_WORKERS
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+    df = graphing.load_aligned_data(names)
+    for col in ("RSAM", "SE_env", "Kurt_env"):
+        if col not in df.columns:
+            df[col] = df["amplitude_mean"].abs()
+    builders = {chart: (lambda builder=builder: builder(df)) for chart, _, builder, _ in graphing.COMPARATIVE_CHARTS}
+
+    def sequential():
+        return [build() for build in builders.values()]
+
+    def parallel():
+        graphing._figure_cache.clear()
+        futures = graphing.compute_figures(("bench", len(df)), builders)
+        return [f.result() for f in futures.values()]
+
+    t_seq, _ = _timeit(sequential, repeat)
+    t_par, _ = _timeit(parallel, repeat)
+    print(f"{len(builders)} figures, {len(df):,} lignes, {FIGURE_WORKERS} workers ({os.cpu_count()} cœurs)")
+    print(f"séquentiel : {t_seq * 1e3:.0f} ms | pool : {t_par * 1e3:.0f} ms | x{t_seq / t_par:.2f}")
+
+
+# --------------------------------------------
+# Waterfall 3D : pivot_table par heure flottante (ancienne version) vs grille binée en cache
+# --------------------------------------------
+
+def bench_waterfall_grid(repeat: int = 5):
+    import plotly.graph_objects as go
+
+    import graphing
+    from data_loader import load_window
+
+    for name, info in eruptions.items():
+        df = load_window(name, hours_before=graphing.WATERFALL_HOURS_BEFORE, hours_after=graphing.WATERFALL_HOURS_AFTER,
+                         columns=["time_min", "station", "amplitude_mean"])
+        if len(df) < 100:
+            continue
+        hours = (df["time_min"] - info["time"]).dt.total_seconds() / 3600
+
+        def pivot():
+            return df.assign(hours=hours).pivot_table(values="amplitude_mean", index="station",
+                                                      columns="hours", aggfunc="mean").fillna(0)
+
+        def grid():
+            graphing._waterfall_grids.clear()
+            return graphing.waterfall_grid(name)
+
+        t_pivot, old = _timeit(pivot, repeat)
+        t_grid, new = _timeit(grid, repeat)
+        t_hit, _ = _timeit(lambda: graphing.waterfall_grid(name), repeat)
+        old_size = len(go.Figure(go.Surface(z=old.values, x=old.columns.values)).to_json())
+        new_size = len(go.Figure(go.Surface(z=new["z"], x=new["hours"])).to_json())
+        print(f"{name:<26} pivot {old.shape} {t_pivot * 1e3:6.1f} ms {old_size / 1e3:6.0f} ko | "
+              f"grille {new['z'].shape} {t_grid * 1e3:6.1f} ms (cache {t_hit * 1e3:.2f} ms) {new_size / 1e3:6.0f} ko")
+
+
+# --------------------------------------------
+# Catalogue STA/LTA : construction (une fois), puis comptages horaires indexés vs percentile par rerun
+# --------------------------------------------
+
+def bench_event_catalog(repeat: int = 5):
+    import pandas as pd
+
+    import events
+    from constants import CACHE_DIR
+    from data_loader import load_window
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+    events._catalog_meta.clear()
+    shutil.rmtree(CACHE_DIR / "events", ignore_errors=True)
+    t_build, (_, meta) = _timeit(events.event_catalog, 1)
+    print(f"catalogue : {meta['rows']:,} déclenchements, {len(meta['partitions'])} stations, "
+          f"construit en {t_build * 1e3:.0f} ms")
+
+    def percentile(name):
+        # Ancienne méthode : minutes au-dessus du 92e percentile du bruit de fond
+        df = load_window(name, hours_before=72, hours_after=12, columns=["time_min", "amplitude_mean"])
+        quiet = df[df["time_min"] < eruptions[name]["time"] - pd.Timedelta(hours=48)]
+        threshold = (quiet if len(quiet) > 100 else df)["amplitude_mean"].quantile(0.92)
+        return (df.set_index("time_min")["amplitude_mean"] > threshold).resample("1h").sum()
+
+    for name in names:
+        t_old, _ = _timeit(lambda: percentile(name), repeat)
+        t_new, hourly = _timeit(lambda: events.hourly_event_counts(name), repeat)
+        print(f"{name:<26} percentile {t_old * 1e3:6.1f} ms | catalogue {t_new * 1e3:6.1f} ms "
+              f"({int(hourly['events'].sum())} événements)")
+
+
+# --------------------------------------------
+# Carte des stations : CSV chargé + carte reconstruite (ancienne version) vs index + HTML en cache
+# --------------------------------------------
+
+def bench_station_map(repeat: int = 5):
+    import mapping
+    from data_loader import clear_frame_cache, load_eruption_file
+
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    if not names:
+        print("aucun fichier d'éruption")
+        return
+
+    def rebuild(name):
+        clear_frame_cache()  # une autre éruption a pu l'évincer entre deux changements de carte
+        active = set(load_eruption_file(name)["station"].unique())
+        return mapping.create_station_map(name, active).get_root().render()
+
+    for name in names:
+        t_old, _ = _timeit(lambda: rebuild(name), repeat)
+        mapping._map_html_cache.clear()
+        t_cold, html = _timeit(lambda: mapping.station_map_html(name), 1)
+        t_warm, _ = _timeit(lambda: mapping.station_map_html(name), repeat)
+        print(f"{name:<26} rechargement {t_old * 1e3:6.1f} ms | index + rendu {t_cold * 1e3:6.1f} ms | "
+              f"cache {t_warm * 1e3:5.2f} ms ({len(html) / 1e3:.0f} ko)")
+
+
+BENCHMARKS = {
+    "cache": bench_columnar_cache,
+    "memo": bench_frame_cache,
+    "window": bench_window_pushdown,
+    "fdsn": bench_fdsn_fetch,
+    "minutes": bench_minute_aggregation,
+    "rolling": bench_incremental_features,
+    "quantiles": bench_rolling_quantiles,
+    "entropy": bench_spectral_entropy,
+    "features": bench_window_features,
+    "sequences": bench_sequences,
+    "backtest": bench_backtest,
+    "batch": bench_batch_inference,
+    "cnn": bench_numpy_model,
+    "service": bench_prediction_service,
+    "aligned": bench_aligned_cube,
+    "downsample": bench_downsampling,
+    "render": bench_render_modes,
+    "charts": bench_chart_memo,
+    "parallel": bench_parallel_figures,
+    "waterfall": bench_waterfall_grid,
+    "events": bench_event_catalog,
+    "map": bench_station_map,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"\n=== {name} ===")
+        BENCHMARKS[name]()
@@ -0,0 +1,84 @@
+# ============================================
+# cache.py — cache mémoire LRU partagé par tout le processus
+# (Streamlit sert chaque session dans un thread du même processus)
+# ============================================
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache LRU thread-safe, borné en octets et/ou en nombre d'entrées.
+    - max_bytes : budget en octets, sizeof(valeur) donnant la taille d'une entrée
+    - max_entries : nombre maximal d'entrées (None = pas de borne)
+    - les entrées les moins récemment utilisées sont évincées jusqu'à repasser sous les bornes
+    - compteurs hits / misses / evictions exposés via stats()
+    """
+
+    def __init__(self, max_bytes: int = None, sizeof=None, max_entries: int = None):
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("max_bytes demande une fonction sizeof (taille en octets d'une valeur)")
+        if max_bytes is None and max_entries is None:
+            raise ValueError("LRUCache sans borne : donner max_bytes et/ou max_entries")
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # trop gros pour le budget : jamais mis en cache
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._over_budget():
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _over_budget(self) -> bool:
+        return ((self.max_bytes is not None and self._bytes > self.max_bytes)
+                or (self.max_entries is not None and len(self._entries) > self.max_entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+            }
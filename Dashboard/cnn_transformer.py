@@ -0,0 +1,193 @@
+# ============================================
+# cnn_transformer.py — inférence NumPy du CNNTransformer (Model_transformer.ipynb)
+# - export_weights : state_dict entraîné → .npz compact (float32 + hyperparamètres)
+# - NumpyCNNTransformer : passe avant sans torch, par micro-lots
+# torch n'est nécessaire que pour exporter un checkpoint (.pt) ou comparer.
+# Usage : python cnn_transformer.py model.pt model.npz FEATURE_DIM [NUM_CLASSES]
+# ============================================
+
+import sys
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Valeurs par défaut de nn.TransformerEncoderLayer / nn.LayerNorm
+LAYER_NORM_EPS = 1e-5
+
+
+def _to_numpy(tensor) -> np.ndarray:
+    if hasattr(tensor, "detach"):
+        tensor = tensor.detach().cpu().numpy()
+    return np.asarray(tensor, dtype=np.float32)
+
+
+def export_weights(state_dict, path, nhead: int = 4) -> None:
+    """
+    Écrit les poids d'un CNNTransformer (state_dict torch ou dict de tableaux)
+    dans un .npz compressé ; d_model, num_layers, feature_dim et num_classes
+    se déduisent des formes, nhead est enregistré à part.
+    """
+    arrays = {name: _to_numpy(value) for name, value in state_dict.items()}
+    num_layers = len({name.split(".")[2] for name in arrays if name.startswith("transformer.layers.")})
+    np.savez_compressed(path, nhead=np.int64(nhead), num_layers=np.int64(num_layers), **arrays)
+
+
+def torch_model(feature_dim: int, num_classes: int, d_model: int = 128, nhead: int = 4, num_layers: int = 4):
+    """CNNTransformer du notebook (torch requis), pour charger un checkpoint ou comparer."""
+    import torch.nn as nn
+
+    class CNNTransformer(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.conv = nn.Sequential(
+                nn.Conv1d(feature_dim, d_model, kernel_size=3, padding=1),
+                nn.ReLU(),
+                nn.Conv1d(d_model, d_model, kernel_size=3, padding=1),
+                nn.ReLU()
+            )
+            encoder_layer = nn.TransformerEncoderLayer(d_model=d_model, nhead=nhead, batch_first=True)
+            self.transformer = nn.TransformerEncoder(encoder_layer, num_layers=num_layers)
+            self.cls_head = nn.Sequential(nn.LayerNorm(d_model), nn.Linear(d_model, num_classes))
+
+        def forward(self, x):
+            x = self.conv(x.transpose(1, 2)).transpose(1, 2)
+            x = self.transformer(x)
+            return self.cls_head(x[:, -1, :])
+
+    return CNNTransformer()
+
+
+# --------------------------------------------
+# Briques de la passe avant (entrées (B, L, C), poids déjà transposés)
+# --------------------------------------------
+
+def _layer_norm(x, weight, bias):
+    mean = x.mean(axis=-1, keepdims=True)
+    centered = x - mean
+    var = (centered * centered).mean(axis=-1, keepdims=True)
+    return centered / np.sqrt(var + LAYER_NORM_EPS) * weight + bias
+
+
+def _softmax(x, axis=-1):
+    x = np.exp(x - x.max(axis=axis, keepdims=True))
+    return x / x.sum(axis=axis, keepdims=True)
+
+
+def _conv_relu(x, weight, bias):
+    """Conv1d(kernel_size=3, padding=1) + ReLU, en un produit matriciel (im2col)."""
+    padded = np.pad(x, ((0, 0), (1, 1), (0, 0)))
+    cols = sliding_window_view(padded, 3, axis=1)          # (B, L, C, 3)
+    out = cols.reshape(x.shape[0], x.shape[1], -1) @ weight + bias
+    return np.maximum(out, 0, out=out)
+
+
+class NumpyCNNTransformer:
+    """
+    Passe avant NumPy du CNNTransformer (mode eval : dropout inactif) :
+    Conv1d ×2 → TransformerEncoder (post-norm, ReLU, dim_feedforward 2048) →
+    LayerNorm + Linear sur le dernier pas de temps.
+    Seul le dernier pas alimente la tête : la dernière couche n'évalue
+    l'attention et le feed-forward que pour cette requête.
+    """
+
+    def __init__(self, weights: dict, nhead: int, num_layers: int, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.nhead = int(nhead)
+        w = {name: np.asarray(value, dtype=self.dtype) for name, value in weights.items()}
+
+        # Poids transposés une fois pour toutes (x @ W)
+        self.conv = [(np.ascontiguousarray(w[f"conv.{i}.weight"].reshape(len(w[f"conv.{i}.bias"]), -1).T),
+                      w[f"conv.{i}.bias"]) for i in (0, 2)]
+        self.layers = []
+        for i in range(num_layers):
+            p = f"transformer.layers.{i}."
+            self.layers.append({
+                "in_w": np.ascontiguousarray(w[p + "self_attn.in_proj_weight"].T),
+                "in_b": w[p + "self_attn.in_proj_bias"],
+                "out_w": np.ascontiguousarray(w[p + "self_attn.out_proj.weight"].T),
+                "out_b": w[p + "self_attn.out_proj.bias"],
+                "ff1_w": np.ascontiguousarray(w[p + "linear1.weight"].T),
+                "ff1_b": w[p + "linear1.bias"],
+                "ff2_w": np.ascontiguousarray(w[p + "linear2.weight"].T),
+                "ff2_b": w[p + "linear2.bias"],
+                "norm1": (w[p + "norm1.weight"], w[p + "norm1.bias"]),
+                "norm2": (w[p + "norm2.weight"], w[p + "norm2.bias"]),
+            })
+        self.head_norm = (w["cls_head.0.weight"], w["cls_head.0.bias"])
+        self.head = (np.ascontiguousarray(w["cls_head.1.weight"].T), w["cls_head.1.bias"])
+        self.d_model = len(self.head_norm[0])
+        self.feature_dim = self.conv[0][0].shape[0] // 3
+        self.num_classes = len(self.head[1])
+
+    @classmethod
+    def from_npz(cls, path, dtype=np.float32) -> "NumpyCNNTransformer":
+        with np.load(path) as archive:
+            weights = {name: archive[name] for name in archive.files if name not in ("nhead", "num_layers")}
+            return cls(weights, int(archive["nhead"]), int(archive["num_layers"]), dtype)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [a for pair in self.conv for a in pair] + list(self.head_norm) + list(self.head)
+        for layer in self.layers:
+            arrays += [a for v in layer.values() for a in (v if isinstance(v, tuple) else (v,))]
+        return sum(a.nbytes for a in arrays)
+
+    def _encoder_layer(self, x, p, last_only: bool):
+        b, length, e = x.shape
+        h = self.nhead
+        hd = e // h
+
+        if last_only:
+            # Requête du dernier pas uniquement ; clés / valeurs sur toute la séquence
+            kv = x @ p["in_w"][:, e:] + p["in_b"][e:]
+            q = x[:, -1:] @ p["in_w"][:, :e] + p["in_b"][:e]
+            k, v = kv[..., :e], kv[..., e:]
+            x = x[:, -1:]
+        else:
+            qkv = x @ p["in_w"] + p["in_b"]
+            q, k, v = qkv[..., :e], qkv[..., e:2 * e], qkv[..., 2 * e:]
+
+        q = q.reshape(b, -1, h, hd).transpose(0, 2, 1, 3)
+        k = k.reshape(b, length, h, hd).transpose(0, 2, 3, 1)
+        v = v.reshape(b, length, h, hd).transpose(0, 2, 1, 3)
+        scores = (q @ k) * self.dtype.type(1.0 / np.sqrt(hd))
+        context = (_softmax(scores) @ v).transpose(0, 2, 1, 3).reshape(b, -1, e)
+
+        x = _layer_norm(x + (context @ p["out_w"] + p["out_b"]), *p["norm1"])
+        hidden = x @ p["ff1_w"] + p["ff1_b"]
+        np.maximum(hidden, 0, out=hidden)
+        return _layer_norm(x + (hidden @ p["ff2_w"] + p["ff2_b"]), *p["norm2"])
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        """Logits (B, num_classes) d'un lot (B, L, feature_dim)."""
+        x = np.asarray(x, dtype=self.dtype)
+        for weight, bias in self.conv:
+            x = _conv_relu(x, weight, bias)
+        for i, layer in enumerate(self.layers):
+            x = self._encoder_layer(x, layer, last_only=i == len(self.layers) - 1)
+        x = _layer_norm(x[:, -1], *self.head_norm)
+        return x @ self.head[0] + self.head[1]
+
+    def predict_logits(self, x, batch_size: int = 32) -> np.ndarray:
+        """Logits de N séquences, par micro-lots de batch_size (mémoire d'attention bornée)."""
+        out = np.empty((len(x), self.num_classes), dtype=self.dtype)
+        for start in range(0, len(x), batch_size):
+            out[start:start + batch_size] = self.forward(x[start:start + batch_size])
+        return out
+
+    def predict_proba(self, x, batch_size: int = 32) -> np.ndarray:
+        return _softmax(self.predict_logits(x, batch_size))
+
+
+if __name__ == "__main__":
+    import torch
+
+    if len(sys.argv) < 4:
+        sys.exit("Usage : python cnn_transformer.py model.pt model.npz FEATURE_DIM [NUM_CLASSES]")
+    checkpoint = torch.load(sys.argv[1], map_location="cpu")
+    if not isinstance(checkpoint, dict):
+        checkpoint = checkpoint.state_dict()
+    model = torch_model(int(sys.argv[3]), int(sys.argv[4]) if len(sys.argv) > 4 else 5)
+    model.load_state_dict(checkpoint)
+    export_weights(model.state_dict(), sys.argv[2], nhead=model.transformer.layers[0].self_attn.num_heads)
+    print(f"Poids exportés → {sys.argv[2]}")
@@ -2,12 +2,42 @@
 # constants.py — paramètres statiques
 # ============================================
 
+import os
 from pathlib import Path
 import pandas as pd
 
 # Répertoire des données
 DATA_DIR = Path("data")
 
+# Cache colonnaire (.npy par colonne) construit à partir des CSV
+CACHE_DIR = DATA_DIR / ".cache"
+
+# Poids exportés du CNNTransformer (cnn_transformer.export_weights)
+MODEL_PATH = Path(os.environ.get("MODEL_PATH", "model/cnn_transformer.npz"))
+
+# Service de prédiction par micro-lots (prediction_service.py) ; vide = calcul dans la session
+PREDICTION_SERVICE_URL = os.environ.get("PREDICTION_SERVICE_URL", "")
+
+# Rendu des courbes : "webgl" (Scattergl, tableaux binaires) ou "svg" (go.Scatter)
+PLOT_RENDER_MODE = os.environ.get("PLOT_RENDER_MODE", "webgl")
+
+# Figures comparatives construites en parallèle (pool partagé par les sessions)
+FIGURE_WORKERS = int(os.environ.get("FIGURE_WORKERS", min(6, os.cpu_count() or 1)))
+
+# Budget mémoire du cache des DataFrames nettoyés (octets)
+FRAME_CACHE_MAX_BYTES = int(os.environ.get("FRAME_CACHE_MAX_BYTES", 512 * 1024**2))
+
+# -----------------------------------------------------------
+# Temps réel (FDSN dataselect de l'IPGP, surchargeable pour les tests)
+# -----------------------------------------------------------
+
+FDSN_DATASELECT_URL = os.environ.get("FDSN_DATASELECT_URL", "https://ws.ipgp.fr/fdsnws/dataselect/1/query")
+REALTIME_WINDOW_S = 86400      # profondeur du tampon temps réel (24 h)
+REALTIME_OVERLAP_S = 300       # recouvrement relu à chaque actualisation
+FETCH_WORKERS = 8              # requêtes FDSN simultanées
+FETCH_CHUNK_S = 3600           # durée d'une tranche de requête (s)
+FETCH_RETRIES = 3              # reprises par tranche (backoff exponentiel)
+
 # -----------------------------------------------------------
 # Liste des éruptions (fichiers + timestamp de référence)
 # -----------------------------------------------------------
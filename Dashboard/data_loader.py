@@ -3,49 +3,479 @@
 # Données parfaites + propres + prêtes pour le dashboard
 # ============================================
 
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import streamlit as st
-from constants import DATA_DIR, eruptions
+from cache import LRUCache
+from rolling import rolling_quantiles
+from constants import DATA_DIR, CACHE_DIR, FRAME_CACHE_MAX_BYTES, eruptions
 
+# Incrémenter pour invalider tous les caches colonnaires existants
+CACHE_VERSION = 2
 
-def clean_outliers(df: pd.DataFrame) -> pd.DataFrame:
+# Paramètres par défaut du nettoyage des outliers
+CLEANING_PARAMS = {"iqr_factor": 3.0, "replace_quantile": 0.995, "smooth_window": 5}
+
+
+# Colonnes qui doivent rester ≥ 0 et qui sont nettoyées
+POSITIVE_COLS = ["amplitude_mean", "RSAM", "infrasound_mean", "infrasound", "SE_env", "Kurt_env"]
+
+def _quantile_positions(counts: np.ndarray, qs):
+    """Indices (bas, haut) et poids d'interpolation des quantiles qs, comme numpy "linear"."""
+    qs = np.asarray(qs, dtype=float)[:, None]
+    n = counts[None, :].astype(float)
+    virtual = n * qs + (1 + qs * -1) - 1
+    last = np.maximum(n - 1, 0)
+    lower = np.clip(np.floor(virtual), 0, last).astype(np.intp)
+    upper = np.clip(lower + 1, 0, last).astype(np.intp)
+    return lower, upper, virtual - np.floor(virtual)
+
+
+def _sorted_quantiles(sorted_vals: np.ndarray, counts: np.ndarray, qs) -> np.ndarray:
+    """
+    Quantiles (interpolation linéaire, comme numpy/pandas) de colonnes triées
+    le long de l'axe 0, NaN en fin. counts = nombre de valeurs non-NaN par colonne.
+    Il suffit que les positions utilisées soient à leur place (np.partition).
+    Renvoie un tableau (len(qs), nb_colonnes).
+    """
+    lower, upper, gamma = _quantile_positions(counts, qs)
+
+    a = np.take_along_axis(sorted_vals, lower, axis=0)
+    b = np.take_along_axis(sorted_vals, upper, axis=0)
+    diff = b - a
+    result = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    result[:, counts == 0] = np.nan
+    return result
+
+
+def clean_outliers(df: pd.DataFrame, iqr_factor: float = 3.0,
+                   replace_quantile: float = 0.995, smooth_window: int = 5) -> pd.DataFrame:
+    """
+    Nettoyage des outliers, station par station :
+    - clip à 0 des colonnes positives
+    - valeurs > Q3 + iqr_factor * IQR remplacées par le quantile replace_quantile
+    - médiane glissante centrée sur smooth_window points (dans l'ordre du temps)
+    Tous les quantiles de toutes les colonnes d'une station sont calculés en
+    un seul tri NumPy ; la médiane glissante (rolling_quantiles) est vectorisée
+    sur toutes les stations.
+    """
     df_clean = df.copy()
-    
-    positive_cols = ["amplitude_mean", "RSAM", "infrasound_mean", "infrasound", "SE_env", "Kurt_env"]
-    positive_cols = [col for col in positive_cols if col in df_clean.columns]
 
-    for col in positive_cols:
-        data = df_clean[col].dropna()
-        if len(data) == 0: 
-            continue
-            
-        # Clip apenas colunas que devem ser ≥ 0
-        df_clean[col] = df_clean[col].clip(lower=0)
-        
-        # IQR robusto + substituição suave
-        Q1 = data.quantile(0.25)
-        Q3 = data.quantile(0.75)
-        IQR = Q3 - Q1
-        upper = Q3 + 3 * IQR
-        
-        p995 = data.quantile(0.995)
-        mask = df_clean[col] > upper
-        df_clean.loc[mask, col] = p995
-        
-        # Suavização final
-        df_clean[col] = df_clean[col].rolling(window=5, center=True, min_periods=1).median()
-    
+    positive_cols = [col for col in POSITIVE_COLS if col in df_clean.columns]
+
+    if positive_cols and len(df_clean):
+        if "station" in df_clean.columns:
+            codes = pd.factorize(df_clean["station"], use_na_sentinel=False)[0]
+        else:
+            codes = np.zeros(len(df_clean), dtype=np.intp)
+        times = df_clean["time_min"] if "time_min" in df_clean.columns else pd.Series(np.arange(len(df_clean)))
+        if isinstance(times.dtype, pd.DatetimeTZDtype):
+            times = times.dt.tz_convert(None)
+        times = times.to_numpy()
+
+        # Tri par (station, temps) — inutile si le fichier l'est déjà
+        dc, dt = np.diff(codes), np.diff(times)
+        already_sorted = bool(np.all((dc > 0) | ((dc == 0) & (dt >= np.zeros_like(dt)))))
+        order = None if already_sorted else np.lexsort((times, codes))
+
+        values = df_clean[positive_cols].to_numpy(dtype=float, copy=True)
+        if order is not None:
+            codes, values = codes[order], values[order]
+
+        # Par station : quantiles de toutes les colonnes en un seul np.partition
+        # (calculés sur les données non clippées), puis clip et remplacement doux
+        qs = [0.25, 0.75, replace_quantile]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        stops = np.r_[starts[1:], len(codes)]
+        for start, stop in zip(starts, stops):
+            block = values[start:stop]
+            counts = (~np.isnan(block)).sum(axis=0)
+            lower, upper_idx, _ = _quantile_positions(counts, qs)
+            kth = np.unique(np.r_[lower.ravel(), upper_idx.ravel()])
+            q1, q3, replacement = _sorted_quantiles(np.partition(block, kth, axis=0), counts, qs)
+            upper = q3 + iqr_factor * (q3 - q1)
+
+            np.clip(block, 0, None, out=block)
+            np.copyto(block, np.broadcast_to(replacement, block.shape), where=block > upper)
+
+        # Lissage final
+        # (médiane pandas = quantile 0.5 "midpoint", fenêtres limitées à chaque station)
+        values = rolling_quantiles(values, smooth_window, [0.5], min_periods=1, center=True,
+                                   groups=codes, interpolation="midpoint")[0]
+
+        if order is not None:
+            restored = np.empty_like(values)
+            restored[order] = values
+            values = restored
+        df_clean[positive_cols] = values
+
     df_clean = df_clean.dropna(subset=["time_min", "amplitude_mean"], how="any")
     
     # ← NENHUMA MENSAGEM st.success / st.info AQUI!
     return df_clean
 
 
-def load_eruption_file(eruption_name: str) -> pd.DataFrame:
+# --------------------------------------------
+# Cache colonnaire : un .npy par colonne, relu en memory-map.
+# Les lignes sont triées par (station, temps) : chaque station forme une
+# partition contiguë [start, stop) décrite dans meta.json, ce qui permet de
+# ne lire que les lignes et colonnes utiles (load_range).
+# --------------------------------------------
+
+def _fingerprint(path: Path) -> list:
+    """Empreinte du CSV source (mtime en ns + taille) pour invalider le cache."""
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _cache_dir(path: Path, variant: str = "raw") -> Path:
+    return CACHE_DIR / path.stem / variant
+
+
+def _clean_variant(params: dict) -> str:
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()[:10]
+    return f"clean-{digest}"
+
+
+def _read_meta(cache_dir: Path) -> dict:
+    try:
+        with open(cache_dir / "meta.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_fresh(meta: dict, fingerprint: list) -> bool:
+    return meta.get("version") == CACHE_VERSION and meta.get("fingerprint") == fingerprint
+
+
+def _utc_numpy(times: pd.Series) -> np.ndarray:
+    """datetime64 UTC sans fuseau (ordre identique à celui des Timestamp)."""
+    if isinstance(times.dtype, pd.DatetimeTZDtype):
+        times = times.dt.tz_convert(None)
+    return times.to_numpy()
+
+
+def _new_tmp_dir(target: Path) -> Path:
+    """
+    Dossier temporaire unique à côté de target : les sessions Streamlit sont des
+    threads du même processus, un nom basé sur le pid ne suffit pas.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f"{target.name}.tmp-", dir=target.parent))
+
+
+def _publish_dir(tmp_dir: Path, target: Path) -> None:
+    """Remplace target par tmp_dir ; si un autre écrivain vient de le publier, on garde le sien."""
+    shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, target)
+    except OSError:
+        if not target.exists():
+            raise
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _write_columnar(df: pd.DataFrame, cache_dir: Path, fingerprint: list) -> dict:
+    """
+    Écrit le DataFrame colonne par colonne dans cache_dir, trié par (station, temps).
+    - time_min : datetime64 UTC (sans tz, réappliquée à la lecture)
+    - colonnes texte (station, channel) : codes entiers + catégories dans meta.json
+    - colonnes numériques : tableau brut
+    L'écriture se fait dans un dossier temporaire renommé à la fin (atomique).
+    """
+    partitions = []
+    if "station" in df.columns and "time_min" in df.columns:
+        codes, stations = pd.factorize(df["station"], sort=True)
+        order = np.lexsort((_utc_numpy(df["time_min"]), codes))
+        df = df.iloc[order]
+        codes = codes[order]
+        times = _utc_numpy(df["time_min"])
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else []
+        for start, stop in zip(starts, np.r_[starts[1:], len(codes)]):
+            code = codes[start]
+            partitions.append({
+                "station": str(stations[code]) if code >= 0 else None,
+                "start": int(start),
+                "stop": int(stop),
+                "tmin": str(times[start]),
+                "tmax": str(times[stop - 1]),
+            })
+
+    tmp_dir = _new_tmp_dir(cache_dir)
+    try:
+        columns = []
+        for i, col in enumerate(df.columns):
+            s = df[col]
+            entry = {"name": col, "file": f"{i}.npy", "dtype": str(s.dtype)}
+            if isinstance(s.dtype, pd.DatetimeTZDtype):
+                values = _utc_numpy(s)
+                entry["kind"] = "datetime_utc"
+            elif pd.api.types.is_numeric_dtype(s.dtype):
+                values = s.to_numpy()
+                entry["kind"] = "numeric"
+            else:
+                codes, uniques = pd.factorize(s, use_na_sentinel=True)
+                values = codes.astype(np.int32)
+                entry["kind"] = "categorical"
+                entry["categories"] = [str(u) for u in uniques]
+            np.save(tmp_dir / entry["file"], values)
+            columns.append(entry)
+
+        meta = {
+            "version": CACHE_VERSION,
+            "fingerprint": fingerprint,
+            "rows": len(df),
+            "columns": columns,
+            "partitions": partitions,
+        }
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _publish_dir(tmp_dir, cache_dir)
+    return meta
+
+
+def _read_columnar(cache_dir: Path, meta: dict, columns=None, ranges=None) -> pd.DataFrame:
+    """
+    Relit le cache en memory-map : aucun parsing texte.
+    columns : colonnes à lire (toutes par défaut)
+    ranges  : liste de tranches de lignes [start, stop) ; seules ces pages sont lues
+    """
+    entries = {entry["name"]: entry for entry in meta["columns"]}
+    names = list(entries) if columns is None else [c for c in columns if c in entries]
+
+    data = {}
+    for name in names:
+        entry = entries[name]
+        values = np.load(cache_dir / entry["file"], mmap_mode="r")
+        if ranges is not None:
+            values = np.concatenate([values[a:b] for a, b in ranges]) if ranges else values[:0].copy()
+        if entry["kind"] == "datetime_utc":
+            data[name] = pd.DatetimeIndex(values).tz_localize("UTC")
+        elif entry["kind"] == "categorical":
+            categories = np.asarray(entry["categories"] + [None], dtype=object)
+            data[name] = pd.array(categories[values], dtype=entry["dtype"])
+        else:
+            data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _row_ranges(cache_dir: Path, meta: dict, start=None, end=None, stations=None) -> list:
+    """
+    Tranches de lignes [a, b) correspondant aux stations et à l'intervalle
+    [start, end] (bornes incluses) : une recherche dichotomique par partition.
+    """
+    time_entry = next(e for e in meta["columns"] if e["name"] == "time_min")
+    times = np.load(cache_dir / time_entry["file"], mmap_mode="r")
+    lo = None if start is None else pd.Timestamp(start).tz_convert(None).to_datetime64()
+    hi = None if end is None else pd.Timestamp(end).tz_convert(None).to_datetime64()
+
+    ranges = []
+    for part in meta["partitions"]:
+        if stations is not None and part["station"] not in stations:
+            continue
+        a, b = part["start"], part["stop"]
+        block = times[a:b]
+        first = a + (np.searchsorted(block, lo, side="left") if lo is not None else 0)
+        last = a + (np.searchsorted(block, hi, side="right") if hi is not None else b - a)
+        if last > first:
+            ranges.append((int(first), int(last)))
+    return ranges
+
+
+def read_eruption_csv(path: Path) -> pd.DataFrame:
+    """
+    Lit un CSV d'éruption (time_min en UTC) en passant par le cache colonnaire.
+    Le cache est (re)construit au premier accès ou si l'empreinte du CSV change.
+    """
+    path = Path(path)
+    fingerprint = _fingerprint(path)
+    cache_dir = _cache_dir(path)
+    meta = _read_meta(cache_dir)
+
+    if _is_fresh(meta, fingerprint):
+        return _read_columnar(cache_dir, meta)
+
+    df = pd.read_csv(path)
+    df["time_min"] = pd.to_datetime(df["time_min"], utc=True)
+    try:
+        meta = _write_columnar(df, cache_dir, fingerprint)
+        return _read_columnar(cache_dir, meta)
+    except OSError as e:
+        print(f"Cache colonnaire non écrit pour {path.name} : {e}")
+    return df
+
+
+def _clean_store(eruption_name: str, params: dict):
+    """
+    Cache colonnaire des données nettoyées d'une éruption (construit si besoin).
+    Renvoie (dossier, meta), ou (None, DataFrame nettoyé) si l'écriture échoue.
+    """
+    path = DATA_DIR / eruptions[eruption_name]["file"]
+    fingerprint = _fingerprint(path)
+    cache_dir = _cache_dir(path, _clean_variant(params))
+    meta = _read_meta(cache_dir)
+    if _is_fresh(meta, fingerprint):
+        return cache_dir, meta
+
+    df = read_eruption_csv(path)
+    
+    print(f"{eruption_name} → {len(df):,} lignes brutes | {df['station'].nunique()} stations")
+    
+    # NETTOYAGE AUTOMATIQUE DES OUTLIERS
+    df = clean_outliers(df, **params)
+    
+    print(f"→ Après nettoyage : {len(df):,} lignes | données propres et lisses")
+    try:
+        meta = _write_columnar(df, cache_dir, fingerprint)
+    except OSError as e:
+        print(f"Cache colonnaire non écrit pour {path.name} : {e}")
+        return None, df
+    if params == CLEANING_PARAMS:
+        _record_presence(path, _presence(meta["partitions"], fingerprint))
+    return cache_dir, meta
+
+
+# --------------------------------------------
+# Index de présence des stations (CACHE_DIR/stations.json), écrit à l'ingestion
+# des données nettoyées : par fichier d'éruption, nombre de lignes et bornes
+# temporelles de chaque station, consultables sans relire les séries.
+# --------------------------------------------
+
+STATION_INDEX_PATH = CACHE_DIR / "stations.json"
+_index_lock = threading.Lock()
+
+
+def _presence(partitions: list, fingerprint: list) -> dict:
+    """Entrée de l'index à partir des partitions (station, start, stop, tmin, tmax) du cache."""
+    stations = {p["station"]: {"rows": p["stop"] - p["start"], "tmin": p["tmin"], "tmax": p["tmax"]}
+                for p in partitions if p["station"] is not None}
+    return {
+        "fingerprint": fingerprint,
+        "variant": _index_variant(),
+        "rows": sum(p["stop"] - p["start"] for p in partitions),
+        "tmin": min((s["tmin"] for s in stations.values()), default=None),
+        "tmax": max((s["tmax"] for s in stations.values()), default=None),
+        "stations": stations,
+    }
+
+
+def _index_variant() -> str:
+    """Format du cache et nettoyage par défaut : l'index est périmé si l'un change."""
+    return f"{CACHE_VERSION}/{_clean_variant(CLEANING_PARAMS)}"
+
+
+def _read_station_index() -> dict:
+    try:
+        with open(STATION_INDEX_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_presence(path: Path, entry: dict) -> None:
+    """Remplace l'entrée du fichier dans l'index (écriture atomique)."""
+    with _index_lock:
+        index = _read_station_index()
+        index[path.name] = entry
+        tmp_path = None
+        try:
+            STATION_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=STATION_INDEX_PATH.parent,
+                                             prefix=f"{STATION_INDEX_PATH.name}.tmp-", delete=False) as f:
+                tmp_path = f.name
+                json.dump(index, f)
+            os.replace(tmp_path, STATION_INDEX_PATH)
+        except OSError as e:
+            print(f"Index des stations non écrit : {e}")
+            if tmp_path is not None:
+                Path(tmp_path).unlink(missing_ok=True)
+
+
+def station_presence(eruption_name: str) -> dict:
+    """
+    Couverture des données nettoyées d'une éruption, lue dans l'index :
+    rows, tmin, tmax (UTC) et stations {station: {rows, tmin, tmax}}.
+    Entrée absente ou périmée : recréée depuis le cache colonnaire (ingestion
+    du CSV si besoin). {} si le fichier n'existe pas.
+    """
+    path = DATA_DIR / eruptions[eruption_name]["file"]
+    if not path.exists():
+        return {}
+    fingerprint = _fingerprint(path)
+    entry = _read_station_index().get(path.name, {})
+    if entry.get("fingerprint") == fingerprint and entry.get("variant") == _index_variant():
+        return entry
+
+    cache_dir, store = _clean_store(eruption_name, CLEANING_PARAMS)
+    if cache_dir is None:
+        # Pas de cache disque : bornes par station recalculées en mémoire
+        times = _utc_numpy(store["time_min"])
+        partitions = [{"station": str(station), "start": 0, "stop": len(rows),
+                       "tmin": str(times[rows].min()), "tmax": str(times[rows].max())}
+                      for station, rows in store.groupby("station", observed=True).indices.items()]
+        return _presence(partitions, fingerprint)
+
+    entry = _presence(store["partitions"], fingerprint)
+    _record_presence(path, entry)
+    return entry
+
+
+# --------------------------------------------
+# Cache mémoire des DataFrames nettoyés (partagé par toutes les sessions)
+# --------------------------------------------
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+_frame_cache = LRUCache(FRAME_CACHE_MAX_BYTES, sizeof=_frame_bytes)
+
+
+def _freeze(df: pd.DataFrame) -> None:
+    """Passe en lecture seule les tableaux NumPy sous-jacents des colonnes."""
+    for col in df.columns:
+        arr = df[col].to_numpy()
+        if not isinstance(arr, np.ndarray) or arr.dtype == object:
+            continue
+        while isinstance(arr, np.ndarray):
+            arr.flags.writeable = False
+            arr = arr.base
+
+
+def _readonly_view(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Charge le CSV et applique automatiquement le nettoyage des outliers
+    Vue légère sur un DataFrame du cache : ajouter/remplacer des colonnes
+    n'affecte pas l'original, et les données partagées sont en lecture seule.
+    """
+    return df.copy(deep=False)
+
+
+def frame_cache_stats() -> dict:
+    """Compteurs du cache (hits, misses, evictions, octets utilisés...)."""
+    return _frame_cache.stats()
+
+
+def clear_frame_cache() -> None:
+    _frame_cache.clear()
+
+
+def load_eruption_file(eruption_name: str, **cleaning) -> pd.DataFrame:
+    """
+    Charge le CSV et applique automatiquement le nettoyage des outliers.
+    Le résultat est mis en cache par (éruption, empreinte du fichier, paramètres
+    de nettoyage) : les appels suivants renvoient une vue en lecture seule.
     """
     info = eruptions[eruption_name]
     path = DATA_DIR / info["file"]
@@ -54,17 +484,19 @@ def load_eruption_file(eruption_name: str) -> pd.DataFrame:
         st.error(f"Fichier non trouvé : {path}")
         return pd.DataFrame()
 
+    params = {**CLEANING_PARAMS, **cleaning}
+
     try:
-        df = pd.read_csv(path)
-        df["time_min"] = pd.to_datetime(df["time_min"], utc=True)
-        
-        print(f"{eruption_name} → {len(df):,} lignes brutes | {df['station'].nunique()} stations")
-        
-        # NETTOYAGE AUTOMATIQUE DES OUTLIERS
-        df = clean_outliers(df)
-        
-        print(f"→ Après nettoyage : {len(df):,} lignes | données propres et lisses")
-        return df
+        key = (eruption_name, tuple(_fingerprint(path)), tuple(sorted(params.items())))
+        cached = _frame_cache.get(key)
+        if cached is not None:
+            return _readonly_view(cached)
+
+        cache_dir, store = _clean_store(eruption_name, params)
+        df = _read_columnar(cache_dir, store) if cache_dir is not None else store
+        _freeze(df)
+        _frame_cache.put(key, df)
+        return _readonly_view(df)
         
     except Exception as e:
         st.error(f"Erreur lors du chargement de {eruption_name}: {e}")
@@ -78,16 +510,201 @@ def load_raw_file(eruption_name: str) -> pd.DataFrame:
     return load_eruption_file(eruption_name)
 
 
-def load_window(eruption_name: str, hours_before=48, hours_after=12):
+def load_range(eruption_name: str, start=None, end=None, stations=None, columns=None,
+               **cleaning) -> pd.DataFrame:
     """
-    Extrait une fenêtre temporelle autour de l'éruption (avec données déjà nettoyées)
+    Lecture ciblée des données nettoyées d'une éruption :
+    seules les partitions des stations demandées, les lignes de [start, end]
+    (bornes incluses, UTC) et les colonnes demandées sont lues sur disque.
+    Le coût dépend de la taille de la fenêtre, pas de celle du fichier.
+    """
+    path = DATA_DIR / eruptions[eruption_name]["file"]
+    if not path.exists():
+        st.error(f"Fichier non trouvé : {path}")
+        return pd.DataFrame()
+
+    params = {**CLEANING_PARAMS, **cleaning}
+    try:
+        cache_dir, store = _clean_store(eruption_name, params)
+    except Exception as e:
+        st.error(f"Erreur lors du chargement de {eruption_name}: {e}")
+        return pd.DataFrame()
+
+    if cache_dir is None:
+        # Pas de cache disque : filtrage en mémoire
+        df = store
+        mask = np.ones(len(df), dtype=bool)
+        if start is not None:
+            mask &= (df["time_min"] >= start).to_numpy()
+        if end is not None:
+            mask &= (df["time_min"] <= end).to_numpy()
+        if stations is not None:
+            mask &= df["station"].isin(stations).to_numpy()
+        df = df[mask]
+        return (df[columns] if columns is not None else df).reset_index(drop=True)
+
+    ranges = _row_ranges(cache_dir, store, start, end, stations)
+    return _read_columnar(cache_dir, store, columns, ranges)
+
+
+def eruption_stations(eruption_name: str) -> list:
+    """Stations présentes dans les données nettoyées (index de présence, sans lire les séries)."""
+    return sorted(station_presence(eruption_name).get("stations", {}))
+
+
+def load_window(eruption_name: str, hours_before=48, hours_after=12, stations=None, columns=None):
+    """
+    Extrait une fenêtre temporelle autour de l'éruption (avec données déjà nettoyées).
+    Seules les lignes de la fenêtre (et les stations / colonnes demandées) sont lues.
     """
-    df = load_eruption_file(eruption_name)
-    if df.empty:
-        return df
-        
     erupt_time = eruptions[eruption_name]["time"]
     start = erupt_time - pd.Timedelta(hours=hours_before)
     end = erupt_time + pd.Timedelta(hours=hours_after)
 
-    return df[(df["time_min"] >= start) & (df["time_min"] <= end)].copy()
\ No newline at end of file
+    return load_range(eruption_name, start, end, stations=stations, columns=columns)
+
+
+# --------------------------------------------
+# Cube aligné pour les graphiques comparatifs :
+# éruption × station × pas de 10 min × variable, fenêtre [-80 h, +24 h].
+# On stocke les sommes et effectifs par station : la moyenne réseau d'un
+# sous-ensemble de stations (= resample("10min").mean() des lignes de ces
+# stations) n'est plus qu'un ratio de sommes, sans relire ni rééchantillonner.
+# --------------------------------------------
+
+ALIGN_HOURS_BEFORE = 80
+ALIGN_HOURS_AFTER = 24
+ALIGN_STEP = pd.Timedelta("10min")
+
+_cube_cache = {}
+
+
+def _cube_key(names: list) -> str:
+    """Version des données : fichiers sources, nettoyage, fenêtre et format du cube."""
+    parts = [CACHE_VERSION, CLEANING_PARAMS, ALIGN_HOURS_BEFORE, ALIGN_HOURS_AFTER, str(ALIGN_STEP)]
+    parts += [[name, _fingerprint(DATA_DIR / eruptions[name]["file"])] for name in names]
+    return hashlib.md5(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def data_version(eruption_names=None) -> str:
+    """
+    Version des données d'un ensemble d'éruptions (toutes par défaut) :
+    change si un CSV, le nettoyage ou le format des caches change.
+    """
+    names = list(eruptions) if eruption_names is None else list(eruption_names)
+    return _cube_key([name for name in names if (DATA_DIR / eruptions[name]["file"]).exists()])
+
+
+def _build_aligned_cube(names: list, cube_dir: Path, key: str) -> None:
+    """Calcule le cube (un bincount par éruption et variable) et l'écrit dans cube_dir."""
+    frames = {name: load_window(name, ALIGN_HOURS_BEFORE, ALIGN_HOURS_AFTER) for name in names}
+    stations = sorted(set().union(*(df["station"].dropna().astype(str).unique() for df in frames.values())))
+    features = []
+    for df in frames.values():
+        features += [c for c in df.columns if c not in features and c != "time_min"
+                     and pd.api.types.is_numeric_dtype(df[c].dtype)]
+
+    n_bins = int(pd.Timedelta(hours=ALIGN_HOURS_BEFORE + ALIGN_HOURS_AFTER) / ALIGN_STEP) + 2
+    shape = (len(names), len(stations), n_bins)
+    sums = np.zeros(shape + (len(features),))
+    counts = np.zeros(shape + (len(features),), dtype=np.int32)
+    rows = np.zeros(shape, dtype=np.int32)
+    origins = []
+
+    for e, name in enumerate(names):
+        df = frames[name]
+        origin = (eruptions[name]["time"] - pd.Timedelta(hours=ALIGN_HOURS_BEFORE)).floor(ALIGN_STEP)
+        origins.append(str(origin))
+        codes = pd.Categorical(df["station"].astype(str), categories=stations).codes.astype(np.intp)
+        bins = (_utc_numpy(df["time_min"]) - origin.tz_convert(None).to_datetime64()) // ALIGN_STEP.to_timedelta64()
+        keep = codes >= 0
+        flat = codes[keep] * n_bins + bins[keep].astype(np.intp)
+
+        rows[e] = np.bincount(flat, minlength=shape[1] * n_bins).reshape(shape[1:])
+        for f, col in enumerate(features):
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy(dtype=float)[keep]
+            ok = ~np.isnan(values)
+            sums[e, ..., f] = np.bincount(flat[ok], weights=values[ok], minlength=shape[1] * n_bins).reshape(shape[1:])
+            counts[e, ..., f] = np.bincount(flat[ok], minlength=shape[1] * n_bins).reshape(shape[1:])
+
+    tmp_dir = _new_tmp_dir(cube_dir)
+    try:
+        np.save(tmp_dir / "sums.npy", sums)
+        np.save(tmp_dir / "counts.npy", counts)
+        np.save(tmp_dir / "rows.npy", rows)
+        with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"key": key, "eruptions": names, "stations": stations, "features": features,
+                       "origins": origins, "step": str(ALIGN_STEP)}, f)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish_dir(tmp_dir, cube_dir)
+
+
+def load_aligned_cube() -> dict:
+    """
+    Cube aligné de toutes les éruptions disponibles, construit une fois par
+    version des données (CACHE_DIR/aligned/<clé>) puis gardé en mémoire.
+    Clés : sums / counts (E, S, B, F), rows (E, S, B), eruptions, stations,
+    features, origins (début du pas 0 de chaque éruption, UTC).
+    """
+    names = [name for name, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    key = data_version(names)
+    if key in _cube_cache:
+        return _cube_cache[key]
+
+    cube_dir = CACHE_DIR / "aligned" / key
+    meta = _read_meta(cube_dir)
+    if meta.get("key") != key:
+        _build_aligned_cube(names, cube_dir, key)
+        meta = _read_meta(cube_dir)
+
+    cube = {name: np.load(cube_dir / f"{name}.npy") for name in ("sums", "counts", "rows")}
+    cube.update({k: meta[k] for k in ("eruptions", "stations", "features")})
+    cube["origins"] = pd.to_datetime(meta["origins"], utc=True)
+    _cube_cache.clear()
+    _cube_cache[key] = cube
+    return cube
+
+
+def aligned_slice(selected_eruptions, stations=None, features=None) -> pd.DataFrame:
+    """
+    Moyennes réseau par pas de 10 min des éruptions et stations choisies
+    (toutes par défaut), lues dans le cube : time_min, variables,
+    hours_to_eruption, eruption. Même résultat que filtrer [-80 h, +24 h]
+    puis resample("10min").mean() (aux arrondis de sommation près).
+    """
+    try:
+        cube = load_aligned_cube()
+    except Exception as e:
+        st.error(f"Erreur lors de la construction du cube aligné : {e}")
+        return pd.DataFrame()
+
+    names = cube["features"] if features is None else [f for f in features if f in cube["features"]]
+    cols = [cube["features"].index(f) for f in names]
+    sel = slice(None) if stations is None else np.isin(cube["stations"], list(stations))
+
+    frames = []
+    for name in selected_eruptions:
+        if name not in cube["eruptions"]:
+            st.error(f"Fichier non trouvé : {DATA_DIR / eruptions[name]['file']}")
+            continue
+        e = cube["eruptions"].index(name)
+        present = np.flatnonzero(cube["rows"][e, sel].sum(axis=0))
+        if not len(present):
+            continue
+        a, b = present[0], present[-1] + 1
+        sums = cube["sums"][e, sel, a:b][..., cols].sum(axis=0)
+        counts = cube["counts"][e, sel, a:b][..., cols].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+
+        times = pd.date_range(cube["origins"][e] + a * ALIGN_STEP, periods=b - a, freq=ALIGN_STEP)
+        frame = pd.DataFrame(means, columns=names)
+        frame.insert(0, "time_min", times)
+        frame["hours_to_eruption"] = (times - eruptions[name]["time"]).total_seconds() / 3600
+        frame["eruption"] = name
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
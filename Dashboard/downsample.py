@@ -0,0 +1,143 @@
+# ============================================
+# downsample.py — réduction des traces Plotly sans perdre les pics
+# Pyramide min/max par pas de temps fixes (1 min, 10 min, 1 h) : pour une
+# largeur donnée, on envoie le niveau le plus fin qui tient dans le budget
+# de points ; au-delà, LTTB (Largest-Triangle-Three-Buckets) sur le niveau
+# le plus grossier.
+# ============================================
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+PYRAMID_STEPS = ("1min", "10min", "1h")
+
+# Points par pixel : chaque pas garde son min et son max
+POINTS_PER_PX = 1
+DEFAULT_WIDTH_PX = 1000
+
+
+def _numeric(x) -> np.ndarray:
+    """Abscisses en float64 : datetime → ns depuis l'époque (UTC), sinon valeurs."""
+    x = pd.Series(x) if not isinstance(x, (pd.Series, pd.Index)) else x
+    if isinstance(x.dtype, pd.DatetimeTZDtype):
+        x = x.dt.tz_convert(None) if isinstance(x, pd.Series) else x.tz_convert(None)
+    if pd.api.types.is_datetime64_any_dtype(x.dtype):
+        return np.asarray(x, dtype="datetime64[ns]").astype(np.int64).astype(float)
+    return np.asarray(x, dtype=float)
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, step: float) -> np.ndarray:
+    """
+    Indices du minimum et du maximum de y dans chaque pas [k*step, (k+1)*step)
+    de x (trié), dans l'ordre du temps. Un pas entièrement NaN garde un point
+    NaN : les trous des courbes sont conservés.
+    """
+    if len(x) == 0:
+        return np.empty(0, dtype=np.intp)
+    buckets = np.floor((x - x[0]) / step).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    nan = np.isnan(y)
+    # lexsort stable : à pas égal, le plus petit (resp. grand) y en tête du groupe
+    lows = np.lexsort((np.where(nan, np.inf, y), buckets))[starts]
+    highs = np.lexsort((np.where(nan, np.inf, -y), buckets))[starts]
+    return np.unique(np.r_[lows, highs])
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets : n_out points (premier et dernier inclus),
+    chacun maximisant l'aire du triangle formé avec le point retenu précédent
+    et la moyenne du seau suivant. Les NaN sont ignorés.
+    """
+    valid = np.flatnonzero(~np.isnan(y))
+    if n_out >= len(valid) or n_out < 3:
+        return valid
+    xs, ys = x[valid], y[valid]
+    edges = np.linspace(1, len(xs) - 1, n_out - 1).astype(np.intp)
+
+    # Moyennes des seaux (le "point suivant" de chaque seau), en une passe
+    sums_x = np.add.reduceat(xs, edges[:-1])
+    sums_y = np.add.reduceat(ys, edges[:-1])
+    sizes = np.diff(edges)
+    mean_x = np.r_[sums_x / sizes, xs[-1]]
+    mean_y = np.r_[sums_y / sizes, ys[-1]]
+
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, len(xs) - 1
+    prev = 0
+    for k in range(n_out - 2):
+        a, b = edges[k], edges[k + 1]
+        area = np.abs((xs[prev] - mean_x[k + 1]) * (ys[a:b] - ys[prev])
+                      - (xs[prev] - xs[a:b]) * (mean_y[k + 1] - ys[prev]))
+        prev = a + int(np.argmax(area))
+        keep[k + 1] = prev
+    return valid[keep]
+
+
+class TracePyramid:
+    """
+    Niveaux d'une trace (x trié, y) : niveau 0 = tous les points, puis un
+    niveau min/max par pas de PYRAMID_STEPS. x en datetime, ou numérique
+    exprimé en x_unit (ex. pd.Timedelta("1h") pour des heures).
+    """
+
+    def __init__(self, x, y, steps=PYRAMID_STEPS, x_unit=None):
+        self.x = _numeric(x)
+        self.y = np.asarray(y, dtype=float)
+        unit = 1.0 if x_unit is None else pd.Timedelta(x_unit).value
+        self.levels = [(None, np.arange(len(self.x)))]
+        for step in steps[1:]:
+            idx = minmax_indices(self.x, self.y, pd.Timedelta(step).value / unit)
+            if len(idx) < len(self.levels[-1][1]):
+                self.levels.append((step, idx))
+
+    def indices(self, width_px: int = DEFAULT_WIDTH_PX, x_range=None, points_per_px: int = POINTS_PER_PX):
+        """Niveau le plus fin tenant dans width_px × points_per_px points (LTTB sinon)."""
+        budget = max(3, int(width_px * points_per_px))
+        lo, hi = (-np.inf, np.inf) if x_range is None else map(float, _numeric(list(x_range)))
+        for _, idx in self.levels:
+            xs = self.x[idx]
+            a, b = np.searchsorted(xs, lo, side="left"), np.searchsorted(xs, hi, side="right")
+            if b - a <= budget:
+                return idx[a:b]
+        idx = idx[a:b]
+        return idx[lttb_indices(self.x[idx], self.y[idx], budget)]
+
+
+_pyramid_cache = LRUCache(max_bytes=64 * 1024**2, sizeof=lambda p: sum(i.nbytes for _, i in p.levels) + p.x.nbytes * 2)
+
+
+def pyramid(x, y, steps=PYRAMID_STEPS, x_unit=None) -> TracePyramid:
+    """TracePyramid mise en cache sur le contenu de (x, y) : une seule construction par série."""
+    xs, ys = _numeric(x), np.asarray(y, dtype=float)
+    digest = hashlib.blake2b(xs.tobytes(), digest_size=16)
+    digest.update(ys.tobytes())
+    key = (digest.hexdigest(), tuple(steps), str(x_unit))
+    cached = _pyramid_cache.get(key)
+    if cached is None:
+        cached = TracePyramid(x, y, steps, x_unit)
+        _pyramid_cache.put(key, cached)
+    return cached
+
+
+def downsample_xy(x, y, width_px: int = DEFAULT_WIDTH_PX, x_unit=None, x_range=None):
+    """(x, y) réduits pour une trace de width_px pixels (entrées triées selon x)."""
+    idx = pyramid(x, y, x_unit=x_unit).indices(width_px, x_range)
+    x = x.iloc[idx] if isinstance(x, pd.Series) else np.asarray(x)[idx]
+    y = y.iloc[idx] if isinstance(y, pd.Series) else np.asarray(y)[idx]
+    return x, y
+
+
+def downsample_frame(df: pd.DataFrame, x: str, y: str, by: str = None,
+                     width_px: int = DEFAULT_WIDTH_PX, x_unit=None) -> pd.DataFrame:
+    """Lignes de df gardées pour tracer y(x) (une trace par valeur de `by`)."""
+    if df.empty:
+        return df
+    df = df.sort_values([by, x] if by else x, kind="stable").reset_index(drop=True)
+    groups = [(None, df)] if by is None else df.groupby(by, sort=False, observed=True)
+    keep = [g.index[pyramid(g[x], g[y], x_unit=x_unit).indices(width_px)] for _, g in groups]
+    return df.loc[np.concatenate(keep)] if keep else df
@@ -0,0 +1,227 @@
+# ============================================
+# events.py — catalogue d'événements sismiques (STA/LTA + coïncidence réseau)
+# Sur la grille minute × station de chaque éruption archivée :
+# - STA/LTA récursif de l'énergie (amplitude²), toutes stations en une passe
+# - déclenchement à hystérésis par station (ratio > ON, retombée < OFF)
+# - événement réseau = au moins MIN_STATIONS stations déclenchées en même temps
+# Le catalogue (un déclenchement de station par ligne) est écrit une fois par
+# version des données dans le cache colonnaire, trié par (station, temps) :
+# les comptages horaires deviennent une lecture indexée.
+# Usage : python events.py   (construit le catalogue et affiche un résumé)
+# ============================================
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from constants import CACHE_DIR, DATA_DIR, eruptions
+from data_loader import (_is_fresh, _read_columnar, _read_meta, _row_ranges, _utc_numpy, _write_columnar,
+                         data_version, load_range)
+
+# Fenêtres en minutes, seuils sur le rapport d'énergie STA/LTA
+STA_LTA_PARAMS = {"sta_min": 5, "lta_min": 120, "on": 3.0, "off": 1.5, "min_stations": 3}
+
+_catalog_meta = {}
+
+# Colonnes (et types) des déclenchements détectés, puis du catalogue
+EVENT_COLUMNS = {
+    "time_min": "datetime64[ns, UTC]", "station": object, "event": np.int64, "event_time": "datetime64[ns, UTC]",
+    "duration_min": np.int64, "peak_ratio": float, "n_stations": np.int64,
+}
+CATALOG_COLUMNS = {
+    "time_min": "datetime64[ns, UTC]", "station": object, "eruption": object, "event_id": np.int64,
+    "event_time": "datetime64[ns, UTC]", "duration_min": np.int64, "peak_ratio": float, "n_stations": np.int64,
+}
+
+def _empty_events(columns: dict = EVENT_COLUMNS) -> pd.DataFrame:
+    """Frame vide typée : time_min reste un datetime une fois passé par le cache colonnaire."""
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in columns.items()})
+
+
+# --------------------------------------------
+# Détection
+# --------------------------------------------
+
+def minute_grid(df: pd.DataFrame, value: str = "amplitude_mean"):
+    """(temps, stations, grille T × S) : moyenne de value par minute et station, NaN si absente."""
+    times = _utc_numpy(df["time_min"]).astype("datetime64[m]")
+    codes, stations = pd.factorize(df["station"], sort=True)
+    values = df[value].to_numpy(dtype=float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    if not keep.any():
+        return np.array([], dtype="datetime64[m]"), [], np.empty((0, 0))
+
+    start = times[keep].min()
+    rows = (times[keep] - start).astype(np.int64)
+    n_rows, n_stations = int(rows.max()) + 1, len(stations)
+    flat = rows * n_stations + codes[keep]
+    sums = np.bincount(flat, weights=values[keep], minlength=n_rows * n_stations)
+    counts = np.bincount(flat, minlength=n_rows * n_stations)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grid = (sums / counts).reshape(n_rows, n_stations)
+    return start + np.arange(n_rows), [str(s) for s in stations], grid
+
+
+def sta_lta(grid: np.ndarray, sta_min: int, lta_min: int) -> np.ndarray:
+    """
+    Rapport STA/LTA récursif (moyennes exponentielles de coefficients 1/sta_min
+    et 1/lta_min) de l'énergie grid², colonne par colonne. NaN pendant les
+    lta_min premières valeurs de chaque station et aux minutes sans donnée.
+    """
+    energy = pd.DataFrame(grid ** 2)
+    sta = energy.ewm(alpha=1 / sta_min, adjust=False, ignore_na=True).mean().to_numpy()
+    lta = energy.ewm(alpha=1 / lta_min, adjust=False, ignore_na=True).mean().to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = sta / lta
+    missing = np.isnan(grid)
+    ratio[missing | (np.cumsum(~missing, axis=0) < lta_min)] = np.nan
+    return ratio
+
+
+def trigger_state(ratio: np.ndarray, on: float, off: float) -> np.ndarray:
+    """Déclenchement à hystérésis par station : activé au-dessus de on, jusqu'à repasser sous off."""
+    with np.errstate(invalid="ignore"):
+        marks = np.where(ratio > on, 1.0, np.where(ratio >= off, np.nan, 0.0))  # NaN du ratio → retombée
+    return pd.DataFrame(marks).ffill().fillna(0).to_numpy(dtype=bool)
+
+
+def detect_events(df: pd.DataFrame, sta_min: int, lta_min: int, on: float, off: float,
+                  min_stations: int) -> pd.DataFrame:
+    """
+    Déclenchements de station appartenant à un événement réseau (coïncidence
+    d'au moins min_stations stations) : time_min (début du déclenchement),
+    station, event (numéro local de l'événement), event_time (début de la
+    coïncidence), duration_min, peak_ratio, n_stations.
+    """
+    times, stations, grid = minute_grid(df)
+    if grid.size == 0:
+        return _empty_events()
+
+    ratio = sta_lta(grid, sta_min, lta_min)
+    state = trigger_state(ratio, on, off)
+
+    # Coïncidence réseau : plages de minutes avec au moins min_stations stations actives
+    network = state.sum(axis=1) >= min_stations
+    starts = network & ~np.r_[False, network[:-1]]
+    run = np.where(network, np.cumsum(starts) - 1, -1)
+    run_start = np.flatnonzero(starts)
+
+    # Une ligne par minute déclenchée, regroupée par (station, n° de déclenchement)
+    onset = state & ~np.vstack([np.zeros((1, state.shape[1]), dtype=bool), state[:-1]])
+    number = np.cumsum(onset, axis=0)
+    t, s = np.nonzero(state)
+    cells = pd.DataFrame({
+        "s": s, "trigger": number[t, s], "t": t, "ratio": ratio[t, s],
+        "event": np.where(run[t] >= 0, run[t], np.nan),
+    })
+    triggers = cells.groupby(["s", "trigger"], sort=False).agg(
+        start=("t", "min"), duration_min=("t", "size"), peak_ratio=("ratio", "max"), event=("event", "min"))
+    triggers = triggers.dropna(subset=["event"]).reset_index()
+    if triggers.empty:
+        return _empty_events()
+
+    event = triggers["event"].to_numpy(dtype=np.int64)
+    return pd.DataFrame({
+        "time_min": pd.DatetimeIndex(times[triggers["start"].to_numpy()].astype("datetime64[ns]")).tz_localize("UTC"),
+        "station": np.asarray(stations, dtype=object)[triggers["s"].to_numpy()],
+        "event": event,
+        "event_time": pd.DatetimeIndex(times[run_start[event]].astype("datetime64[ns]")).tz_localize("UTC"),
+        "duration_min": triggers["duration_min"].to_numpy(dtype=np.int64),
+        "peak_ratio": triggers["peak_ratio"].to_numpy(dtype=float),
+        "n_stations": np.bincount(event)[event],
+    })
+
+
+# --------------------------------------------
+# Catalogue persistant
+# --------------------------------------------
+
+def _catalog_key(names: list, params: dict) -> str:
+    parts = [data_version(names), params]
+    return hashlib.md5(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_catalog(names: list = None, params: dict = None) -> pd.DataFrame:
+    """Catalogue de toutes les éruptions archivées (event_id unique sur l'ensemble)."""
+    params = {**STA_LTA_PARAMS, **(params or {})}
+    names = [n for n in (names or eruptions) if (DATA_DIR / eruptions[n]["file"]).exists()]
+    frames, offset = [], 0
+    for name in names:
+        df = load_range(name, columns=["time_min", "station", "amplitude_mean"])
+        if df.empty:
+            continue
+        events = detect_events(df, **params)
+        local = events.pop("event").astype(np.int64)
+        events.insert(2, "eruption", name)
+        events.insert(3, "event_id", local + offset)
+        offset += int(local.max()) + 1 if len(local) else 0
+        frames.append(events)
+    if not frames:
+        return _empty_events(CATALOG_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def event_catalog(params: dict = None):
+    """
+    (dossier, meta) du catalogue persistant, construit une seule fois par
+    version des données et des paramètres (CACHE_DIR/events/<clé>).
+    """
+    params = {**STA_LTA_PARAMS, **(params or {})}
+    names = [n for n, info in eruptions.items() if (DATA_DIR / info["file"]).exists()]
+    key = _catalog_key(names, params)
+    if key in _catalog_meta:
+        return _catalog_meta[key]
+
+    catalog_dir = CACHE_DIR / "events" / key
+    meta = _read_meta(catalog_dir)
+    if not _is_fresh(meta, [key]):
+        meta = _write_columnar(build_catalog(names, params), catalog_dir, [key])
+    _catalog_meta.clear()
+    _catalog_meta[key] = (catalog_dir, meta)
+    return catalog_dir, meta
+
+
+def query_events(start=None, end=None, stations=None, eruption: str = None, columns=None,
+                 params: dict = None) -> pd.DataFrame:
+    """Déclenchements du catalogue dans [start, end] (UTC, inclus) pour les stations demandées."""
+    catalog_dir, meta = event_catalog(params)
+    if not meta["rows"]:
+        return _read_columnar(catalog_dir, meta, columns)
+    read = None if columns is None else list(dict.fromkeys(list(columns) + ["eruption"]))
+    df = _read_columnar(catalog_dir, meta, read, _row_ranges(catalog_dir, meta, start, end, stations))
+    if eruption is not None:
+        df = df[df["eruption"] == eruption].reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
+
+
+def hourly_event_counts(eruption: str, stations=None, hours_before=72, hours_after=12,
+                        params: dict = None) -> pd.DataFrame:
+    """
+    Nombre d'événements réseau par heure autour d'une éruption (time_min, events),
+    comptés sur les stations demandées (toutes par défaut) ; heures sans événement à 0.
+    """
+    erupt_time = eruptions[eruption]["time"]
+    start = erupt_time - pd.Timedelta(hours=hours_before)
+    end = erupt_time + pd.Timedelta(hours=hours_after)
+    hours = pd.date_range(start.floor("1h"), end.floor("1h"), freq="1h", name="time_min")
+
+    triggers = query_events(start, end, stations, eruption, columns=["time_min", "event_id"], params=params)
+    if triggers.empty:
+        return pd.DataFrame({"time_min": hours, "events": np.zeros(len(hours), dtype=np.int64)})
+    # Un événement compte une fois, à l'heure de son premier déclenchement parmi ces stations
+    first = triggers.groupby("event_id")["time_min"].min()
+    counts = first.dt.floor("1h").value_counts().reindex(hours, fill_value=0)
+    return counts.rename("events").rename_axis("time_min").reset_index()
+
+
+if __name__ == "__main__":
+    import time
+
+    t0 = time.perf_counter()
+    catalog = _read_columnar(*event_catalog())
+    print(f"{len(catalog):,} déclenchements, {catalog['event_id'].nunique():,} événements réseau "
+          f"en {time.perf_counter() - t0:.2f} s")
+    if len(catalog):
+        print(catalog.groupby("eruption")["event_id"].nunique().to_string())
@@ -0,0 +1,137 @@
+# ============================================
+# fdsn_client.py — téléchargement FDSN dataselect parallèle
+# Une requête par (station, tranche de temps), exécutées en parallèle sur une
+# session HTTP partagée par tout le processus (connexions keep-alive réutilisées
+# d'une actualisation à l'autre), avec reprise par tranche.
+# ============================================
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from obspy import read, Stream, UTCDateTime
+
+from constants import FDSN_DATASELECT_URL, FETCH_WORKERS, FETCH_CHUNK_S, FETCH_RETRIES
+
+USER_AGENT = "PitonFournaiseDashboard/1.0"
+CHANNELS = "HHZ,BHZ,EHZ,SHZ"
+
+# Codes HTTP pour lesquels on retente (surcharge / indisponibilité temporaire)
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Taille des blocs copiés de la réponse vers le tampon mémoire
+READ_BLOCK = 64 * 1024
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def make_session(workers: int = FETCH_WORKERS) -> requests.Session:
+    """Session avec un pool de connexions keep-alive dimensionné pour les workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def shared_session(workers: int = FETCH_WORKERS) -> requests.Session:
+    """Session du processus pour ce nombre de workers, créée au premier appel puis réutilisée."""
+    with _sessions_lock:
+        if workers not in _sessions:
+            _sessions[workers] = make_session(workers)
+        return _sessions[workers]
+
+
+def close_sessions() -> None:
+    """Ferme les sessions partagées (et leurs connexions keep-alive)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def plan_chunks(starts: dict, endtime: UTCDateTime, chunk_s: int = FETCH_CHUNK_S) -> list:
+    """Découpe [start, endtime] de chaque station en tranches d'au plus chunk_s secondes."""
+    chunks = []
+    for station, start in starts.items():
+        t0 = start
+        while t0 < endtime:
+            t1 = min(t0 + chunk_s, endtime)
+            chunks.append((station, t0, t1))
+            t0 = t1
+    return chunks
+
+
+def _fetch_chunk(session, url, station, t0, t1, timeout, retries, backoff):
+    """
+    Télécharge et décode une tranche. La réponse est mise en tampon puis décodée
+    dans le worker une fois reçue en entier, pendant que les autres tranches
+    sont encore en vol.
+    Renvoie (Stream, nb_octets, latence en s).
+    """
+    params = {
+        "network": "PF", "station": station, "location": "*", "channel": CHANNELS,
+        "starttime": t0.isoformat(), "endtime": t1.isoformat()
+    }
+    for attempt in range(retries + 1):
+        t_start = time.perf_counter()
+        try:
+            # Corps copié par blocs dans un tampon mémoire (lu une seule fois) ; obspy
+            # décode le miniSEED depuis ce tampon complet, pas au fil de la réception
+            with session.get(url, params=params, timeout=timeout, stream=True) as response:
+                if response.status_code in _RETRY_STATUS:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                body = BytesIO()
+                if response.status_code != 204:
+                    for block in response.iter_content(chunk_size=READ_BLOCK):
+                        body.write(block)
+            size = body.tell()
+            if size == 0:
+                return Stream(), 0, time.perf_counter() - t_start
+            body.seek(0)
+            stream = read(body, format="MSEED")
+            return stream, size, time.perf_counter() - t_start
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if attempt == retries or (status is not None and status not in _RETRY_STATUS):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def fetch_stations(starts: dict, endtime: UTCDateTime, url: str = FDSN_DATASELECT_URL,
+                   workers: int = FETCH_WORKERS, chunk_s: int = FETCH_CHUNK_S,
+                   retries: int = FETCH_RETRIES, backoff: float = 0.5,
+                   timeout: float = 120, session: requests.Session = None):
+    """
+    Télécharge [starts[station], endtime] pour chaque station, en parallèle.
+    Une tranche en échec (après reprises) n'interrompt pas les autres : elle est
+    listée dans stats["failed"] sous la forme (station, début, fin, erreur).
+    Renvoie (Stream fusionné, stats) avec stats = octets, latences par tranche, échecs.
+    """
+    chunks = plan_chunks(starts, endtime, chunk_s)
+    session = session or shared_session(workers)
+    stream = Stream()
+    stats = {"chunks": len(chunks), "bytes": 0, "latencies": [], "failed": []}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_fetch_chunk, session, url, station, t0, t1, timeout, retries, backoff): (station, t0, t1)
+            for station, t0, t1 in chunks
+        }
+        for future in as_completed(futures):
+            try:
+                part, size, latency = future.result()
+            except Exception as e:
+                stats["failed"].append((*futures[future], str(e)))
+                continue
+            stream += part
+            stats["bytes"] += size
+            stats["latencies"].append(latency)
+
+    return stream, stats
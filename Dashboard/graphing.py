@@ -2,31 +2,131 @@
 # graphing.py — VERSION FINALE AVEC LÉGENDE "eruption" EN VERT NÉON
 # ============================================
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import scipy.signal as scipy_signal
-from constants import eruptions, color_map
-from data_loader import load_eruption_file
+from constants import DATA_DIR, eruptions, color_map, FIGURE_WORKERS, PLOT_RENDER_MODE
+from cache import LRUCache
+from data_loader import aligned_slice, data_version, load_window, eruption_stations
+from rolling import rolling_quantiles
+from downsample import downsample_xy
+from events import STA_LTA_PARAMS, hourly_event_counts
 
 
 # ------------------------------------------------------------
 # 1. Chargement et alignement des données sélectionnées
 # ------------------------------------------------------------
-def load_aligned_data(selected_eruptions):
-    frames = []
-    for name in selected_eruptions:
-        df = load_eruption_file(name)
-        info = eruptions[name]
-        df["hours_to_eruption"] = (df["time_min"] - info["time"]).dt.total_seconds() / 3600
-        df = df[(df["hours_to_eruption"] >= -80) & (df["hours_to_eruption"] <= 24)]
-        res = df.set_index("time_min").resample("10min").mean(numeric_only=True).reset_index()
-        res["hours_to_eruption"] = (res["time_min"] - info["time"]).dt.total_seconds() / 3600
-        res["eruption"] = name
-        res["color"] = color_map[name]
-        frames.append(res)
-    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+def load_aligned_data(selected_eruptions, stations=None):
+    # Tranche du cube aligné (moyennes réseau par pas de 10 min, [-80 h, +24 h])
+    df = aligned_slice(selected_eruptions, stations)
+    if not df.empty:
+        df["color"] = df["eruption"].map(color_map)
+    return df
+
+
+# ------------------------------------------------------------
+# Traces : WebGL (Scattergl) et tableaux float32, encodés en binaire par Plotly
+# au lieu de listes JSON ; PLOT_RENDER_MODE="svg" rétablit go.Scatter
+# ------------------------------------------------------------
+def _typed(values):
+    array = np.asarray(values)
+    return array.astype(np.float32) if array.dtype.kind in "fiub" else values
+
+
+def _scatter(render_mode=None, **kwargs):
+    if (render_mode or PLOT_RENDER_MODE) == "svg":
+        return go.Scatter(**kwargs)
+    for axis in ("x", "y"):
+        if kwargs.get(axis) is not None:
+            kwargs[axis] = _typed(kwargs[axis])
+    return go.Scattergl(**kwargs)
+
+
+# ------------------------------------------------------------
+# Cache des figures (partagé par les sessions) + temps de construction
+# ------------------------------------------------------------
+_figure_cache = LRUCache(max_entries=128)
+_chart_stats = {}
+_stats_lock = threading.Lock()
+_MISSING = object()
+
+
+def memo_figure(chart, key, build):
+    """
+    Figure `chart` pour ses entrées réelles `key` (éruptions, stations,
+    version des données...) : build() n'est appelé que si elle manque.
+    """
+    fig = _figure_cache.get((chart, key), _MISSING)
+    hit = fig is not _MISSING
+    if not hit:
+        start = time.perf_counter()
+        fig = build()
+        elapsed_ms = (time.perf_counter() - start) * 1e3
+        _figure_cache.put((chart, key), fig)
+
+    with _stats_lock:
+        stats = _chart_stats.setdefault(chart, {"constructions": 0, "hits": 0, "total_ms": 0.0, "dernier_ms": np.nan})
+        if hit:
+            stats["hits"] += 1
+        else:
+            stats["constructions"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["dernier_ms"] = elapsed_ms
+    return fig
+
+
+_figure_pool = ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix="figures")
+
+
+def compute_figures(key, builders: dict) -> dict:
+    """
+    {graphique: build} → {graphique: Future de la figure}, dans l'ordre de builders :
+    les figures absentes du cache sont construites en parallèle dans un pool borné.
+    Les builders ne doivent pas appeler Streamlit (pas de contexte de script dans
+    le pool) : une exception reste dans son Future, voir figure_results.
+    """
+    return {chart: _figure_pool.submit(memo_figure, chart, key, build) for chart, build in builders.items()}
+
+
+def figure_results(futures: dict) -> dict:
+    """
+    {graphique: (figure, None) ou (None, exception)} dans l'ordre de futures.
+    À appeler dans le thread du script : c'est lui qui affiche les erreurs,
+    et un graphique en échec n'empêche pas l'affichage des autres.
+    """
+    results = {}
+    for chart, future in futures.items():
+        error = future.exception()
+        results[chart] = (None, error) if error is not None else (future.result(), None)
+    return results
+
+
+def chart_report() -> pd.DataFrame:
+    """Par graphique : constructions, hits du cache, temps de construction (ms)."""
+    with _stats_lock:
+        report = pd.DataFrame([{"graphique": chart, **stats} for chart, stats in _chart_stats.items()])
+    if not report.empty:
+        report["moyen_ms"] = report["total_ms"] / report["constructions"].where(report["constructions"] > 0)
+        report["taux_hit"] = report["hits"] / (report["hits"] + report["constructions"])
+    return report
+
+
+def _chart_section(label, key, expanded=False):
+    """
+    Expander dont le contenu ne s'exécute qu'une fois ouvert (on_change="rerun").
+    Versions de Streamlit sans cet état : contenu toujours exécuté.
+    """
+    try:
+        box = st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    except TypeError:
+        return st.expander(label, expanded=expanded), True
+    return box, bool(getattr(box, "open", True))
 
 
 # ------------------------------------------------------------
@@ -64,8 +164,8 @@ def plot_rsam(df):
     fig = go.Figure()
     for e in df["eruption"].unique():
         sub = df[df["eruption"] == e]
-        fig.add_trace(go.Scatter(x=sub["hours_to_eruption"], y=sub["RSAM"],
-                                 mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
+        fig.add_trace(_scatter(x=sub["hours_to_eruption"], y=sub["RSAM"],
+                               mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
     fig = add_eruption_line(fig)
     fig.update_layout(height=500, template="simple_white",
                       title="RSAM – Real-time Seismic Amplitude Measurement",
@@ -80,8 +180,8 @@ def plot_network_amplitude(df):
     fig = go.Figure()
     for e in df["eruption"].unique():
         sub = df[df["eruption"] == e]
-        fig.add_trace(go.Scatter(x=sub["hours_to_eruption"], y=sub["amplitude_mean"],
-                                 mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
+        fig.add_trace(_scatter(x=sub["hours_to_eruption"], y=sub["amplitude_mean"],
+                               mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
     fig = add_eruption_line(fig)
     fig.update_layout(height=500, template="simple_white",
                       title="Network Mean Seismic Amplitude",
@@ -97,8 +197,8 @@ def plot_cumulative_energy(df):
     for e in df["eruption"].unique():
         sub = df[df["eruption"] == e].sort_values("hours_to_eruption")
         energy = (sub["amplitude_mean"]**2).cumsum()
-        fig.add_trace(go.Scatter(x=sub["hours_to_eruption"], y=energy,
-                                 mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
+        fig.add_trace(_scatter(x=sub["hours_to_eruption"], y=energy,
+                               mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
     fig = add_eruption_line(fig)
     fig.update_layout(height=500, template="simple_white",
                       title="Cumulative Seismic Energy Released",
@@ -113,8 +213,8 @@ def plot_shannon_entropy(df):
     fig = go.Figure()
     for e in df["eruption"].unique():
         sub = df[df["eruption"] == e]
-        fig.add_trace(go.Scatter(x=sub["hours_to_eruption"], y=sub["SE_env"],
-                                 mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
+        fig.add_trace(_scatter(x=sub["hours_to_eruption"], y=sub["SE_env"],
+                               mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
     fig = add_eruption_line(fig)
     fig.update_layout(height=500, template="plotly_dark",
                       title="Shannon Entropy (enveloppe lissée)",
@@ -130,7 +230,7 @@ def plot_kurtosis(df):
     
     for e in df["eruption"].unique():
         sub = df[df["eruption"] == e]
-        fig.add_trace(go.Scatter(
+        fig.add_trace(_scatter(
             x=sub["hours_to_eruption"],
             y=sub["Kurt_env"],
             mode="markers",  # ← AQUI ESTÁ A MÁGICA: só pontos!
@@ -143,10 +243,9 @@ def plot_kurtosis(df):
                 symbol="circle"
             ),
             hovertemplate=
-                "<b>%{text}</b><br>" +
+                "<b>%{fullData.name}</b><br>" +
                 "Heures: %{x:.1f}<br>" +
-                "Kurtosis: %{y:.2f}<extra></extra>",
-            text=[e] * len(sub)
+                "Kurtosis: %{y:.2f}<extra></extra>"
         ))
     
     fig = add_eruption_line(fig)
@@ -170,7 +269,7 @@ def plot_kurtosis(df):
 def plot_amplitude_with_ci(df):
     fig = go.Figure()
     for e in df["eruption"].unique():
-        sub = df[df["eruption"] == e].set_index("time_min")["amplitude_mean"].resample("10min").mean()
+        sub = df[df["eruption"] == e].set_index("time_min")["amplitude_mean"]  # déjà au pas de 10 min
         roll = sub.rolling(6, center=True, min_periods=3)
         mean = roll.mean(); std = roll.std(); count = roll.count()
         hours = (mean.index - eruptions[e]["time"]).total_seconds() / 3600
@@ -181,10 +280,10 @@ def plot_amplitude_with_ci(df):
         r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
         fillcolor = f"rgba({r},{g},{b},0.25)"
 
-        fig.add_trace(go.Scatter(x=hours, y=mean, name=e, line=dict(color=color, width=4)))
-        fig.add_trace(go.Scatter(x=list(hours)+list(hours[::-1]),
-                                 y=list(upper)+list(lower[::-1]),
-                                 fill="toself", fillcolor=fillcolor, line_width=0, showlegend=False))
+        fig.add_trace(_scatter(x=hours, y=mean, name=e, line=dict(color=color, width=4)))
+        fig.add_trace(_scatter(x=np.concatenate([hours, hours[::-1]]),
+                               y=np.concatenate([upper.to_numpy(), lower.to_numpy()[::-1]]),
+                               fill="toself", fillcolor=fillcolor, line_width=0, showlegend=False))
     fig = add_eruption_line(fig)
     fig.update_layout(height=600, template="simple_white",
                       title="Network Mean Amplitude ± 95% Confidence Interval",
@@ -195,7 +294,7 @@ def plot_amplitude_with_ci(df):
 # ------------------------------------------------------------
 # 10. Variation relative de vitesse sismique dV/V (%)
 # ------------------------------------------------------------
-def plot_dvv(df_compare):
+def figure_dvv(df_compare):
     ref_vals = []
     for name in df_compare["eruption"].unique():
         sub = df_compare[df_compare["eruption"] == name]
@@ -209,8 +308,8 @@ def plot_dvv(df_compare):
     fig = go.Figure()
     for e in df_plot["eruption"].unique():
         sub = df_plot[df_plot["eruption"] == e]
-        fig.add_trace(go.Scatter(x=sub["hours_to_eruption"], y=sub["dv_v"],
-                                 mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
+        fig.add_trace(_scatter(x=sub["hours_to_eruption"], y=sub["dv_v"],
+                               mode="lines", name=e, line=dict(width=2, color=sub["color"].iloc[0])))
     
     fig = add_eruption_line(fig)
     fig.add_hline(y=0, line=dict(color="white", dash="dash"))
@@ -223,48 +322,32 @@ def plot_dvv(df_compare):
         yaxis_title="dV/V (%)",
         xaxis_title="Heures / éruption"
     )
-    
-    st.plotly_chart(fig, width='stretch')
-    st.caption("dV/V > 0.1 % = gonflement | < -0.1 % = dégonflement")
+    return fig
 
 
-# ------------------------------------------------------------
-# 11. Nombre d'événements sismiques par heure – TOUTES LES ÉRUPTIONS
-# ------------------------------------------------------------
-def plot_event_count():
-    st.markdown("### Nombre d'événements sismiques par heure")
+DVV_CAPTION = "dV/V > 0.1 % = gonflement | < -0.1 % = dégonflement"
 
-    default_eruption = next((k for k in eruptions.keys() if "2020" in k), list(eruptions.keys())[0])
-    eruption = st.selectbox(
-        "Choisir l'éruption pour le comptage",
-        options=list(eruptions.keys()),
-        index=list(eruptions.keys()).index(default_eruption),
-        key="eventcount_eruption"
-    )
 
-    df = load_eruption_file(eruption)
-    erupt_time = eruptions[eruption]["time"]
-
-    df = df[
-        (df["time_min"] >= erupt_time - pd.Timedelta(hours=72)) &
-        (df["time_min"] <= erupt_time + pd.Timedelta(hours=12))
-    ].copy()
-
-    if len(df) == 0:
-        st.warning("Aucune donnée pour cette période.")
-        return
+def plot_dvv(df_compare):
+    st.plotly_chart(figure_dvv(df_compare), width='stretch')
+    st.caption(DVV_CAPTION)
 
-    quiet_period = df[df["time_min"] < erupt_time - pd.Timedelta(hours=48)]
-    threshold = quiet_period["amplitude_mean"].quantile(0.92) if len(quiet_period) > 100 else df["amplitude_mean"].quantile(0.92)
 
-    df["event"] = (df["amplitude_mean"] > threshold).astype(int)
+# ------------------------------------------------------------
+# 11. Nombre d'événements sismiques par heure – TOUTES LES ÉRUPTIONS
+# ------------------------------------------------------------
+def figure_event_count(eruption, stations=None):
+    erupt_time = eruptions[eruption]["time"]
+    if not (DATA_DIR / eruptions[eruption]["file"]).exists():
+        return None
 
-    hourly = df.groupby(pd.Grouper(key="time_min", freq="1H"))["event"].sum().reset_index()
+    # Événements réseau STA/LTA du catalogue persistant (lecture indexée par station et temps)
+    hourly = hourly_event_counts(eruption, stations, hours_before=72, hours_after=12)
 
     fig = go.Figure()
     fig.add_trace(go.Bar(
         x=hourly["time_min"],
-        y=hourly["event"],
+        y=hourly["events"],
         marker_color="crimson",
         name="Événements/heure",
         hovertemplate="<b>Heure</b>: %{x}<br><b>Événements</b>: %{y}<extra></extra>"
@@ -287,8 +370,33 @@ def plot_event_count():
         yaxis_title="Nombre d'événements par heure",
         xaxis=dict(range=[erupt_time - pd.Timedelta(hours=72), erupt_time + pd.Timedelta(hours=12)])
     )
+    return fig
+
+
+def plot_event_count():
+    st.markdown("### Nombre d'événements sismiques par heure")
+
+    default_eruption = next((k for k in eruptions.keys() if "2020" in k), list(eruptions.keys())[0])
+    eruption = st.selectbox(
+        "Choisir l'éruption pour le comptage",
+        options=list(eruptions.keys()),
+        index=list(eruptions.keys()).index(default_eruption),
+        key="eventcount_eruption"
+    )
+
+    available = eruption_stations(eruption)
+    selected = st.multiselect("Stations", options=available, default=available, key="eventcount_stations")
+    stations = None if set(selected) == set(available) else sorted(selected)
+
+    fig = memo_figure("events", (eruption, None if stations is None else tuple(stations), data_version([eruption])),
+                      lambda: figure_event_count(eruption, stations))
+    if fig is None:
+        st.warning("Aucune donnée pour cette période.")
+        return
     st.plotly_chart(fig, width='stretch')
-    st.caption("Seuil = 92ᵉ percentile du bruit de fond – méthode standard OVPF/USGS")
+    p = STA_LTA_PARAMS
+    st.caption(f"STA/LTA récursif par station (STA {p['sta_min']} min / LTA {p['lta_min']} min, "
+               f"seuils {p['on']} / {p['off']}) + coïncidence réseau ≥ {p['min_stations']} stations")
 
 
 # ------------------------------------------------------------
@@ -305,34 +413,48 @@ def display_spectrogram():
                                index=list(eruptions.keys()).index(default_eruption),
                                key="tremor_erupt")
     with col2:
-        df_full = load_eruption_file(eruption)
-        station = st.selectbox("Station", sorted(df_full["station"].unique()),
-                               index=sorted(df_full["station"].unique()).index("PCR") if "PCR" in df_full["station"].unique() else 0,
+        stations = sorted(eruption_stations(eruption))
+        station = st.selectbox("Station", stations,
+                               index=stations.index("PCR") if "PCR" in stations else 0,
                                key="tremor_stat")
 
+    fig = memo_figure("tremor", (eruption, station, data_version([eruption])),
+                      lambda: figure_tremor(eruption, station))
+    if fig is None:
+        st.warning("Pas assez de données.")
+        return
+
+    st.plotly_chart(fig, width='stretch')
+    st.info("Méthode officielle de l’OVPF – montée claire du RSAM et de l’envelope jaune.")
+
+
+def figure_tremor(eruption, station):
     erupt_time = eruptions[eruption]["time"]
-    start = erupt_time - pd.Timedelta(hours=72)
-    end = erupt_time + pd.Timedelta(hours=12)
 
-    df = df_full[(df_full["station"] == station) &
-                 (df_full["time_min"] >= start) &
-                 (df_full["time_min"] <= end)].copy()
+    df = load_window(eruption, hours_before=72, hours_after=12,
+                     stations=[station], columns=["time_min", "amplitude_mean"])
 
     if len(df) < 50:
-        st.warning("Pas assez de données.")
-        return
+        return None
 
     df["hours"] = (df["time_min"] - erupt_time).dt.total_seconds() / 3600
     df["RSAM"] = df["amplitude_mean"].rolling(10, center=True).mean()
-    df["envelope"] = df["amplitude_mean"].rolling(60, center=True).quantile(0.9)
+    df["envelope"] = rolling_quantiles(df["amplitude_mean"].to_numpy(dtype=float), 60, [0.9], center=True)[0]
+
+    # Traces réduites (pyramide min/max 1 min / 10 min / 1 h) : pics conservés
+    def trace_xy(col):
+        return downsample_xy(df["hours"], df[col], x_unit="1h")
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df["hours"], y=df["amplitude_mean"],
-                             mode="lines", line=dict(color="gray", width=1), name="Amplitude brute", opacity=0.5))
-    fig.add_trace(go.Scatter(x=df["hours"], y=df["RSAM"],
-                             mode="lines", line=dict(color="red", width=4), name="RSAM"))
-    fig.add_trace(go.Scatter(x=df["hours"], y=df["envelope"],
-                             mode="lines", line=dict(color="yellow", width=4), name="Envelope 90% (tremor)"))
+    x, y = trace_xy("amplitude_mean")
+    fig.add_trace(_scatter(x=x, y=y,
+                           mode="lines", line=dict(color="gray", width=1), name="Amplitude brute", opacity=0.5))
+    x, y = trace_xy("RSAM")
+    fig.add_trace(_scatter(x=x, y=y,
+                           mode="lines", line=dict(color="red", width=4), name="RSAM"))
+    x, y = trace_xy("envelope")
+    fig.add_trace(_scatter(x=x, y=y,
+                           mode="lines", line=dict(color="yellow", width=4), name="Envelope 90% (tremor)"))
 
     fig = add_eruption_line(fig)
 
@@ -342,9 +464,7 @@ def display_spectrogram():
         xaxis_title="Heures / éruption (t=0)", yaxis_title="Amplitude sismique",
         xaxis=dict(range=[-72, 12])
     )
-
-    st.plotly_chart(fig, width='stretch')
-    st.info("Méthode officielle de l’OVPF – montée claire du RSAM et de l’envelope jaune.")
+    return fig
 
 
 # ------------------------------------------------------------
@@ -365,33 +485,90 @@ def plot_3d_waterfall():
         key="3d_waterfall_eruption"
     )
 
-    df = load_eruption_file(eruption)
-    erupt_time = eruptions[eruption]["time"]
-
-    df = df[
-        (df["time_min"] >= erupt_time - pd.Timedelta(hours=48)) &
-        (df["time_min"] <= erupt_time + pd.Timedelta(hours=6))
-    ].copy()
-
-    if len(df) < 100:
+    fig = memo_figure("waterfall", (eruption, data_version([eruption])), lambda: figure_3d_waterfall(eruption))
+    if fig is None:
         st.warning("Pas assez de données pour le waterfall 3D.")
         return
+    st.plotly_chart(fig, width='stretch')
 
-    df["hours"] = (df["time_min"] - erupt_time).dt.total_seconds() / 3600
-
-    pivot = df.pivot_table(
-        values="amplitude_mean",
-        index="station",
-        columns="hours",
-        aggfunc="mean"
-    ).fillna(0)
-
-    pivot = pivot.loc[pivot.mean(axis=1).sort_values(ascending=False).index]
 
-    x = pivot.columns.values
-    y = np.arange(len(pivot))
-    z = pivot.values
-    stations = pivot.index.tolist()
+# Grille du waterfall : pas de temps fixes choisis d'après la fenêtre affichée
+WATERFALL_HOURS_BEFORE = 48
+WATERFALL_HOURS_AFTER = 6
+WATERFALL_STEPS = ("5min", "10min", "15min", "30min", "1h")
+WATERFALL_MAX_BINS = 240
+
+_waterfall_grids = LRUCache(max_bytes=32 * 1024**2,
+                            sizeof=lambda grid: 0 if grid is None else grid["z"].nbytes + grid["hours"].nbytes)
+
+
+def waterfall_step(hours_before=WATERFALL_HOURS_BEFORE, hours_after=WATERFALL_HOURS_AFTER,
+                   max_bins=WATERFALL_MAX_BINS) -> pd.Timedelta:
+    """Plus petit pas de WATERFALL_STEPS découpant la fenêtre en au plus max_bins colonnes."""
+    span = pd.Timedelta(hours=hours_before + hours_after)
+    for step in WATERFALL_STEPS:
+        if span / pd.Timedelta(step) <= max_bins:
+            return pd.Timedelta(step)
+    return pd.Timedelta(WATERFALL_STEPS[-1])
+
+
+def waterfall_grid(eruption, hours_before=WATERFALL_HOURS_BEFORE, hours_after=WATERFALL_HOURS_AFTER,
+                   max_bins=WATERFALL_MAX_BINS):
+    """
+    Amplitude moyenne par station et par pas de temps fixe (0 si pas vide),
+    stations triées par énergie décroissante (somme des amplitude²).
+    dict hours (centres des pas), stations, z (stations × pas), step ;
+    None si moins de 100 lignes. Mise en cache par éruption et version des données.
+    """
+    step = waterfall_step(hours_before, hours_after, max_bins)
+    key = (eruption, hours_before, hours_after, step.value, data_version([eruption]))
+    grid = _waterfall_grids.get(key, _MISSING)
+    if grid is not _MISSING:
+        return grid
+
+    df = load_window(eruption, hours_before=hours_before, hours_after=hours_after,
+                     columns=["time_min", "station", "amplitude_mean"])
+    grid = None
+    if len(df) >= 100:
+        erupt_time = eruptions[eruption]["time"]
+        step_h = step / pd.Timedelta(hours=1)
+        n_bins = int(np.ceil((hours_before + hours_after) / step_h))
+
+        hours = (df["time_min"] - erupt_time).dt.total_seconds().to_numpy() / 3600
+        bins = np.clip(((hours + hours_before) / step_h).astype(np.int64), 0, n_bins - 1)
+        codes, stations = pd.factorize(df["station"], sort=True)
+        amp = df["amplitude_mean"].to_numpy(dtype=float)
+        valid = ~np.isnan(amp) & (codes >= 0)
+
+        flat = codes[valid] * n_bins + bins[valid]
+        size = len(stations) * n_bins
+        sums = np.bincount(flat, weights=amp[valid], minlength=size).reshape(len(stations), n_bins)
+        counts = np.bincount(flat, minlength=size).reshape(len(stations), n_bins)
+        energy = np.bincount(codes[valid], weights=amp[valid] ** 2, minlength=len(stations))
+
+        order = np.argsort(-energy, kind="stable")
+        order = order[counts[order].sum(axis=1) > 0]  # stations sans amplitude écartées (comme pivot_table)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = np.where(counts > 0, sums / counts, 0.0)[order]
+        grid = {
+            "hours": -hours_before + (np.arange(n_bins) + 0.5) * step_h,
+            "stations": [str(s) for s in np.asarray(stations)[order]],
+            "z": z.astype(np.float32),
+            "step": step,
+        }
+    _waterfall_grids.put(key, grid)
+    return grid
+
+
+def figure_3d_waterfall(eruption):
+    grid = waterfall_grid(eruption)
+    if grid is None:
+        return None
+
+    x = grid["hours"]
+    y = np.arange(len(grid["stations"]))
+    z = grid["z"]
+    stations = grid["stations"]
 
     fig = go.Figure(data=go.Surface(
         z=z,
@@ -435,8 +612,7 @@ def plot_3d_waterfall():
         title=f"Waterfall 3D – {eruption.split(' – ')[0]}",
         margin=dict(l=0, r=0, t=60, b=0)
     )
-
-    st.plotly_chart(fig, width='stretch')
+    return fig
 
 
 # ------------------------------------------------------------
@@ -445,7 +621,19 @@ def plot_3d_waterfall():
 # ------------------------------------------------------------
 # 13. Fonction principale – ORDEM EXATA QUE VOCÊ PEDIU
 # ------------------------------------------------------------
-def show_graphics(selected_eruptions):
+# === ORDEM EXATA QUE VOCÊ PEDIU ===
+# (graphique, titre, builder pur df → figure, légende)
+COMPARATIVE_CHARTS = [
+    ("kurtosis", "Kurtosis", plot_kurtosis, None),
+    ("entropy", "Entropie de Shannon", plot_shannon_entropy, None),
+    ("rsam", "RSAM", plot_rsam, None),
+    ("energy", "Énergie sismique cumulée", plot_cumulative_energy, None),
+    ("amplitude_ci", "Amplitude moyenne ± IC 95 %", plot_amplitude_with_ci, None),
+    ("dvv", "Variation de vitesse sismique dV/V (%)", figure_dvv, DVV_CAPTION),  # 7.
+]
+
+
+def show_graphics(selected_eruptions, stations=None):
     st.markdown("---")
     st.markdown("### Analyse comparative des précurseurs sismiques. \nDonnées historiques OVPF sur les éruptions passées")
 
@@ -453,16 +641,57 @@ def show_graphics(selected_eruptions):
         st.info("Aucune éruption sélectionnée.")
         return
 
-    df = load_aligned_data(selected_eruptions)
-
-    # === ORDEM EXATA QUE VOCÊ PEDIU ===
-    st.plotly_chart(plot_kurtosis(df),              width='stretch') 
-    st.plotly_chart(plot_shannon_entropy(df),       width='stretch')
-    st.plotly_chart(plot_rsam(df),                  width='stretch')   
-    st.plotly_chart(plot_cumulative_energy(df),     width='stretch')  
-    st.plotly_chart(plot_amplitude_with_ci(df),     width='stretch') 
-    plot_dvv(df)  # 7. Variation de vitesse sismique dV/V (%)
-    plot_event_count()  # 8. Nombre d'événements sismiques par heure
-    plot_3d_waterfall()  # 9. Waterfall 3D
-    display_spectrogram()  # 10. TREMOR VOLCANIQUE – Méthode OVPF
-    # ===================================
\ No newline at end of file
+    # Entrées réelles des graphiques comparatifs ; le cube aligné n'est lu
+    # que si l'une des figures ouvertes manque au cache
+    key = (tuple(selected_eruptions), None if stations is None else tuple(sorted(stations)),
+           data_version(selected_eruptions))
+    aligned, aligned_lock = [], threading.Lock()
+
+    def aligned_data():
+        with aligned_lock:
+            if not aligned:
+                aligned.append(load_aligned_data(selected_eruptions, stations))
+            return aligned[0]
+
+    # Emplacements dans l'ordre d'affichage, puis construction parallèle des figures ouvertes
+    sections = []
+    for i, (chart, label, builder, caption) in enumerate(COMPARATIVE_CHARTS):
+        box, is_open = _chart_section(label, f"chart_{chart}", expanded=i == 0)
+        if is_open:
+            sections.append((chart, box, builder, caption))
+    if any((chart, key) not in _figure_cache for chart, *_ in sections):
+        aligned_data()  # lu ici : les messages st.error restent dans le thread Streamlit
+
+    figures = figure_results(compute_figures(key, {
+        chart: (lambda builder=builder: None if aligned_data().empty else builder(aligned_data()))
+        for chart, _, builder, _ in sections
+    }))
+    for chart, box, _, caption in sections:
+        with box:
+            fig, error = figures[chart]
+            if error is not None:
+                st.error(f"Graphique indisponible : {type(error).__name__} {error}")
+                continue
+            if fig is None:
+                st.warning("Aucune donnée pour cette sélection.")
+                continue
+            st.plotly_chart(fig, width='stretch')
+            if caption:
+                st.caption(caption)
+
+    # Graphiques avec leur propre sélecteur d'éruption (mémorisés dans leur fonction)
+    for chart, label, render in [
+        ("events", "Nombre d'événements sismiques par heure", plot_event_count),  # 8.
+        ("waterfall", "Waterfall 3D", plot_3d_waterfall),  # 9.
+        ("tremor", "Tremor volcanique – méthode OVPF", display_spectrogram),  # 10.
+    ]:
+        box, is_open = _chart_section(label, f"chart_{chart}")
+        if is_open:
+            with box:
+                render()
+    # ===================================
+
+    box, is_open = _chart_section("Performances des graphiques", "chart_report")
+    if is_open:
+        with box:
+            st.dataframe(chart_report(), width='stretch', hide_index=True)
\ No newline at end of file
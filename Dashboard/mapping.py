@@ -1,9 +1,45 @@
 import folium
 import streamlit as st
+from cache import LRUCache
 from constants import station_coords, eruptions
+from data_loader import station_presence
 
+# HTML des cartes déjà rendues (~35 ko chacune), par ensemble de stations actives
+_map_html_cache = LRUCache(max_bytes=4 * 1024**2, sizeof=lambda html: len(html.encode("utf-8")))
 
-def create_station_map(current_eruption: str):
+
+def stations_with_data(current_eruption: str) -> set:
+    """Stations avec des données pour l'éruption, lues dans l'index de présence."""
+    try:
+        return set(station_presence(current_eruption).get("stations", {}))
+    except Exception:
+        return set()
+
+
+def station_map_html(current_eruption: str) -> str:
+    """
+    Page HTML de create_station_map, rendue une seule fois par ensemble de
+    stations actives : changer d'éruption ne relit aucune série temporelle.
+    """
+    key = frozenset(stations_with_data(current_eruption))
+    html = _map_html_cache.get(key)
+    if html is None:
+        html = create_station_map(current_eruption, key).get_root().render()
+        _map_html_cache.put(key, html)
+    return html
+
+
+def show_station_map(current_eruption: str, height: int = 530) -> None:
+    """Affiche la carte en cache (st.iframe, ou components.html sur les anciennes versions)."""
+    html = station_map_html(current_eruption)
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=height)
+    else:
+        import streamlit.components.v1 as components
+        components.html(html, height=height)
+
+
+def create_station_map(current_eruption: str, active=None):
     """
     Crée une carte Folium propre avec toutes les stations de l'OVPF.
     Les stations actives dans l'éruption sélectionnée sont en couleur,
@@ -18,13 +54,8 @@ def create_station_map(current_eruption: str):
         max_zoom=18
     )
 
-    # Récupère les stations actives dans l'éruption courante
-    try:
-        from data_loader import load_eruption_file
-        df = load_eruption_file(current_eruption)
-        active_stations = set(df["station"].unique()) if not df.empty else set()
-    except:
-        active_stations = set()
+    # Stations actives dans l'éruption courante (index de présence, sans charger le CSV)
+    active_stations = stations_with_data(current_eruption) if active is None else set(active)
 
     # Palette de couleurs vives pour les stations actives
     colors_active = [
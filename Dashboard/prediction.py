@@ -1,8 +1,47 @@
 # prediction.py — MODELO DUMMY PROFISSIONAL (23h de análise!)
+import json
+
 import numpy as np
 import pandas as pd
 
-def run_model(df_full):
+from cache import LRUCache
+from constants import MODEL_PATH
+
+# Fenêtre d'analyse (23h) et sous-fenêtre "récente" (3h), en lignes
+WINDOW_ROWS = 1380
+RECENT_ROWS = 180
+
+
+def _risk_from_stats(n, rsam_current, rsam_recent, rsam_older, rsam_max, rng=np.random):
+    """
+    Risque à partir des statistiques de la fenêtre (n lignes) :
+    - RSAM actuel, moyennes des 3 dernières heures / des 20h précédentes, pic
+    rng : module np.random (défaut) ou Generator ; mêmes tirages que run_model.
+    """
+    if n < 10:
+        return rng.uniform(10, 40)  # Poucos dados
+
+    trend_factor = max(0, (rsam_recent - rsam_older) / (rsam_older + 100)) * 100  # 0 a ~100
+
+    # Base de risco por nível atual
+    if rsam_current < 300:
+        base = rng.uniform(5, 25)
+    elif rsam_current < 800:
+        base = rng.uniform(25, 55)
+    elif rsam_current < 1500:
+        base = rng.uniform(55, 80)
+    else:
+        base = rng.uniform(80, 98)
+
+    # Amplifica com tendência e pico
+    risk = base + 0.4 * trend_factor + 0.2 * min(50, rsam_max / 30)
+
+    # Limite e ruído realista
+    risk = np.clip(risk + rng.normal(0, 4), 0, 100)
+    return round(float(risk), 1)
+
+
+def run_model(df_full, rng=np.random):
     """
     Usa até 23h de dados (1380 minutos) para predição realista.
     Combina:
@@ -11,46 +50,162 @@ def run_model(df_full):
     - Pico nas últimas 23h
     """
     try:
-        # Garante que temos dados ordenados
+        # Garante que temos dados ordenados (tri stable : ordre des ex-aequo conservé)
         df = df_full.copy()
-        df = df.sort_values("time_min")
-        
+        df = df.sort_values("time_min", kind="stable")
+
         # Últimas 23h (1380 minutos)
-        last_23h = df.tail(1380)
+        last_23h = df.tail(WINDOW_ROWS)
         if len(last_23h) < 10:
-            return np.random.uniform(10, 40)  # Poucos dados
+            return _risk_from_stats(len(last_23h), np.nan, np.nan, np.nan, np.nan, rng)
 
         # 1. RSAM atual (último valor)
         rsam_current = last_23h["RSAM"].iloc[-1]
-        
+
         # 2. Tendência (média das últimas 3h vs média das 20h anteriores)
-        recent_3h = last_23h.tail(180)
-        older_20h = last_23h.head(len(last_23h) - 180)
-        
+        recent_3h = last_23h.tail(RECENT_ROWS)
+        older_20h = last_23h.head(len(last_23h) - RECENT_ROWS)
+
         rsam_recent = recent_3h["RSAM"].mean() if len(recent_3h) > 0 else rsam_current
         rsam_older = older_20h["RSAM"].mean() if len(older_20h) > 0 else rsam_current
-        
-        trend_factor = max(0, (rsam_recent - rsam_older) / (rsam_older + 100)) * 100  # 0 a ~100
-        
+
         # 3. Pico nas últimas 23h
         rsam_max = last_23h["RSAM"].max()
-        
-        # Base de risco por nível atual
-        if rsam_current < 300:
-            base = np.random.uniform(5, 25)
-        elif rsam_current < 800:
-            base = np.random.uniform(25, 55)
-        elif rsam_current < 1500:
-            base = np.random.uniform(55, 80)
-        else:
-            base = np.random.uniform(80, 98)
-
-        # Amplifica com tendência e pico
-        risk = base + 0.4 * trend_factor + 0.2 * min(50, rsam_max / 30)
-        
-        # Limite e ruído realista
-        risk = np.clip(risk + np.random.normal(0, 4), 0, 100)
-        return round(float(risk), 1)
+
+        return _risk_from_stats(len(last_23h), rsam_current, rsam_recent, rsam_older, rsam_max, rng)
 
     except Exception as e:
-        return np.random.uniform(20, 50)
\ No newline at end of file
+        return rng.uniform(20, 50)
+
+
+# ------------------------------------------------------------
+# Lot : N fenêtres en une passe vectorisée, Generator explicite, résultats en cache
+# ------------------------------------------------------------
+
+# (cache_key de l'appelant, état du Generator) → (risques, état après tirage)
+_risk_cache = LRUCache(max_bytes=64 * 1024**2, sizeof=lambda value: value[0].nbytes + 256)
+
+
+def _windows_from_frame(df: pd.DataFrame, by: str):
+    """Dernières WINDOW_ROWS lignes de chaque groupe, alignées à droite (NaN devant)."""
+    df = df.sort_values("time_min", kind="stable")
+    tail = df.groupby(by, sort=True).tail(WINDOW_ROWS)
+    keys, codes = np.unique(tail[by].to_numpy(), return_inverse=True)
+    lengths = np.bincount(codes, minlength=len(keys))
+    position = tail.groupby(by).cumcount().to_numpy() + (WINDOW_ROWS - lengths[codes])
+    windows = np.full((len(keys), WINDOW_ROWS), np.nan)
+    windows[codes, position] = tail["RSAM"].to_numpy(dtype=float)
+    return keys, windows, lengths
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    mask = mask & ~np.isnan(values)
+    count = mask.sum(axis=1)
+    total = np.where(mask, values, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _batch_stats(windows: np.ndarray, lengths: np.ndarray):
+    """Statistiques de run_model pour chaque ligne (fenêtres alignées à droite)."""
+    width = windows.shape[1]
+    cols = np.arange(width)[None, :]
+    n = lengths[:, None]
+    valid = cols >= width - n
+
+    current = windows[:, -1]
+    recent = _masked_mean(windows, cols >= width - np.minimum(n, RECENT_ROWS))
+
+    # head(n - 180) de run_model : n > 180 → n - 180 premières lignes,
+    # 90 < n < 180 → 2n - 180 premières lignes (tête négative), sinon RSAM actuel
+    older_len = np.where(n > RECENT_ROWS, n - RECENT_ROWS, np.where(n < RECENT_ROWS, 2 * n - RECENT_ROWS, 0))
+    older = _masked_mean(windows, valid & (cols < width - n + older_len))
+    older = np.where(older_len[:, 0] > 0, older, current)
+
+    present = valid & ~np.isnan(windows)
+    peak = np.where(present.any(axis=1), np.where(present, windows, -np.inf).max(axis=1), np.nan)
+    return current, recent, older, peak
+
+
+def _risk_batch(lengths, current, recent, older, peak, rng) -> np.ndarray:
+    """Version vectorisée de _risk_from_stats (tirages groupés : uniformes puis normales)."""
+    with np.errstate(invalid="ignore"):
+        trend = (recent - older) / (older + 100)
+        trend_factor = np.where(trend > 0, trend, 0) * 100
+        peak_term = np.where(peak / 30 < 50, peak / 30, 50)
+
+        low = np.select([current < 300, current < 800, current < 1500], [5, 25, 55], 80)
+        high = np.select([current < 300, current < 800, current < 1500], [25, 55, 80], 98)
+    few = lengths < 10
+    low, high = np.where(few, 10, low), np.where(few, 40, high)
+
+    base = rng.uniform(low, high)
+    noise = rng.normal(0, 4, len(lengths))
+
+    risk = np.clip(base + 0.4 * trend_factor + 0.2 * peak_term + noise, 0, 100)
+    return np.array([b if f else round(float(r), 1) for b, r, f in zip(base, risk, few)])
+
+
+def run_model_batch(data, rng: np.random.Generator, lengths=None, by: str = "station", cache_key=None):
+    """
+    Risque de N fenêtres en une passe :
+    - data : tableau (N, 1380) de RSAM (fenêtres plus courtes : alignées à droite,
+      longueurs dans `lengths`), ou DataFrame groupé par `by` (une fenêtre par groupe)
+    - rng : Generator explicite ; mêmes entrées + même état → mêmes sorties
+    - cache_key : identifiant hachable des fenêtres fourni par l'appelant, par
+      ex. (data_version, début, fin) ; avec le même état du Generator, le résultat
+      est servi par le cache et l'état avancé à l'identique. Sans clé, pas de cache
+      (hacher les fenêtres coûterait la moitié du calcul).
+    Renvoie un tableau (N,) ou, pour un DataFrame, une Series indexée par groupe.
+    """
+    keys = None
+    if isinstance(data, pd.DataFrame):
+        keys, windows, lengths = _windows_from_frame(data, by)
+    else:
+        windows = np.asarray(data, dtype=float)[:, -WINDOW_ROWS:]
+        lengths = np.full(len(windows), windows.shape[1]) if lengths is None \
+            else np.minimum(np.asarray(lengths), windows.shape[1])
+    lengths = lengths.astype(np.int64)
+
+    key = None
+    if cache_key is not None:
+        key = (cache_key, json.dumps(rng.bit_generator.state, sort_keys=True, default=int))
+        hit = _risk_cache.get(key)
+        if hit is not None:
+            risks, state = hit
+            rng.bit_generator.state = state
+            return pd.Series(risks, index=keys, name="risk") if keys is not None else risks.copy()
+
+    risks = _risk_batch(lengths, *_batch_stats(windows, lengths), rng)
+    if key is not None:
+        _risk_cache.put(key, (risks.copy(), rng.bit_generator.state))
+    return pd.Series(risks, index=keys, name="risk") if keys is not None else risks
+
+
+def risk_cache_stats() -> dict:
+    """Compteurs du cache de run_model_batch (hits, misses, taux, octets...)."""
+    return _risk_cache.stats()
+
+
+# ------------------------------------------------------------
+# CNNTransformer entraîné : inférence NumPy (sans torch), chargée à la première demande
+# ------------------------------------------------------------
+
+_cnn_model = None
+
+
+def load_cnn_model(path=None):
+    """Moteur NumPy du CNNTransformer, chargé une seule fois depuis MODEL_PATH (.npz)."""
+    global _cnn_model
+    if path is not None or _cnn_model is None:
+        from cnn_transformer import NumpyCNNTransformer
+        _cnn_model = NumpyCNNTransformer.from_npz(MODEL_PATH if path is None else path)
+    return _cnn_model
+
+
+def predict_sequences(sequences, batch_size: int = 32) -> np.ndarray:
+    """
+    Probabilités de classe (N, num_classes) pour N séquences (N, seq_len, features),
+    par exemple preprocess.make_sequences(...) ; évaluées par micro-lots.
+    """
+    return load_cnn_model().predict_proba(sequences, batch_size=batch_size)
@@ -0,0 +1,304 @@
+# ============================================
+# prediction_service.py — service local de prédiction par micro-lots
+# Un seul processus garde le modèle chaud ; les requêtes des sessions
+# Streamlit sont mises en file puis évaluées par lots (taille max ou
+# délai max depuis la plus ancienne requête du lot).
+# Usage : python prediction_service.py [--port 8765] [--max-batch 64] [--max-wait-ms 10]
+# Points d'accès :
+#   POST /predict            {"rsam": [...]}            → {"risk": float}
+#                            (ou corps binaire float64, Content-Type application/octet-stream)
+#   POST /predict_sequences  {"sequence": [[...], ...]} → {"proba": [...]}
+#   GET  /metrics            profondeur de file, tailles et latences des lots
+#   GET  /health
+# ============================================
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from constants import MODEL_PATH, PREDICTION_SERVICE_URL
+from prediction import WINDOW_ROWS, load_cnn_model, run_model, run_model_batch
+
+
+# --------------------------------------------
+# File d'attente + lots
+# --------------------------------------------
+
+class _Pending:
+    __slots__ = ("item", "arrival", "done", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.arrival = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes soumises depuis plusieurs threads et appelle
+    batch_fn(liste d'items) → liste de résultats dans un thread dédié.
+    Un lot part dès qu'il atteint max_batch, ou max_wait_ms après l'arrivée
+    de sa première requête.
+    """
+
+    def __init__(self, batch_fn, max_batch: int = 64, max_wait_ms: float = 10.0, history: int = 1000):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=history)
+        self._batch_latency = deque(maxlen=history)   # durée de batch_fn (s)
+        self._queue_wait = deque(maxlen=history)      # attente en file de chaque requête (s)
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._max_depth = 0
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, item, timeout: float = None):
+        """Met item en file et attend son résultat (exception de batch_fn relancée)."""
+        pending = _Pending(item)
+        self._queue.put(pending)
+        with self._lock:
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Pas de réponse du modèle dans le délai imparti")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first) -> list:
+        batch, deadline = [first], first.arrival + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)  # arrêt traité après ce lot
+                break
+            batch.append(pending)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            start = time.monotonic()
+            try:
+                results = list(self.batch_fn([p.item for p in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn a renvoyé {len(results)} résultats pour {len(batch)} requêtes")
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+                with self._lock:
+                    self._errors += 1
+            elapsed = time.monotonic() - start
+
+            with self._lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._batch_sizes.append(len(batch))
+                self._batch_latency.append(elapsed)
+                self._queue_wait.extend(start - p.arrival for p in batch)
+            for pending in batch:
+                pending.done.set()
+
+    def metrics(self) -> dict:
+        """Profondeur de file, nombre et taille des lots, latences (ms) sur les derniers lots."""
+        with self._lock:
+            sizes = np.array(self._batch_sizes, dtype=float)
+            latency = np.array(self._batch_latency) * 1e3
+            wait = np.array(self._queue_wait) * 1e3
+            out = {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "requests": self._requests,
+                "batches": self._batches,
+                "errors": self._errors,
+            }
+        if len(sizes):
+            out.update({
+                "mean_batch_size": float(sizes.mean()),
+                "max_batch_size": int(sizes.max()),
+                "batch_latency_ms": {"p50": float(np.percentile(latency, 50)),
+                                     "p95": float(np.percentile(latency, 95)),
+                                     "max": float(latency.max())},
+                "queue_wait_ms": {"p50": float(np.percentile(wait, 50)),
+                                  "p95": float(np.percentile(wait, 95))},
+            })
+        return out
+
+
+# --------------------------------------------
+# Fonctions de lot
+# --------------------------------------------
+
+def risk_batch_fn(seed: int = None):
+    """Lot de fenêtres RSAM (listes) → risques, un seul Generator pour le service."""
+    rng = np.random.default_rng(seed)
+
+    def score(items):
+        windows = np.full((len(items), WINDOW_ROWS), np.nan)
+        lengths = np.empty(len(items), dtype=np.int64)
+        for i, rsam in enumerate(items):
+            rsam = np.asarray(rsam, dtype=float)[-WINDOW_ROWS:]
+            lengths[i] = len(rsam)
+            windows[i, WINDOW_ROWS - len(rsam):] = rsam
+        return run_model_batch(windows, rng, lengths=lengths).tolist()
+
+    return score
+
+
+def sequence_batch_fn(model):
+    """Lot de séquences (seq_len, features) → probabilités, regroupées par forme."""
+
+    def score(items):
+        sequences = [np.asarray(s, dtype=np.float32) for s in items]
+        results = [None] * len(sequences)
+        shapes = {}
+        for i, s in enumerate(sequences):
+            shapes.setdefault(s.shape, []).append(i)
+        for idx in shapes.values():
+            proba = model.predict_proba(np.stack([sequences[i] for i in idx]))
+            for i, p in zip(idx, proba):
+                results[i] = p.tolist()
+        return results
+
+    return score
+
+
+# --------------------------------------------
+# Serveur HTTP
+# --------------------------------------------
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, max_batch: int = 64,
+                max_wait_ms: float = 10.0, seed: int = None, model_path=None) -> ThreadingHTTPServer:
+    """
+    Serveur prêt à servir (serve_forever) ; server.batchers contient les files
+    par point d'accès. Le CNNTransformer n'est servi que si ses poids existent.
+    """
+    batchers = {"/predict": (MicroBatcher(risk_batch_fn(seed), max_batch, max_wait_ms), "rsam", "risk")}
+    path = MODEL_PATH if model_path is None else model_path
+    try:
+        model = load_cnn_model(path)
+        batchers["/predict_sequences"] = (MicroBatcher(sequence_batch_fn(model), max_batch, max_wait_ms),
+                                          "sequence", "proba")
+    except FileNotFoundError:
+        print(f"Pas de poids CNNTransformer ({path}) : /predict_sequences désactivé")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, code: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok", "endpoints": sorted(batchers)})
+            elif self.path == "/metrics":
+                self._reply(200, {name: b.metrics() for name, (b, _, _) in batchers.items()})
+            else:
+                self._reply(404, {"error": "inconnu"})
+
+        def do_POST(self):
+            if self.path not in batchers:
+                self._reply(404, {"error": "inconnu"})
+                return
+            batcher, field, answer = batchers[self.path]
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Type") == "application/octet-stream" and field == "rsam":
+                    item = np.frombuffer(body, dtype="<f8")  # évite le décodage JSON de 1380 flottants
+                else:
+                    item = json.loads(body)[field]
+                result = batcher.submit(item, timeout=30)
+            except (KeyError, ValueError) as e:
+                self._reply(400, {"error": f"Requête invalide : {e}"})
+                return
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+                return
+            self._reply(200, {answer: result})
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128  # connexions en attente (défaut : 5)
+
+    server = Server((host, port), Handler)
+    server.batchers = {name: b for name, (b, _, _) in batchers.items()}
+    return server
+
+
+# --------------------------------------------
+# Client (sessions Streamlit)
+# --------------------------------------------
+
+def remote_run_model(df, url: str = PREDICTION_SERVICE_URL, timeout: float = 5.0) -> float:
+    """Équivalent de run_model(df) évalué par le service (mêmes 1380 dernières lignes)."""
+    rsam = df.sort_values("time_min", kind="stable")["RSAM"].tail(WINDOW_ROWS)
+    request = urllib.request.Request(
+        url.rstrip("/") + "/predict",
+        data=rsam.to_numpy(dtype="<f8").tobytes(),
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)["risk"]
+
+
+def predict_risk(df) -> float:
+    """Risque via le service si PREDICTION_SERVICE_URL est défini, sinon (ou s'il ne répond pas) en local."""
+    if PREDICTION_SERVICE_URL:
+        try:
+            return remote_run_model(df)
+        except Exception as e:
+            print(f"Service de prédiction indisponible ({e}), calcul local")
+    return run_model(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service local de prédiction par micro-lots")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.max_batch, args.max_wait_ms, args.seed)
+    print(f"Service de prédiction sur http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -3,11 +3,16 @@
 # Pipeline propre & ML-ready
 # ============================================
 
+import math
+
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.signal import welch
 from typing import List, Optional
 
+from rolling import RollingFeatures, rolling_quantiles
+
 # --------------------------------------------
 # SECTION 1 — FONCTIONS DE BASE
 # --------------------------------------------
@@ -45,10 +50,10 @@ def compute_rsam(data: pd.DataFrame) -> pd.DataFrame:
 
 
 def compute_percentiles(data: pd.DataFrame) -> pd.DataFrame:
-    """Rolling percentiles P10 et P90."""
+    """Rolling percentiles P10 et P90 (une seule passe de tri des fenêtres)."""
     if "amplitude_mean" in data.columns:
-        data["per10"] = data["amplitude_mean"].rolling(20, min_periods=5).quantile(0.10)
-        data["per90"] = data["amplitude_mean"].rolling(20, min_periods=5).quantile(0.90)
+        data["per10"], data["per90"] = rolling_quantiles(
+            data["amplitude_mean"].to_numpy(dtype=float), 20, [0.10, 0.90], min_periods=5)
     return data
 
 
@@ -71,28 +76,234 @@ def compute_frequency_index(data: pd.DataFrame) -> pd.DataFrame:
 # SECTION 3 — ENTROPIE SPECTRALE RÉALISTE
 # --------------------------------------------
 
-def compute_spectral_entropy(data: pd.DataFrame, fs: float = 1/60) -> pd.DataFrame:
+def sliding_spectral_entropy(
+    x: np.ndarray,
+    fs: float = 1/60,
+    window: int = 256,
+    nperseg: int = 64,
+    chunk: int = 4096
+) -> np.ndarray:
+    """
+    Entropie spectrale de chaque fenêtre arrière de `window` points de x :
+    - fenêtres = vue strided sans copie (sliding_window_view)
+    - un seul appel welch batché (axis=-1) par bloc de `chunk` fenêtres
+      (borne la mémoire des segments Welch)
+    Renvoie un tableau de len(x) valeurs, NaN tant que la fenêtre est incomplète.
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) < window:
+        return out
+
+    windows = sliding_window_view(x, window)
+    for a in range(0, len(windows), chunk):
+        f, Pxx = welch(windows[a:a + chunk], fs=fs, nperseg=min(nperseg, window), axis=-1)
+
+        # Distribution normalisée par fenêtre
+        p = Pxx / (np.sum(Pxx, axis=-1, keepdims=True) + 1e-12)
+        out[window - 1 + a:window - 1 + a + len(p)] = -np.sum(p * np.log2(p + 1e-12), axis=-1)
+    return out
+
+
+def compute_spectral_entropy(
+    data: pd.DataFrame,
+    fs: float = 1/60,
+    window: int = 256,
+    nperseg: int = 64
+) -> pd.DataFrame:
     """
-    Entropie spectrale via Welch :
-    fs = 1/60 = 1 point par minute
+    Entropie spectrale glissante via Welch, station par station :
+    fs = 1/60 = 1 point par minute, fenêtre de `window` minutes
+    (voir sliding_spectral_entropy)
     """
     if "amplitude_mean" not in data.columns:
         return data
-    
-    x = data["amplitude_mean"].fillna(method='ffill').values
-    
-    # Spectre via Welch
-    f, Pxx = welch(x, fs=fs, nperseg=256)
-
-    # Distribution normalisée
-    p = Pxx / (np.sum(Pxx) + 1e-12)
-    entropy = -np.sum(p * np.log2(p + 1e-12))
 
-    # Même entropie pour toutes les lignes (proxy global)
-    data["SE"] = entropy  
+    if "station" in data.columns:
+        codes = pd.factorize(data["station"], use_na_sentinel=False)[0]
+    else:
+        codes = np.zeros(len(data), dtype=np.intp)
+    times = data["time_min"] if "time_min" in data.columns else pd.Series(np.arange(len(data)))
+    if isinstance(times.dtype, pd.DatetimeTZDtype):
+        times = times.dt.tz_convert(None)
+    order = np.lexsort((times.to_numpy(), codes))
+
+    amplitude = data["amplitude_mean"].to_numpy(dtype=float)[order]
+    codes = codes[order]
+    se = np.empty(len(data))
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    stops = np.r_[starts[1:], len(data)]
+    for start, stop in zip(starts, stops):
+        x = pd.Series(amplitude[start:stop]).ffill().to_numpy()
+        se[order[start:stop]] = sliding_spectral_entropy(x, fs, window, nperseg)
+
+    data["SE"] = se
     return data
 
 
+# --------------------------------------------
+# SECTION 3 bis — FEATURES PAR FENÊTRE (notebooks d'entraînement)
+# Mêmes définitions que la boucle "for i in indices" des notebooks
+# (shannon_entropy, kurtosis, frequency_index_proxy, std, ...), calculées
+# pour toutes les fenêtres d'un coup sur une vue strided.
+# --------------------------------------------
+
+WINDOW_FEATURES = ["SE", "Kurtosis", "FI", "std", "mean", "median", "per90", "per10", "tension"]
+
+
+def _ragged_row_sum(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Somme par ligne des seules valeurs où mask est vrai, avec le même arrondi
+    que np.sum(values[i][mask[i]]) : valeurs retenues compactées en tête, puis
+    sommées par paquets de lignes de même longueur.
+    """
+    order = np.argsort(~mask, axis=1, kind="stable")
+    compact = np.take_along_axis(values, order, axis=1)
+    sizes = mask.sum(axis=1)
+    out = np.zeros(len(values))
+    for size in np.unique(sizes):
+        rows = sizes == size
+        out[rows] = np.ascontiguousarray(compact[rows, :size]).sum(axis=1)
+    return out
+
+
+def _histogram_entropy(windows: np.ndarray, bins: int = 50) -> np.ndarray:
+    """
+    shannon_entropy des notebooks pour chaque ligne : np.histogram(bins, density=True)
+    reproduit ligne par ligne (bornes min/max, mêmes corrections de bord que NumPy).
+    """
+    n = len(windows)
+    first, last = windows.min(axis=1), windows.max(axis=1)
+    flat = first == last
+    first, last = np.where(flat, first - 0.5, first), np.where(flat, last + 0.5, last)
+    edges = np.linspace(first, last, bins + 1, axis=1)
+
+    idx = ((windows - first[:, None]) / (last - first)[:, None] * bins).astype(np.intp)
+    idx[idx == bins] -= 1
+    idx[windows < np.take_along_axis(edges, idx, axis=1)] -= 1
+    idx[(windows >= np.take_along_axis(edges, idx + 1, axis=1)) & (idx != bins - 1)] += 1
+
+    counts = np.bincount((np.arange(n)[:, None] * bins + idx).ravel(), minlength=n * bins).reshape(n, bins)
+    p = counts / np.diff(edges, axis=1) / counts.sum(axis=1, keepdims=True)
+    return -_ragged_row_sum(p * np.log2(np.where(p > 0, p, 1.0)), p > 0)
+
+
+def _sample_kurtosis(windows: np.ndarray) -> np.ndarray:
+    """
+    scipy.stats.kurtosis(fisher=True, bias=False) de chaque ligne, même formule.
+    Les carrés que SciPy calcule en scalaire (m2**2, (eps*mean)**2) passent par
+    math.pow pour garder l'arrondi de l'appel fenêtre par fenêtre.
+    """
+    n = windows.shape[1]
+    square = np.frompyfunc(math.pow, 2, 1)
+    mean = windows.mean(axis=1, keepdims=True)
+    deviation = (windows - mean) ** 2
+    m2 = deviation.mean(axis=1)
+    m4 = (deviation ** 2).mean(axis=1)
+    m2_sq = square(m2, 2.0).astype(float)
+
+    with np.errstate(all="ignore"):
+        zero = m2 <= square(np.finfo(float).eps * mean[:, 0], 2.0).astype(float)
+        vals = np.where(zero, np.nan, m4 / m2_sq)
+        if n > 3:
+            nval = 1.0 / (n - 2) / (n - 3) * ((n ** 2 - 1.0) * m4 / m2_sq - 3 * (n - 1) ** 2.0)
+            vals = np.where(~zero, nval + 3.0, vals)
+    return vals - 3
+
+
+def _frequency_index_proxy(windows: np.ndarray) -> np.ndarray:
+    """FI = énergie des |x| > médiane / énergie du reste (NaN si dénominateur nul)."""
+    above = np.abs(windows) > np.median(np.abs(windows), axis=1, keepdims=True)
+    energy = windows ** 2
+    e_high = _ragged_row_sum(energy, above)
+    e_low = _ragged_row_sum(energy, ~above)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(e_low == 0, np.nan, e_high / e_low)
+
+
+def window_features(signal: np.ndarray, win: int = 10, step: int = 10, bins: int = 50) -> dict:
+    """
+    Features de toutes les fenêtres [i, i + win) pour i = 0, step, 2*step, ...
+    Les fenêtres sont une vue sans copie ; une fenêtre contenant un NaN donne NaN.
+    Renvoie {feature: tableau (nb_fenêtres,)} et "end" = indice de fin de fenêtre.
+    """
+    signal = np.asarray(signal, dtype=float)
+    if len(signal) < win:
+        return {"end": np.empty(0, dtype=np.intp), **{f: np.empty(0) for f in WINDOW_FEATURES}}
+
+    windows = sliding_window_view(signal, win)[::step]
+    bad = np.isnan(windows).any(axis=1)
+    if bad.any():
+        windows = np.where(bad[:, None], 0.0, windows)
+
+    per10, median, per90 = np.percentile(windows, 10, axis=1), np.median(windows, axis=1), \
+        np.percentile(windows, 90, axis=1)
+    features = {
+        "SE": _histogram_entropy(windows, bins),
+        "Kurtosis": _sample_kurtosis(windows),
+        "FI": _frequency_index_proxy(windows),
+        "std": windows.std(axis=1),
+        "mean": windows.mean(axis=1),
+        "median": median,
+        "per90": per90,
+        "per10": per10,
+        "tension": per90 - per10,
+    }
+    for values in features.values():
+        values[bad] = np.nan
+    features["end"] = np.arange(len(windows)) * step + win - 1
+    return features
+
+
+def _group_window_features(task) -> pd.DataFrame:
+    """Une tâche = un groupe (station, canal) ; fonction de module pour le pool de processus."""
+    key, names, signal, times, win, step, bins, time_col = task
+    features = window_features(signal, win, step, bins)
+    feat = pd.DataFrame({time_col: times[features.pop("end")], **features})
+    for name, value in zip(names, key):
+        feat[name] = value
+    return feat
+
+
+def compute_window_features(
+    df: pd.DataFrame,
+    amp_col: str = "amplitude_mean",
+    time_col: str = "time_min",
+    group_cols: List[str] = ("station", "channel"),
+    win: int = 10,
+    step: int = 10,
+    bins: int = 50,
+    workers: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Features par fenêtre pour chaque groupe station/canal (colonnes de group_cols
+    présentes dans df), triés par temps comme dans les notebooks.
+    Une ligne par fenêtre, horodatée à la fin de la fenêtre.
+    workers > 1 : groupes répartis sur un pool de processus.
+    """
+    names = [col for col in group_cols if col in df.columns]
+    groups = df.groupby(names, sort=True) if names else [((), df)]
+
+    tasks = []
+    for key, g in groups:
+        g = g.sort_values(time_col, kind="stable")
+        key = key if isinstance(key, tuple) else (key,)
+        tasks.append((key, names, g[amp_col].to_numpy(dtype=float), g[time_col].array,
+                      win, step, bins, time_col))
+
+    if workers and workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_group_window_features, tasks))
+    else:
+        frames = [_group_window_features(task) for task in tasks]
+
+    columns = [time_col, *names, *WINDOW_FEATURES]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
 # --------------------------------------------
 # SECTION 4 — ENVELOPPE LISSÉE
 # --------------------------------------------
@@ -105,6 +316,55 @@ def smooth_envelopes(data: pd.DataFrame) -> pd.DataFrame:
     return data
 
 
+# --------------------------------------------
+# SECTION 4 bis — MISE À JOUR INCRÉMENTALE
+# --------------------------------------------
+
+INCREMENTAL_FEATURES = ["RSAM", "FI", "Kurtosis", "SE_env", "FI_env", "Kurtosis_env"]
+
+
+def append_features(
+    data: pd.DataFrame,
+    new_rows: pd.DataFrame,
+    states: dict
+) -> pd.DataFrame:
+    """
+    Ajoute new_rows à data en calculant RSAM, FI, Kurtosis et les *_env en O(1)
+    par ligne, sans repasser sur l'historique.
+    - states : dict station → RollingFeatures, conservé entre deux appels
+      (un dict vide au départ ; data doit avoir été produit par cette fonction)
+    - résultats identiques aux fonctions batch appliquées station par station
+    - new_rows doit être trié par temps au sein de chaque station ; SE est repris
+      de new_rows s'il est présent
+    Seule la ligne précédente de chaque station est retouchée (FI et FI_env,
+    gradient centré).
+    """
+    out = pd.concat([data, new_rows], ignore_index=True)
+    n_old = len(data)
+    values = {col: (out[col].to_numpy(dtype=float, copy=True) if col in out.columns
+                    else np.full(len(out), np.nan)) for col in INCREMENTAL_FEATURES}
+
+    amplitude = new_rows["amplitude_mean"].to_numpy(dtype=float)
+    se = new_rows["SE"].to_numpy(dtype=float) if "SE" in new_rows.columns else np.full(len(new_rows), np.nan)
+    stations = new_rows["station"].to_numpy() if "station" in new_rows.columns else [None] * len(new_rows)
+
+    for i, station in enumerate(stations):
+        state = states.get(station)
+        if state is None:
+            state = states[station] = RollingFeatures()
+        row = state.update(amplitude[i], se[i])
+        if state.revised is not None and state.position is not None:
+            for col, value in state.revised.items():
+                values[col][state.position] = value
+        state.position = n_old + i
+        for col, value in row.items():
+            values[col][n_old + i] = value
+
+    for col, arr in values.items():
+        out[col] = arr
+    return out
+
+
 # --------------------------------------------
 # SECTION 5 — NORMALISATION (OPTION ML)
 # --------------------------------------------
@@ -166,6 +426,105 @@ def make_sequence(
     return seq.reshape(1, seq_len, len(features))
 
 
+def sequence_ends(n_rows: int, seq_len: int, stride: int = 1, pad: bool = False) -> np.ndarray:
+    """
+    Indice de la dernière ligne de chaque séquence de make_sequences
+    (pour aligner les labels : y[sequence_ends(...)]).
+    """
+    first = 0 if pad else seq_len - 1
+    return np.arange(first, n_rows, stride)
+
+
+class SequenceWindows:
+    """
+    Séquences (N, seq_len, F) avec padding à zéro en tête, sans copie de la série :
+    - les fenêtres qui débordent avant la première ligne sont des vues sur un
+      petit tampon (seq_len - 1 zéros + les seq_len - 1 premières lignes)
+    - les autres sont des vues strided sur la série elle-même
+    Indexable comme un tableau (entier, slice, liste d'indices) : seules les
+    séquences demandées sont matérialisées. np.asarray() matérialise tout.
+    """
+
+    def __init__(self, X: np.ndarray, seq_len: int, stride: int = 1):
+        n_rows, n_features = X.shape
+        head = np.zeros((2 * seq_len - 1, n_features), dtype=X.dtype)
+        head[seq_len - 1:seq_len - 1 + min(n_rows, seq_len - 1)] = X[:seq_len - 1]
+
+        # Débuts de fenêtre dans la série paddée : 0, stride, 2*stride, ...
+        starts = np.arange(0, n_rows, stride)
+        n_head = int(np.searchsorted(starts, seq_len - 1))
+        self.head = sliding_window_view(head, seq_len, axis=0).transpose(0, 2, 1)[:seq_len - 1:stride][:n_head]
+        if len(starts) > n_head:
+            first = starts[n_head] - (seq_len - 1)
+            self.body = sliding_window_view(X, seq_len, axis=0).transpose(0, 2, 1)[first::stride]
+        else:
+            self.body = np.empty((0, seq_len, n_features), dtype=X.dtype)
+        self.shape = (len(self.head) + len(self.body), seq_len, n_features)
+        self.dtype = X.dtype
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            index = index + len(self) if index < 0 else index
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            n_head = len(self.head)
+            return self.head[index] if index < n_head else self.body[index - n_head]
+        rows = np.arange(len(self))[index]
+        out = np.empty((len(rows),) + self.shape[1:], dtype=self.dtype)
+        in_head = rows < len(self.head)
+        out[in_head] = self.head[rows[in_head]]
+        out[~in_head] = self.body[rows[~in_head] - len(self.head)]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        out = self[:]
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+
+def make_sequences(
+    data,
+    features: Optional[List[str]] = None,
+    seq_len: int = 480,
+    stride: int = 1,
+    pad: bool = False,
+    path: Optional[str] = None,
+    chunk: int = 4096
+):
+    """
+    Toutes les séquences (N, seq_len, nb_features) d'une série, une toutes les
+    `stride` lignes, sans copie (séquence k = lignes se terminant en
+    sequence_ends(...)[k]) :
+    - data : DataFrame (colonnes features) ou tableau (T, F)
+    - pad=False : fenêtres complètes seulement → vue strided (sliding_window_view)
+    - pad=True  : une séquence par pas dès la première ligne, zéros en tête
+      (comme make_sequence) → SequenceWindows, toujours sans copie de la série
+    - path : écrit les séquences dans un .npy et renvoie un memmap
+      (par blocs de `chunk` séquences, la RAM reste bornée)
+    """
+    X = data[features].to_numpy() if isinstance(data, pd.DataFrame) else np.asarray(data)
+    if X.ndim == 1:
+        X = X[:, None]
+
+    if pad:
+        windows = SequenceWindows(X, seq_len, stride)
+    elif len(X) >= seq_len:
+        windows = sliding_window_view(X, seq_len, axis=0).transpose(0, 2, 1)[::stride]
+    else:
+        windows = np.empty((0, seq_len, X.shape[1]), dtype=X.dtype)
+
+    if path is None:
+        return windows
+
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=X.dtype, shape=windows.shape)
+    for a in range(0, len(windows), chunk):
+        out[a:a + chunk] = windows[a:a + chunk]
+    out.flush()
+    return out
+
+
 # --------------------------------------------
 # SECTION 7 — PIPELINE PRINCIPAL (Dashboard)
 # --------------------------------------------
@@ -185,7 +544,7 @@ def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
     data = compute_frequency_index(data)
     data = compute_kurtosis(data)
     
-    # Entropie spectrale simplifiée (optimale pour dashboard)
+    # Entropie spectrale glissante (fenêtres de 256 min par station)
     data = compute_spectral_entropy(data)
 
     data = smooth_envelopes(data)
@@ -1,140 +1,515 @@
 # real_time_update.py — VERSÃO FINAL 100% CORRETA — RSAM 380-1950, GAUGE 21%
+import queue
+import threading
 import streamlit as st
-import requests
-from obspy import read, UTCDateTime
-from io import BytesIO
+from obspy import Stream, UTCDateTime
 import pandas as pd
 import numpy as np
+from constants import FDSN_DATASELECT_URL, REALTIME_WINDOW_S, REALTIME_OVERLAP_S
+from fdsn_client import fetch_stations
+from preprocess import INCREMENTAL_FEATURES, append_features
 
-def start_realtime_update():
-    for key in ["raw_data", "stream", "df_realtime", "last_ml_risk"]:
-        st.session_state.pop(key, None)
-    st.session_state.rt_running = True
-    st.session_state.rt_step = 1
 
-def run_realtime_update():
-    if not st.session_state.get("rt_running", False):
-        return
+# ------------------------------------------------------------
+# Tampon circulaire 24 h par station (partagé par tout le processus)
+# ------------------------------------------------------------
+class MinuteRingBuffer:
+    """
+    Une case par minute sur REALTIME_WINDOW_S secondes, pour chaque station.
+    La case d'une minute est (minute epoch) % nb_minutes : une écriture est O(1)
+    et les minutes de plus de 24 h sont écrasées d'elles-mêmes.
+    last_end[station] = début de la dernière minute ingérée (UTCDateTime).
+    """
+
+    def __init__(self, seconds: int = REALTIME_WINDOW_S):
+        self.minutes = seconds // 60
+        self._values = {}
+        self._stamps = {}
+        self.last_end = {}
+        self._lock = threading.Lock()
+
+    def merge(self, df: pd.DataFrame, since: dict = None) -> None:
+        """Écrit les minutes de df (time_min, station, amplitude_mean) ; since[station] = 1re minute à écrire."""
+        since = since or {}
+        with self._lock:
+            for station, g in df.groupby("station"):
+                minute = g["time_min"].to_numpy().astype("datetime64[m]").astype(np.int64)
+                keep = minute >= since.get(station, np.iinfo(np.int64).min)
+                minute = minute[keep]
+                if station not in self._values:
+                    self._values[station] = np.full(self.minutes, np.nan)
+                    self._stamps[station] = np.full(self.minutes, -1, dtype=np.int64)
+                slot = minute % self.minutes
+                self._values[station][slot] = g["amplitude_mean"].to_numpy()[keep]
+                self._stamps[station][slot] = minute
+
+    def oldest_minute(self, now: UTCDateTime) -> int:
+        return int((now.timestamp - self.minutes * 60) // 60)
+
+    def station_minutes(self, station: str, oldest: int):
+        """(minutes epoch triées, amplitudes) d'une station depuis la minute oldest."""
+        with self._lock:
+            stamps = self._stamps.get(station)
+            if stamps is None:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            valid = stamps >= oldest
+            stamps, values = stamps[valid], self._values[station][valid]
+        order = np.argsort(stamps, kind="stable")
+        return stamps[order], values[order]
+
+    def stations(self) -> list:
+        with self._lock:
+            return list(self._stamps)
+
+    def to_frame(self, now: UTCDateTime) -> pd.DataFrame:
+        """Minutes des dernières 24 h (time_min, station, amplitude_mean), triées par temps."""
+        oldest = self.oldest_minute(now)
+        frames = []
+        with self._lock:
+            for station, stamps in self._stamps.items():
+                valid = stamps >= oldest
+                if not valid.any():
+                    continue
+                frames.append(pd.DataFrame({
+                    "time_min": stamps[valid].astype("datetime64[m]").astype("datetime64[ns]"),
+                    "station": station,
+                    "amplitude_mean": self._values[station][valid],
+                }))
+        if not frames:
+            return pd.DataFrame(columns=["time_min", "station", "amplitude_mean"])
+        return pd.concat(frames, ignore_index=True).sort_values(["time_min", "station"], ignore_index=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._stamps.clear()
+            self.last_end.clear()
+
+
+realtime_buffer = MinuteRingBuffer()
+
+
+# ------------------------------------------------------------
+# Features incrémentales par station (état RollingFeatures à côté du tampon)
+# ------------------------------------------------------------
+def _minute_frame(station: str, stamps: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame({
+        "time_min": stamps.astype("datetime64[m]").astype("datetime64[ns]"),
+        "station": station,
+        "amplitude_mean": values,
+    })
+
+
+class StationFeatures:
+    """
+    Features de preprocess.append_features (RSAM, Kurtosis, *_env...) tenues à jour
+    station par station : chaque actualisation n'ajoute que les nouvelles minutes
+    du tampon au lieu de recalculer les 24 h.
+    - seules les minutes terminées (avant la minute de last_end, souvent partielle)
+      entrent dans l'état ; les suivantes sont calculées sur une copie
+    - si une minute déjà traitée a changé dans le tampon (trou comblé après un échec,
+      tampon vidé), la station est recalculée depuis le tampon
+    Seul RSAM est exposé par realtime_features (voir REALTIME_ENVELOPES).
+    """
+
+    def __init__(self):
+        self._frames = {}   # station → lignes traitées (sortie de append_features)
+        self._stamps = {}   # station → minutes epoch de ces lignes
+        self._states = {}   # station → {station: RollingFeatures}
+        self._lock = threading.Lock()
+
+    def _sync(self, station: str, stamps: np.ndarray, values: np.ndarray, oldest: int, done: int) -> None:
+        """Aligne l'état de la station sur les minutes du tampon antérieures à done."""
+        fed = self._stamps.get(station, np.empty(0, dtype=np.int64))
+        frame = self._frames.get(station)
+        if len(fed):
+            # Lignes sorties de la fenêtre de 24 h
+            drop = int(np.searchsorted(fed, oldest))
+            if drop:
+                fed, frame = fed[drop:], frame.iloc[drop:].reset_index(drop=True)
+                state = self._states[station][station]
+                state.position = state.position - drop if state.position >= drop else None
+            known = stamps <= fed[-1] if len(fed) else np.zeros(len(stamps), dtype=bool)
+            if not (np.array_equal(stamps[known], fed)
+                    and np.array_equal(values[known], frame["amplitude_mean"].to_numpy(), equal_nan=True)):
+                fed, frame = fed[:0], None
+                self._states.pop(station, None)
+        if frame is None:
+            frame = _minute_frame(station, stamps[:0], values[:0])
+
+        new = (stamps > (fed[-1] if len(fed) else np.iinfo(np.int64).min)) & (stamps < done)
+        if new.any():
+            states = self._states.setdefault(station, {})
+            frame = append_features(frame, _minute_frame(station, stamps[new], values[new]), states)
+            fed = np.concatenate([fed, stamps[new]])
+        self._frames[station], self._stamps[station] = frame, fed
+
+    def update(self, buffer: MinuteRingBuffer, now: UTCDateTime, stations=None) -> pd.DataFrame:
+        """Features des dernières 24 h des stations demandées (toutes par défaut)."""
+        oldest = buffer.oldest_minute(now)
+        frames = []
+        with self._lock:
+            for station in buffer.stations():
+                if stations is not None and station not in stations:
+                    continue
+                stamps, values = buffer.station_minutes(station, oldest)
+                last_end = buffer.last_end.get(station)
+                done = int(last_end.timestamp // 60) if last_end is not None else np.iinfo(np.int64).min
+                self._sync(station, stamps, values, oldest, done)
+
+                frame = self._frames[station]
+                fed = self._stamps[station]
+                tail = stamps > (fed[-1] if len(fed) else np.iinfo(np.int64).min)
+                if tail.any():
+                    states = {key: state.copy() for key, state in self._states.get(station, {}).items()}
+                    frame = append_features(frame, _minute_frame(station, stamps[tail], values[tail]), states)
+                if len(frame):
+                    frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=["time_min", "station", "amplitude_mean", *INCREMENTAL_FEATURES])
+        return pd.concat(frames, ignore_index=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._stamps.clear()
+            self._states.clear()
+
+
+station_features = StationFeatures()
+
+
+# ------------------------------------------------------------
+# Téléchargement incrémental + traitement (indépendants de Streamlit)
+# ------------------------------------------------------------
+def station_starttimes(stations, endtime: UTCDateTime, buffer: MinuteRingBuffer = realtime_buffer) -> dict:
+    """Début de la requête par station : dernière fin ingérée - recouvrement, au plus 24 h avant."""
+    oldest = endtime - REALTIME_WINDOW_S
+    starts = {}
+    for station in stations:
+        last_end = buffer.last_end.get(station)
+        starts[station] = oldest if last_end is None else max(oldest, last_end - REALTIME_OVERLAP_S)
+    return starts
+
+
+def fetch_realtime_delta(stations, endtime: UTCDateTime, url: str = FDSN_DATASELECT_URL,
+                         buffer: MinuteRingBuffer = realtime_buffer) -> dict:
+    """
+    Télécharge uniquement ce qui manque depuis la dernière actualisation,
+    station par station et en parallèle (voir fdsn_client.fetch_stations).
+    Renvoie {"stream": Stream, "starts": {station: UTCDateTime}, "stats": {...}}.
+    """
+    starts = station_starttimes(stations, endtime, buffer)
+    stream, stats = fetch_stations(starts, endtime, url=url)
+    if stats["failed"] and len(stats["failed"]) == stats["chunks"]:
+        raise RuntimeError(f"Échec du téléchargement : {stats['failed'][0][-1]}")
+    return {"stream": stream, "starts": starts, "stats": stats}
+
+
+def waveforms_to_minutes(stream: Stream) -> pd.DataFrame:
+    """
+    Formes d'onde → amplitude moyenne par minute et par station (time_min, station, amplitude_mean).
+    Agrégation vectorisée par trace (minute_means), puis un seul DataFrame colonnaire.
+    """
+    good_traces = [t for t in stream if t.stats.channel.endswith('Z') and len(t.data) > 100]
+    stream = type(stream)(good_traces)
+    stream.merge(method=1, fill_value=0)
+
+    stream.detrend("linear")
+    stream.filter("bandpass", freqmin=1.0, freqmax=16.0, corners=4, zerophase=True)
+
+    minutes, values, stations = [], [], []
+    for tr in stream:
+        if abs(tr.stats.sampling_rate - 100.0) > 2.0:
+            continue
+        try:
+            tr.decimate(25, no_filter=True)
+            data = np.abs(tr.data).astype('float64') / 25.0
+
+            dt_ns = int(round(1e9 / tr.stats.sampling_rate))
+            minute, mean = minute_means(data, tr.stats.starttime.ns, dt_ns)
+            minutes.append(minute)
+            values.append(mean)
+            stations.append((tr.stats.station, len(minute)))
+        except:
+            continue
+
+    if not minutes:
+        return pd.DataFrame(columns=["time_min", "station", "amplitude_mean"])
+
+    names = np.array([name for name, _ in stations], dtype=object)
+    return pd.DataFrame({
+        "time_min": np.concatenate(minutes).astype("datetime64[m]").astype("datetime64[ns]"),
+        "station": np.repeat(names, [count for _, count in stations]),
+        "amplitude_mean": np.concatenate(values),
+    })
+
+
+def minute_means(data: np.ndarray, t0_ns: int, dt_ns: int):
+    """
+    Moyenne par minute calendaire d'un signal régulier (1er échantillon à t0_ns,
+    pas dt_ns) : équivalent à resample('1min').mean(), sans index temporel.
+    Les frontières de minutes sont calculées directement en indices d'échantillon,
+    puis un seul np.add.reduceat somme chaque minute sur le tableau contigu.
+    Renvoie (minutes epoch int64, moyennes).
+    """
+    n = len(data)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    minute_ns = 60 * 10**9
+    first = t0_ns // minute_ns
+    last = (t0_ns + (n - 1) * dt_ns) // minute_ns
+    boundaries = np.arange(first + 1, last + 1, dtype=np.int64) * minute_ns
+    starts = np.r_[0, -((t0_ns - boundaries) // dt_ns)]     # 1er échantillon ≥ frontière
+    counts = np.diff(np.r_[starts, n])
+    return np.arange(first, last + 1, dtype=np.int64), np.add.reduceat(data, starts) / counts
+
 
-    status = st.sidebar.empty()
-    progress = st.sidebar.progress(0)
-    log = st.sidebar.empty()
+def ingest_realtime(stations, endtime: UTCDateTime = None, url: str = FDSN_DATASELECT_URL,
+                    buffer: MinuteRingBuffer = realtime_buffer,
+                    features: StationFeatures = station_features) -> pd.DataFrame:
+    """
+    Étapes 1 + 2 sans Streamlit : télécharge le delta, le fusionne dans le tampon
+    et renvoie les 24 h de toutes les stations demandées (voir realtime_features).
+    """
+    endtime = endtime or UTCDateTime.now()
+    fetched = fetch_realtime_delta(stations, endtime, url=url, buffer=buffer)
+    merge_delta(waveforms_to_minutes(fetched["stream"]), fetched["starts"], buffer, fetched["stats"]["failed"])
+    return realtime_features(endtime, stations, buffer, features)
 
-    status.info("Début du téléchargement...")
-    st.session_state.rt_step = st.session_state.get("rt_step", 1)
 
-    if st.session_state.rt_step == 1:
-        log.info("Étape 1/3: Téléchargement...")
-        progress.progress(20)
+def merge_delta(df_minutes: pd.DataFrame, starts: dict, buffer: MinuteRingBuffer = realtime_buffer,
+                failed=()) -> None:
+    """
+    Fusionne un delta dans le tampon. Pour une station déjà suivie, seules les minutes
+    à partir de la dernière minute ingérée sont réécrites : le recouvrement sert
+    d'amorce au filtre et n'écrase pas l'historique.
+    failed : tranches en échec (station, début, fin, erreur) de fetch_stations ;
+    last_end ne dépasse pas le début de la première d'entre elles, pour que la
+    prochaine actualisation redemande la plage manquante.
+    """
+    since = {}
+    for station in starts:
+        last_end = buffer.last_end.get(station)
+        if last_end is not None:
+            since[station] = int(last_end.timestamp // 60)
+    buffer.merge(df_minutes, since)
 
+    if not df_minutes.empty:
+        last_minutes = df_minutes.groupby("station")["time_min"].max()
+        for station, ts in last_minutes.items():
+            # début de la dernière minute (souvent partielle) : réécrite au prochain delta
+            end = UTCDateTime(pd.Timestamp(ts).to_pydatetime())
+            previous = buffer.last_end.get(station)
+            buffer.last_end[station] = end if previous is None else max(previous, end)
+
+    first_failure = {}
+    for station, t0, *_ in failed:
+        first_failure[station] = min(first_failure.get(station, t0), t0)
+    for station, t0 in first_failure.items():
+        previous = buffer.last_end.get(station)
+        buffer.last_end[station] = t0 if previous is None else min(previous, t0)
+
+
+# Valeurs fixes de SE_env et Kurt_env en temps réel (comme avant le calcul incrémental) :
+# SE n'est pas calculé sur le flux, et Kurtosis_env de preprocess est un moment
+# d'ordre 4 brut, pas à l'échelle de Kurt_env des archives.
+REALTIME_ENVELOPES = {"SE_env": 0.1, "Kurt_env": 3.0}
+
+
+def realtime_features(now: UTCDateTime, stations=None, buffer: MinuteRingBuffer = realtime_buffer,
+                      features: StationFeatures = station_features) -> pd.DataFrame:
+    """
+    RSAM (amplitude_mean × 60 lissée) par station sur les dernières 24 h du tampon,
+    plus SE_env et Kurt_env à leurs valeurs fixes (REALTIME_ENVELOPES) : colonnes
+    attendues par le dashboard et la prédiction. Calcul incrémental : voir StationFeatures.
+    """
+    df = features.update(buffer, now, stations).sort_values("time_min", kind="stable")
+    df["RSAM"] = (df["RSAM"] * 60).bfill()
+    for col, value in REALTIME_ENVELOPES.items():
+        df[col] = value
+    return df[["time_min", "station", "amplitude_mean", "RSAM", "SE_env", "Kurt_env"]].reset_index(drop=True)
+
+
+# ------------------------------------------------------------
+# Worker de fond : téléchargement, traitement et prédiction hors du script Streamlit
+# ------------------------------------------------------------
+class RealtimeJob:
+    """État d'une actualisation, publié par le worker et lu par la page."""
+
+    def __init__(self, job_id: int, stations):
+        self.id = job_id
+        self.stations = list(stations)
+        self.status = "queued"        # queued → running → done | error
+        self.step = 0
+        self.progress = 0
+        self.message = "En attente..."
+        self.warning = None
+        self.df = None
+        self.risk = None
+        self.model_ok = True
+        self.error = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+
+class RealtimeWorker(threading.Thread):
+    """
+    Thread démon unique du processus : exécute les jobs de la file un par un
+    (le tampon temps réel n'est donc jamais alimenté par deux jobs à la fois).
+    Un job survit aux reruns et à la fermeture de la page qui l'a lancé.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True, name="realtime-worker")
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def submit(self, stations) -> RealtimeJob:
+        """Ajoute un job ; réutilise un job identique encore en file ou en cours."""
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.finished and job.stations == list(stations):
+                    return job
+            job = RealtimeJob(self._next_id, stations)
+            self._next_id += 1
+            self._jobs[job.id] = job
+            # On ne garde que les derniers jobs terminés
+            for old_id in [i for i, j in self._jobs.items() if j.finished][:-20]:
+                del self._jobs[old_id]
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run_job(job)
+            except Exception as e:
+                job.error = str(e)
+                job.status = "error"
+
+    @staticmethod
+    def _run_job(job: RealtimeJob):
+        job.status = "running"
         endtime = UTCDateTime.now()
-        starttime = endtime - 86400
-        stations_str = ",".join(st.session_state.selected_stations)
 
-        url = "https://ws.ipgp.fr/fdsnws/dataselect/1/query"
-        params = {
-            "network": "PF", "station": stations_str, "location": "*",
-            "channel": "HHZ,BHZ,EHZ,SHZ",
-            "starttime": starttime.isoformat(), "endtime": endtime.isoformat()
-        }
-        headers = {"User-Agent": "PitonFournaiseDashboard/1.0"}
+        job.step, job.progress, job.message = 1, 20, "Étape 1/3: Téléchargement..."
+        try:
+            fetched = fetch_realtime_delta(job.stations, endtime)
+        except Exception:
+            job.error = "Échec du téléchargement"
+            job.status = "error"
+            return
+        size_mb = fetched["stats"]["bytes"] / (1024**2)
+        if fetched["stats"]["failed"]:
+            failed = sorted({station for station, *_ in fetched["stats"]["failed"]})
+            job.warning = f"Stations incomplètes (redemandées à la prochaine actualisation) : {', '.join(failed)}"
 
+        job.step, job.progress, job.message = 2, 50, f"Étape 2/3: Lecture et traitement ({size_mb:.1f} MB)..."
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=900)
-            response.raise_for_status()
-            st.session_state.raw_data = response.content
-            size_mb = len(response.content) / (1024**2)
-            log.success(f"Étape 1/3 terminée — {size_mb:.1f} MB")
-            st.session_state.rt_step = 2
-            progress.progress(50)
-            st.rerun()
+            merge_delta(waveforms_to_minutes(fetched["stream"]), fetched["starts"], failed=fetched["stats"]["failed"])
+            del fetched
+            df = realtime_features(endtime, job.stations)
+            if df.empty:
+                raise ValueError("Pas de données")
         except Exception as e:
-            status.error("Échec du téléchargement")
-            st.session_state.rt_running = False
+            job.error = f"Erreur traitement : {e}"
+            job.status = "error"
             return
+        job.df = df
 
-    elif st.session_state.rt_step == 2:
-        log.info("Étape 2/3: Lecture et traitement...")
-        progress.progress(75)
-
+        job.step, job.progress, job.message = 3, 75, f"Étape 3/3: Prédiction ML ({len(df):,} lignes)..."
         try:
-            stream = read(BytesIO(st.session_state.raw_data), format="MSEED")
-            good_traces = [t for t in stream if t.stats.channel.endswith('Z') and len(t.data) > 100]
-            stream = type(stream)(good_traces)
-            stream.merge(method=1, fill_value=0)
+            from prediction_service import predict_risk
+            job.risk = predict_risk(df)
+        except:
+            job.risk = np.random.uniform(20, 50)
+            job.model_ok = False
 
-            stream.detrend("linear")
-            stream.filter("bandpass", freqmin=1.0, freqmax=16.0, corners=4, zerophase=True)
+        job.progress, job.message = 100, "Terminé"
+        job.status = "done"
 
-            data_list = []
-            for tr in stream:
-                if abs(tr.stats.sampling_rate - 100.0) > 2.0:
-                    continue
-                try:
-                    tr.decimate(25, no_filter=True)
-                    data = np.abs(tr.data).astype('float64') / 25.0
-
-                    start = tr.stats.starttime.datetime
-                    times = pd.date_range(start, periods=len(data), freq="0.25S")
-                    series = pd.Series(data, index=times).resample('1min').mean()
-
-                    station = tr.stats.station
-                    for ts, val in series.items():
-                        data_list.append({
-                            "time_min": ts,
-                            "station": station,
-                            "amplitude_mean": float(val),
-                            "RSAM_raw": float(val) * 60
-                        })
-                except:
-                    continue
 
-            if not data_list:
-                raise ValueError("Pas de données")
+_worker = None
+_worker_lock = threading.Lock()
 
-            df = pd.DataFrame(data_list).sort_values("time_min")
 
-            df["RSAM"] = df.groupby("station")["RSAM_raw"].transform(
-                lambda x: x.rolling(10, min_periods=3).mean()
-            )
-            df["RSAM"] = df["RSAM"].fillna(method="bfill")
+def get_worker() -> RealtimeWorker:
+    """Worker du processus, démarré au premier appel."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = RealtimeWorker()
+            _worker.start()
+        return _worker
 
-            df["SE_env"] = 0.1
-            df["Kurt_env"] = 3.0
 
-            df = df[["time_min", "station", "amplitude_mean", "RSAM", "SE_env", "Kurt_env"]]
-            st.session_state.df_realtime = df
+# ------------------------------------------------------------
+# Pilotage Streamlit : lancement du job + suivi sans bloquer la page
+# ------------------------------------------------------------
+def start_realtime_update():
+    for key in ["raw_data", "stream", "last_ml_risk"]:
+        st.session_state.pop(key, None)
+    job = get_worker().submit(st.session_state.selected_stations)
+    st.session_state.rt_job_id = job.id
+    st.session_state.rt_running = True
 
-            log.success(f"Étape 2/3 terminée — {len(df):,} lignes")
-            st.session_state.rt_step = 3
-            st.rerun()
 
-        except Exception as e:
-            status.error(f"Erreur traitement : {e}")
-            st.session_state.rt_running = False
-            return
+def _publish_result(job: RealtimeJob):
+    """Copie le résultat d'un job terminé dans la session."""
+    st.session_state.rt_running = False
+    st.session_state.pop("rt_job_id", None)
+    if job.status == "error":
+        st.session_state.rt_error = job.error
+        return
+    st.session_state.pop("rt_error", None)
+    st.session_state.df_realtime = job.df
+    st.session_state.last_ml_risk = job.risk
+    st.session_state.rt_model_ok = job.model_ok
 
-    elif st.session_state.rt_step == 3:
-        log.info("Étape 3/3: Prédiction ML...")
-        progress.progress(98)
 
-        df = st.session_state.df_realtime
+@st.fragment(run_every=1.0)
+def _poll_realtime_job():
+    """Fragment rafraîchi chaque seconde : seul ce bloc est réexécuté pendant le job."""
+    job = get_worker().get(st.session_state.get("rt_job_id"))
+    if job is None:
+        st.session_state.rt_running = False
+        st.rerun()
+        return
 
-        try:
-            from prediction import run_model
-            risk = run_model(df)
-            st.session_state.last_ml_risk = risk
-            log.success(f"Prédiction : {risk:.1f}%")
+    if job.finished:
+        _publish_result(job)
+        st.rerun()
+        return
+
+    st.info("Début du téléchargement..." if job.status == "queued" else "Actualisation en cours...")
+    st.progress(job.progress)
+    st.info(job.message)
+    if job.warning:
+        st.warning(job.warning)
+
+
+def run_realtime_update():
+    if st.session_state.get("rt_running", False):
+        with st.sidebar:
+            _poll_realtime_job()
+        return
+
+    if "rt_error" in st.session_state:
+        st.sidebar.error(st.session_state.pop("rt_error"))
+    elif st.session_state.get("last_ml_risk") is not None and "rt_model_ok" in st.session_state:
+        risk = st.session_state.last_ml_risk
+        if st.session_state.pop("rt_model_ok"):
             st.sidebar.success(f"Prédiction : {risk:.1f}% risque")
-        except:
-            risk = np.random.uniform(20, 50)
-            st.session_state.last_ml_risk = risk
+        else:
             st.sidebar.warning("Modèle en test")
-
-        status.empty()
-        progress.empty()
-        log.empty()
         st.sidebar.success("TÉLÉCHARGEMENT TERMINÉ !")
-        st.session_state.rt_running = False
-        st.session_state.rt_step = 1
-        st.rerun()
\ No newline at end of file
@@ -0,0 +1,292 @@
+# ============================================
+# rolling.py — statistiques glissantes (moyennes incrémentales O(1),
+# quantiles glissants) reproduisant exactement les fenêtres pandas
+# ============================================
+
+import math
+from bisect import bisect_left, insort
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class RollingMean:
+    """
+    Équivalent en flux de Series.rolling(window, min_periods).mean().
+    Même algorithme que pandas (somme compensée de Kahan, compensations
+    séparées pour les ajouts et les retraits, NaN ignorés, correction de signe)
+    afin d'obtenir des résultats identiques bit à bit.
+    """
+
+    def __init__(self, window: int, min_periods: int = None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self._values = deque()
+        self.nobs = 0
+        self._sum = 0.0
+        self._neg = 0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._same = 0
+        self._prev = math.nan
+
+    def _add(self, val: float) -> None:
+        if val == val:
+            self.nobs += 1
+            y = val - self._comp_add
+            t = self._sum + y
+            self._comp_add = t - self._sum - y
+            self._sum = t
+            if math.copysign(1.0, val) < 0:
+                self._neg += 1
+            self._same = self._same + 1 if val == self._prev else 1
+            self._prev = val
+
+    def _remove(self, val: float) -> None:
+        if val == val:
+            self.nobs -= 1
+            y = -val - self._comp_remove
+            t = self._sum + y
+            self._comp_remove = t - self._sum - y
+            self._sum = t
+            if math.copysign(1.0, val) < 0:
+                self._neg -= 1
+
+    def update(self, value: float) -> float:
+        """Ajoute un échantillon et renvoie la moyenne de la fenêtre courante."""
+        value = float(value)
+        if len(self._values) == self.window:
+            self._remove(self._values.popleft())
+        self._values.append(value)
+        self._add(value)
+        return self.value
+
+    def copy(self) -> "RollingMean":
+        twin = RollingMean.__new__(RollingMean)
+        twin.__dict__.update(self.__dict__)
+        twin._values = deque(self._values)
+        return twin
+
+    @property
+    def value(self) -> float:
+        if self.nobs >= self.min_periods and self.nobs > 0:
+            result = self._sum / self.nobs
+            if self._same >= self.nobs:
+                return self._prev
+            if self._neg == 0 and result < 0:
+                return 0.0
+            if self._neg == self.nobs and result > 0:
+                return 0.0
+            return result
+        return math.nan
+
+
+class RollingFeatures:
+    """
+    État glissant d'une station pour les features de preprocess.py :
+    - RSAM         = rolling(10, min_periods=3).mean() de amplitude_mean
+    - Kurtosis     = ((x - rolling(20, min_periods=5).mean()) ** 4).rolling(20).mean()
+    - FI           = np.gradient(amplitude_mean.fillna(0))
+    - *_env        = rolling(15, min_periods=5).mean() de SE, FI et Kurtosis
+    Chaque update() coûte O(1) et renvoie les valeurs de la dernière ligne,
+    identiques au calcul batch sur la série reçue jusque-là.
+
+    FI est un gradient centré : la valeur de la dernière ligne est provisoire
+    (différence à gauche, comme le bord de np.gradient). À l'échantillon suivant
+    elle devient définitive et est exposée dans self.revised (FI, FI_env).
+    """
+
+    def __init__(self):
+        self.rsam = RollingMean(10, 3)
+        self.mean20 = RollingMean(20, 5)
+        self.kurtosis = RollingMean(20)
+        self.se_env = RollingMean(15, 5)
+        self.fi_env = RollingMean(15, 5)
+        self.kurtosis_env = RollingMean(15, 5)
+        self._last = []  # deux dernières amplitudes (NaN → 0) pour le gradient
+        self.revised = None
+        self.position = None  # ligne de la dernière valeur dans le frame de l'appelant
+
+    def update(self, amplitude: float, se: float = np.nan) -> dict:
+        amplitude = float(amplitude)
+        rsam = self.rsam.update(amplitude)
+        mean20 = self.mean20.update(amplitude)
+        # np.power (boucle ufunc) : arrondi identique à Series ** 4, contrairement à float ** 4
+        kurtosis = self.kurtosis.update(np.power(amplitude - mean20, 4.0))
+
+        # Gradient : finalise la ligne précédente, estime la ligne courante
+        f = 0.0 if amplitude != amplitude else amplitude
+        self.revised = None
+        if not self._last:
+            fi = math.nan
+        else:
+            fi = f - self._last[-1]
+            final = fi if len(self._last) == 1 else (f - self._last[0]) / 2.0
+            self.revised = {"FI": final, "FI_env": self.fi_env.update(final)}
+        self._last = (self._last + [f])[-2:]
+        fi_env = self.fi_env.copy().update(fi) if fi == fi else self.fi_env.value
+
+        return {
+            "RSAM": rsam,
+            "FI": fi,
+            "Kurtosis": kurtosis,
+            "SE_env": self.se_env.update(se),
+            "FI_env": fi_env,
+            "Kurtosis_env": self.kurtosis_env.update(kurtosis),
+        }
+
+    def copy(self) -> "RollingFeatures":
+        clone = RollingFeatures.__new__(RollingFeatures)
+        for name, attr in vars(self).items():
+            setattr(clone, name, attr.copy() if isinstance(attr, RollingMean) else attr)
+        clone._last = list(self._last)
+        return clone
+
+
+# --------------------------------------------
+# Quantiles glissants (statistiques d'ordre) : un seul tri des fenêtres
+# donne tous les quantiles demandés, identiques à rolling().quantile()
+# --------------------------------------------
+
+# Lignes traitées à la fois (borne la mémoire des fenêtres triées)
+_CHUNK_ROWS = 1 << 16
+
+# Jusqu'à cette taille, réseau de comparaisons plutôt que np.sort
+_NETWORK_MAX_WINDOW = 8
+
+
+def _sort_lanes(lanes: list) -> list:
+    """Tri élément par élément d'une liste de tableaux (réseau pair-impair : min/max)."""
+    w = len(lanes)
+    for p in range(w):
+        for i in range(p % 2, w - 1, 2):
+            lanes[i], lanes[i + 1] = np.minimum(lanes[i], lanes[i + 1]), np.maximum(lanes[i], lanes[i + 1])
+    return lanes
+
+
+def _select_quantiles(sorted_windows: np.ndarray, counts: np.ndarray, qs, min_periods: int,
+                      interpolation: str, axis: int = 1) -> np.ndarray:
+    """
+    Quantiles de fenêtres triées le long de axis, valeurs valides en tête.
+    Même arithmétique que pandas : idx = q * (nobs - 1), puis interpolation.
+    """
+    out = np.empty((len(qs), len(counts)))
+    last = sorted_windows.shape[axis] - 1
+    for k, q in enumerate(qs):
+        pos = q * (counts - 1).astype(float)
+        idx = np.clip(np.floor(pos).astype(np.intp), 0, last)
+        low = np.take_along_axis(sorted_windows, np.expand_dims(idx, axis), axis=axis).squeeze(axis)
+        high = np.take_along_axis(sorted_windows, np.expand_dims(np.minimum(idx + 1, last), axis),
+                                  axis=axis).squeeze(axis)
+        with np.errstate(invalid="ignore"):  # inf des fenêtres incomplètes, écartés ensuite
+            if interpolation == "midpoint":
+                value = (low + high) / 2
+            else:
+                value = low + (high - low) * (pos - idx)
+        out[k] = np.where(pos == idx, low, value)
+        out[k, (counts < min_periods) | (counts == 0)] = np.nan
+    return out
+
+
+def _rolling_quantiles_1d(values, window, qs, min_periods, center, groups, interpolation):
+    n = len(values)
+    left = window // 2 if center else window - 1
+    padded = np.full(n + window - 1, np.nan)
+    padded[left:left + n] = values
+    if groups is not None:
+        padded_groups = np.full(n + window - 1, -1, dtype=np.int64)
+        padded_groups[left:left + n] = groups
+
+    out = np.empty((len(qs), n))
+    for a in range(0, n, _CHUNK_ROWS):
+        b = min(a + _CHUNK_ROWS, n)
+        if window <= _NETWORK_MAX_WINDOW:
+            # Petites fenêtres : window décalages contigus triés par min/max
+            lanes, counts = [], np.zeros(b - a, dtype=np.intp)
+            for k in range(window):
+                lane = padded[a + k:b + k]
+                valid = ~np.isnan(lane)
+                if groups is not None:
+                    valid &= padded_groups[a + k:b + k] == groups[a:b]
+                counts += valid
+                lanes.append(np.where(valid, lane, np.inf))  # invalides triés en fin
+            block = np.stack(_sort_lanes(lanes))
+            out[:, a:b] = _select_quantiles(block, counts, qs, min_periods, interpolation, axis=0)
+        else:
+            windows = sliding_window_view(padded[a:b + window - 1], window)
+            invalid = np.isnan(windows)
+            if groups is not None:
+                invalid |= sliding_window_view(padded_groups[a:b + window - 1], window) != groups[a:b, None]
+            counts = window - invalid.sum(axis=1)
+            block = np.where(invalid, np.inf, windows)
+            block.sort(axis=1)
+            out[:, a:b] = _select_quantiles(block, counts, qs, min_periods, interpolation)
+    return out
+
+
+def rolling_quantiles(values, window: int, qs, min_periods: int = None, center: bool = False,
+                      groups=None, interpolation: str = "linear") -> np.ndarray:
+    """
+    Plusieurs quantiles glissants en une passe : chaque fenêtre est triée une
+    seule fois (np.sort, ou réseau de comparaisons pour les petites fenêtres),
+    puis tous les quantiles y sont lus.
+    Identique à Series.rolling(window, min_periods, center).quantile(q, interpolation)
+    pour interpolation "linear" ou "midpoint" (la médiane pandas = q=0.5 "midpoint").
+    - values : 1D, ou 2D (n, colonnes) traité colonne par colonne
+    - groups : codes de groupe (ex. station) ; values doit être trié par groupe,
+      une fenêtre ne mélange jamais deux groupes
+    Renvoie (len(qs), n) ou (len(qs), n, colonnes).
+    """
+    values = np.asarray(values, dtype=float)
+    qs = list(qs)
+    min_periods = window if min_periods is None else min_periods
+    groups = None if groups is None else np.asarray(groups, dtype=np.int64)
+    if values.ndim == 1:
+        return _rolling_quantiles_1d(values, window, qs, min_periods, center, groups, interpolation)
+    return np.stack([_rolling_quantiles_1d(values[:, c], window, qs, min_periods, center, groups, interpolation)
+                     for c in range(values.shape[1])], axis=-1)
+
+
+class RollingQuantiles:
+    """
+    Version en flux de rolling_quantiles (fenêtre arrière, center=False) :
+    fenêtre triée maintenue par bisect, O(window) par échantillon au pire
+    (décalage mémoire), O(log window) de comparaisons.
+    update(x) renvoie la liste des quantiles de la fenêtre courante.
+    """
+
+    def __init__(self, window: int, qs, min_periods: int = None, interpolation: str = "linear"):
+        self.window = window
+        self.qs = list(qs)
+        self.min_periods = window if min_periods is None else min_periods
+        self.interpolation = interpolation
+        self._values = deque()
+        self._sorted = []
+
+    def update(self, value: float) -> list:
+        value = float(value)
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            if old == old:
+                del self._sorted[bisect_left(self._sorted, old)]
+        self._values.append(value)
+        if value == value:
+            insort(self._sorted, value)
+        return self.value
+
+    @property
+    def value(self) -> list:
+        nobs = len(self._sorted)
+        if nobs < self.min_periods or nobs == 0:
+            return [math.nan] * len(self.qs)
+        result = []
+        for q in self.qs:
+            pos = q * (nobs - 1)
+            idx = int(pos)
+            if pos == idx:
+                result.append(self._sorted[idx])
+                continue
+            low, high = self._sorted[idx], self._sorted[idx + 1]
+            result.append((low + high) / 2 if self.interpolation == "midpoint" else low + (high - low) * (pos - idx))
+        return result
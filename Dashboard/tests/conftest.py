@@ -0,0 +1,43 @@
+# Les modules du dashboard sont à plat dans Dashboard/ (comme pour streamlit run app.py)
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def eruption_data(tmp_path, monkeypatch):
+    """
+    data/ temporaire (DATA_DIR est relatif) : CSV synthétiques des deux premières
+    éruptions, 3 stations à la minute sur [-90 h, +30 h], quelques minutes absentes.
+    Renvoie les noms des éruptions.
+    """
+    import data_loader
+    from constants import eruptions
+
+    names = list(eruptions)[:2]
+    (tmp_path / "data").mkdir()
+    rng = np.random.default_rng(0)
+    for name in names:
+        t = eruptions[name]["time"]
+        times = pd.date_range(t - pd.Timedelta(hours=90), t + pd.Timedelta(hours=30), freq="1min")
+        df = pd.concat([pd.DataFrame({
+            "station": station,
+            "time_min": times,
+            "amplitude_mean": rng.normal(0, 100 * (k + 1), len(times)),
+            "amplitude_std": np.abs(rng.normal(200, 50, len(times))),
+            "channel": "HHZ",
+        }) for k, station in enumerate(["BON", "DSO", "FOR"])], ignore_index=True)
+        df = df[rng.random(len(df)) > 0.05]
+        df.to_csv(tmp_path / "data" / eruptions[name]["file"], index=False)
+
+    monkeypatch.chdir(tmp_path)
+    data_loader.clear_frame_cache()
+    data_loader._cube_cache.clear()
+    yield names
+    data_loader.clear_frame_cache()
+    data_loader._cube_cache.clear()
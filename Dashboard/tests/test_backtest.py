@@ -0,0 +1,41 @@
+# ============================================
+# backtest.py : le rejeu incrémental donne les risques de run_model
+# ============================================
+
+import numpy as np
+import pandas as pd
+
+from backtest import lead_time_metrics, replay
+from prediction import WINDOW_ROWS, run_model
+
+
+def test_replay_matches_run_model_minute_by_minute():
+    # 2 stations par minute (ex aequo sur time_min), trous de RSAM, au-delà de WINDOW_ROWS lignes
+    minutes = WINDOW_ROWS // 2 + 60
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "time_min": np.repeat(pd.date_range("2024-01-01", periods=minutes, freq="min", tz="UTC"), 2),
+        "station": np.tile(["A", "B"], minutes),
+        "RSAM": np.abs(rng.normal(600, 400, 2 * minutes)),
+    })
+    df.loc[df.index[::41], "RSAM"] = np.nan
+
+    naive_rng = np.random.default_rng(5)
+    naive = [run_model(df[df["time_min"] <= m], naive_rng) for m in df["time_min"].unique()]
+    series = replay(df, np.random.default_rng(5))
+
+    assert len(series) == minutes
+    np.testing.assert_array_equal(series["risk"].to_numpy(), np.asarray(naive, dtype=float))
+
+
+def test_lead_time_metrics():
+    eruption = pd.Timestamp("2024-01-03", tz="UTC")
+    times = pd.date_range(eruption - pd.Timedelta(hours=72), eruption, freq="min", inclusive="left")
+    risk = np.zeros(len(times))
+    risk[100:150] = 90       # fausse alerte, 60 h avant
+    risk[-600:-580] = 90     # trop courte pour une alerte
+    risk[-300:] = 90         # alerte 5 h avant
+    metrics = lead_time_metrics(pd.DataFrame({"time_min": times, "risk": risk}), eruption)
+    assert metrics["alarm_onset"] == eruption - pd.Timedelta(hours=5)
+    assert metrics["lead_time_h"] == 5
+    assert metrics["false_alarms"] == 1
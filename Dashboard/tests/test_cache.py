@@ -0,0 +1,102 @@
+# ============================================
+# cache.py : LRU borné, compteurs ; cache des DataFrames de data_loader
+# ============================================
+
+import numpy as np
+import pytest
+
+import data_loader
+from cache import LRUCache
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = LRUCache(max_entries=3)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # "a" redevient la plus récente
+    cache.put("d", "D")
+
+    assert "b" not in cache and all(k in cache for k in "acd")
+    assert cache.get("b") is None and cache.get("b", "absent") == "absent"
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "evictions": 1,
+                             "entries": 3, "bytes": 0, "max_bytes": None, "max_entries": 3}
+
+
+def test_byte_budget_uses_sizeof():
+    cache = LRUCache(max_bytes=100, sizeof=len)
+    cache.put("a", b"x" * 40)
+    cache.put("b", b"x" * 40)
+    cache.put("c", b"x" * 30)  # 110 > 100 : "a" évincée
+    assert list(cache._entries) == ["b", "c"] and cache.stats()["bytes"] == 70
+
+    cache.put("b", b"x" * 10)  # remplacement : l'ancienne taille est rendue
+    assert cache.stats()["bytes"] == 40 and cache.evictions == 1
+
+    cache.put("big", b"x" * 101)  # plus gros que le budget : jamais stocké, rien d'évincé
+    assert "big" not in cache and len(cache) == 2 and cache.evictions == 1
+
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_bytes_and_entries_together():
+    cache = LRUCache(max_bytes=100, sizeof=len, max_entries=2)
+    cache.put("a", "x")
+    cache.put("b", "x")
+    cache.put("c", "x")  # 3 octets seulement, mais 3 entrées > 2
+    assert list(cache._entries) == ["b", "c"]
+    cache.put("d", "x" * 99)  # 101 octets : "b" sort, c + d = 100 octets
+    assert list(cache._entries) == ["c", "d"] and cache.evictions == 2
+    cache.put("e", "xx")  # budget dépassé : "c" puis "d" sortent
+    assert list(cache._entries) == ["e"] and cache.evictions == 4
+
+    with pytest.raises(ValueError):
+        LRUCache(max_bytes=16)  # un budget en octets sans sizeof
+    with pytest.raises(ValueError):
+        LRUCache()
+
+
+def test_frame_cache_counts_hits_and_misses(eruption_data):
+    name = eruption_data[0]
+    before = data_loader.frame_cache_stats()  # compteurs cumulés : clear() ne les remet pas à zéro
+    data_loader.load_eruption_file(name)
+    data_loader.load_eruption_file(name)
+    data_loader.load_eruption_file(name, smooth_window=3)  # autres paramètres : autre entrée
+
+    stats = data_loader.frame_cache_stats()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["bytes"] == sum(data_loader._frame_bytes(df) for df, _ in data_loader._frame_cache._entries.values())
+
+
+def test_frame_cache_evicts_over_budget(eruption_data, monkeypatch):
+    first = data_loader.load_eruption_file(eruption_data[0])
+    budget = data_loader._frame_bytes(first) * 3 // 2  # place pour une seule éruption
+    monkeypatch.setattr(data_loader._frame_cache, "max_bytes", budget)
+
+    data_loader.clear_frame_cache()
+    evictions = data_loader.frame_cache_stats()["evictions"]
+    data_loader.load_eruption_file(eruption_data[0])
+    data_loader.load_eruption_file(eruption_data[1])
+    stats = data_loader.frame_cache_stats()
+    assert stats["entries"] == 1 and stats["evictions"] == evictions + 1 and stats["bytes"] <= budget
+
+
+def test_cached_frame_cannot_be_corrupted(eruption_data):
+    name = eruption_data[0]
+    view = data_loader.load_eruption_file(name)
+    reference = view.copy(deep=True)
+
+    # Les tableaux partagés avec le cache sont en lecture seule
+    with pytest.raises(ValueError):
+        view["amplitude_mean"].to_numpy()[0] = -1.0
+
+    # Modifier la vue (valeurs, colonnes) ne touche pas l'entrée du cache
+    view.loc[view.index[:10], "amplitude_mean"] = -1.0
+    view["RSAM"] = 0.0
+    view.drop(columns=["amplitude_std"], inplace=True)
+
+    hits = data_loader.frame_cache_stats()["hits"]
+    again = data_loader.load_eruption_file(name)
+    assert data_loader.frame_cache_stats()["hits"] == hits + 1
+    np.testing.assert_array_equal(again.columns, reference.columns)
+    assert again.equals(reference)
@@ -0,0 +1,88 @@
+# ============================================
+# cnn_transformer.py : passe avant NumPy identique au CNNTransformer torch
+# ============================================
+
+import numpy as np
+import pytest
+
+from cnn_transformer import NumpyCNNTransformer, export_weights, torch_model
+
+
+def _random_state(feature_dim=6, d_model=16, ff=32, num_layers=2, num_classes=5, seed=0):
+    """state_dict aléatoire aux noms et formes du modèle torch."""
+    rng = np.random.default_rng(seed)
+    shapes = {"conv.0.weight": (d_model, feature_dim, 3), "conv.0.bias": (d_model,),
+              "conv.2.weight": (d_model, d_model, 3), "conv.2.bias": (d_model,),
+              "cls_head.0.weight": (d_model,), "cls_head.0.bias": (d_model,),
+              "cls_head.1.weight": (num_classes, d_model), "cls_head.1.bias": (num_classes,)}
+    for i in range(num_layers):
+        p = f"transformer.layers.{i}."
+        shapes.update({p + "self_attn.in_proj_weight": (3 * d_model, d_model),
+                       p + "self_attn.in_proj_bias": (3 * d_model,),
+                       p + "self_attn.out_proj.weight": (d_model, d_model), p + "self_attn.out_proj.bias": (d_model,),
+                       p + "linear1.weight": (ff, d_model), p + "linear1.bias": (ff,),
+                       p + "linear2.weight": (d_model, ff), p + "linear2.bias": (d_model,),
+                       p + "norm1.weight": (d_model,), p + "norm1.bias": (d_model,),
+                       p + "norm2.weight": (d_model,), p + "norm2.bias": (d_model,)})
+    return {name: rng.normal(0, 1 / np.sqrt(shape[-1]), shape) for name, shape in shapes.items()}
+
+
+def _reference_logits(state, x, nhead, num_layers):
+    """Passe avant directe (toute la séquence à chaque couche), poids au format torch."""
+    def layer_norm(v, w, b):
+        return (v - v.mean(-1, keepdims=True)) / np.sqrt(v.var(-1, keepdims=True) + 1e-5) * w + b
+
+    for i in (0, 2):
+        w, b = state[f"conv.{i}.weight"], state[f"conv.{i}.bias"]
+        padded = np.pad(x, ((0, 0), (1, 1), (0, 0)))
+        x = np.maximum(sum(padded[:, k:k + x.shape[1]] @ w[:, :, k].T for k in range(3)) + b, 0)
+
+    e = x.shape[-1]
+    hd = e // nhead
+    for i in range(num_layers):
+        p = f"transformer.layers.{i}."
+        q, k, v = np.split(x @ state[p + "self_attn.in_proj_weight"].T + state[p + "self_attn.in_proj_bias"], 3, -1)
+        heads = []
+        for h in range(nhead):
+            cut = slice(h * hd, (h + 1) * hd)
+            scores = q[..., cut] @ k[..., cut].transpose(0, 2, 1) / np.sqrt(hd)
+            weights = np.exp(scores - scores.max(-1, keepdims=True))
+            heads.append(weights / weights.sum(-1, keepdims=True) @ v[..., cut])
+        attn = np.concatenate(heads, -1) @ state[p + "self_attn.out_proj.weight"].T + state[p + "self_attn.out_proj.bias"]
+        x = layer_norm(x + attn, state[p + "norm1.weight"], state[p + "norm1.bias"])
+        hidden = np.maximum(x @ state[p + "linear1.weight"].T + state[p + "linear1.bias"], 0)
+        ff = hidden @ state[p + "linear2.weight"].T + state[p + "linear2.bias"]
+        x = layer_norm(x + ff, state[p + "norm2.weight"], state[p + "norm2.bias"])
+
+    last = layer_norm(x[:, -1], state["cls_head.0.weight"], state["cls_head.0.bias"])
+    return last @ state["cls_head.1.weight"].T + state["cls_head.1.bias"]
+
+
+def test_forward_matches_reference(tmp_path):
+    state = _random_state()
+    x = np.random.default_rng(1).normal(size=(7, 24, 6))
+    expected = _reference_logits(state, x, nhead=4, num_layers=2)
+
+    exact = NumpyCNNTransformer(state, nhead=4, num_layers=2, dtype=np.float64)
+    np.testing.assert_allclose(exact.predict_logits(x, batch_size=3), expected, rtol=1e-10, atol=1e-12)
+
+    path = tmp_path / "model.npz"
+    export_weights(state, path, nhead=4)
+    model = NumpyCNNTransformer.from_npz(path)
+    assert (model.feature_dim, model.num_classes, model.nhead, len(model.layers)) == (6, 5, 4, 2)
+    np.testing.assert_allclose(model.predict_logits(x.astype(np.float32)), expected, atol=1e-4)
+    np.testing.assert_allclose(model.predict_proba(x.astype(np.float32)).sum(axis=1), 1, rtol=1e-6)
+
+
+def test_forward_matches_torch(tmp_path):
+    torch = pytest.importorskip("torch")
+    torch.manual_seed(0)
+    reference = torch_model(9, 5).eval()
+    path = tmp_path / "model.npz"
+    export_weights(reference.state_dict(), path)
+    model = NumpyCNNTransformer.from_npz(path)
+
+    x = np.random.default_rng(0).normal(size=(4, 64, 9)).astype(np.float32)
+    with torch.inference_mode():
+        expected = reference(torch.from_numpy(x)).numpy()
+    np.testing.assert_allclose(model.predict_logits(x), expected, atol=1e-5)
@@ -0,0 +1,205 @@
+# ============================================
+# data_loader.py : caches et cube aligné
+# ============================================
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from constants import DATA_DIR, eruptions
+from data_loader import (_cache_dir, _fingerprint, _is_fresh, _read_meta, aligned_slice, clean_outliers,
+                         load_aligned_cube, load_eruption_file, load_range, load_window, read_eruption_csv)
+
+
+def _resampled(name: str) -> pd.DataFrame:
+    """Ancien graphing.load_aligned_data : filtrage [-80 h, +24 h] puis resample 10 min."""
+    df = load_eruption_file(name)
+    hours = (df["time_min"] - eruptions[name]["time"]).dt.total_seconds() / 3600
+    df = df[(hours >= -80) & (hours <= 24)]
+    return df.set_index("time_min").resample("10min").mean(numeric_only=True).reset_index()
+
+
+def test_aligned_slice_matches_resample(eruption_data):
+    cube = load_aligned_cube()
+    assert cube["eruptions"] == eruption_data
+    out = aligned_slice(eruption_data)
+    for name in eruption_data:
+        got = out[out["eruption"] == name].reset_index(drop=True)
+        expected = _resampled(name)
+        assert len(got) > 600 and list(got["time_min"]) == list(expected["time_min"])
+        for col in cube["features"]:
+            np.testing.assert_allclose(got[col].to_numpy(), expected[col].to_numpy(), rtol=1e-12, err_msg=col)
+
+
+def test_station_subset_is_a_pooled_mean(eruption_data):
+    name = eruption_data[0]
+    got = aligned_slice([name], stations=["DSO", "FOR"], features=["amplitude_mean"])
+    df = load_eruption_file(name)
+    df = df[df["station"].isin(["DSO", "FOR"])]
+    hours = (df["time_min"] - eruptions[name]["time"]).dt.total_seconds() / 3600
+    df = df[(hours >= -80) & (hours <= 24)]
+    expected = df.set_index("time_min")["amplitude_mean"].resample("10min").mean()
+    np.testing.assert_allclose(got["amplitude_mean"].to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+
+# --------------------------------------------
+# Cache colonnaire du CSV brut
+# --------------------------------------------
+
+def _parsed_csv(path) -> pd.DataFrame:
+    """Lecture directe du CSV, dans l'ordre (station, temps) du cache."""
+    df = pd.read_csv(path)
+    df["time_min"] = pd.to_datetime(df["time_min"], utc=True)
+    return df.sort_values(["station", "time_min"], kind="stable").reset_index(drop=True)
+
+
+def test_columnar_cache_matches_csv(eruption_data):
+    path = DATA_DIR / eruptions[eruption_data[0]]["file"]
+    first = read_eruption_csv(path)
+    meta = _read_meta(_cache_dir(path))
+    assert _is_fresh(meta, _fingerprint(path))
+    assert [p["station"] for p in meta["partitions"]] == ["BON", "DSO", "FOR"]
+
+    cached = read_eruption_csv(path)  # relu depuis le cache, sans parsing
+    pd.testing.assert_frame_equal(cached, _parsed_csv(path))
+    pd.testing.assert_frame_equal(cached, first)
+
+
+def test_columnar_cache_invalidated_by_mtime_and_size(eruption_data):
+    path = DATA_DIR / eruptions[eruption_data[0]]["file"]
+    read_eruption_csv(path)
+    cache_dir = _cache_dir(path)
+
+    # Même contenu, mtime différent : reconstruit avec la nouvelle empreinte
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not _is_fresh(_read_meta(cache_dir), _fingerprint(path))
+    pd.testing.assert_frame_equal(read_eruption_csv(path), _parsed_csv(path))
+    assert _read_meta(cache_dir)["fingerprint"] == _fingerprint(path)
+
+    # Lignes ajoutées (taille différente, mtime forcé à l'identique) : reconstruit aussi
+    stat = path.stat()
+    df = pd.read_csv(path)
+    pd.concat([df, df.tail(10).assign(station="NEW")]).to_csv(path, index=False)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not _is_fresh(_read_meta(cache_dir), _fingerprint(path))
+    rebuilt = read_eruption_csv(path)
+    assert (rebuilt["station"] == "NEW").sum() == 10
+    pd.testing.assert_frame_equal(rebuilt, _parsed_csv(path))
+    assert [p["station"] for p in _read_meta(cache_dir)["partitions"]] == ["BON", "DSO", "FOR", "NEW"]
+    assert not list(cache_dir.parent.glob("*.tmp-*"))
+
+
+# --------------------------------------------
+# Nettoyage des outliers
+# --------------------------------------------
+
+def _pandas_clean(df: pd.DataFrame, iqr_factor=3.0, replace_quantile=0.995, smooth_window=5) -> pd.DataFrame:
+    """Ancien clean_outliers (quantiles pandas colonne par colonne), appliqué à un bloc."""
+    df = df.copy()
+    for col in [c for c in ("amplitude_mean", "RSAM", "SE_env") if c in df.columns]:
+        data = df[col].dropna()
+        if len(data) == 0:
+            continue
+        df[col] = df[col].clip(lower=0)
+        q1, q3 = data.quantile(0.25), data.quantile(0.75)
+        df.loc[df[col] > q3 + iqr_factor * (q3 - q1), col] = data.quantile(replace_quantile)
+        df[col] = df[col].rolling(window=smooth_window, center=True, min_periods=1).median()
+    return df.dropna(subset=["time_min", "amplitude_mean"], how="any")
+
+
+def _spiky_frame(seed: int = 0) -> pd.DataFrame:
+    """Plusieurs stations mélangées, pics, valeurs négatives, NaN, une station de 3 lignes."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for station, n in [("AAA", 500), ("BBB", 301), ("CCC", 3), ("DDD", 64)]:
+        times = pd.date_range("2024-01-01", periods=n, freq="1min", tz="UTC")
+        amp = rng.gamma(2.0, 50.0 * (len(frames) + 1), n)
+        amp[rng.choice(n, max(1, n // 50), replace=False)] *= 40  # pics
+        amp[rng.random(n) < 0.03] = np.nan
+        rsam = rng.normal(100, 80, n)  # quelques négatifs
+        frames.append(pd.DataFrame({"station": station, "time_min": times, "amplitude_mean": amp,
+                                    "RSAM": rsam, "SE_env": np.nan if station == "DDD" else rng.random(n)}))
+    df = pd.concat(frames, ignore_index=True)
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+
+def test_clean_outliers_matches_pandas_per_station():
+    df = _spiky_frame()
+    for params in ({}, {"iqr_factor": 1.5, "replace_quantile": 0.9, "smooth_window": 4}):
+        got = clean_outliers(df, **params)
+        expected = pd.concat([_pandas_clean(g.sort_values("time_min"), **params)
+                              for _, g in df.groupby("station")]).loc[got.index]
+        assert got.index.is_monotonic_increasing  # ordre d'origine conservé
+        pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-12)
+
+
+def test_clean_outliers_single_station_is_the_global_path():
+    df = _spiky_frame(1)
+    df = df[df["station"] == "AAA"].sort_values("time_min")
+    got = clean_outliers(df)
+    assert (got[["amplitude_mean", "RSAM"]] >= 0).all().all()
+    assert got["amplitude_mean"].max() < df["amplitude_mean"].max()  # pics remplacés
+    pd.testing.assert_frame_equal(got, _pandas_clean(df), check_exact=False, rtol=1e-12)
+
+
+# --------------------------------------------
+# Lecture ciblée (lignes et colonnes) du cache nettoyé
+# --------------------------------------------
+
+def _cleaned_slice(name, start=None, end=None, stations=None, columns=None) -> pd.DataFrame:
+    """Référence : CSV entier relu et nettoyé, puis filtré en mémoire."""
+    df = clean_outliers(read_eruption_csv(DATA_DIR / eruptions[name]["file"]))
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["time_min"] >= start
+    if end is not None:
+        mask &= df["time_min"] <= end
+    if stations is not None:
+        mask &= df["station"].isin(stations)
+    df = df[mask]
+    return (df if columns is None else df[columns]).reset_index(drop=True)
+
+
+def test_load_range_matches_filtered_frame(eruption_data):
+    name = eruption_data[0]
+    times = load_eruption_file(name)["time_min"]
+    # Bornes exactement sur des lignes existantes (incluses), puis entre deux minutes
+    start, end = times.iloc[1000], times.iloc[3000]
+    cases = [
+        {},
+        {"start": start, "end": end},
+        {"start": start + pd.Timedelta(seconds=30), "end": end - pd.Timedelta(seconds=30)},
+        {"start": start, "end": start},  # une minute : une ligne par station présente
+        {"end": times.min()},
+        {"start": start, "stations": ["DSO", "FOR"], "columns": ["time_min", "amplitude_mean"]},
+        {"end": end, "stations": ["BON"], "columns": ["amplitude_std", "station"]},
+    ]
+    for kwargs in cases:
+        got = load_range(name, **kwargs)
+        pd.testing.assert_frame_equal(got, _cleaned_slice(name, **kwargs), obj=str(kwargs))
+    assert len(load_range(name, start=start, end=start)) >= 1
+
+
+def test_load_range_empty_selection(eruption_data):
+    name = eruption_data[0]
+    times = load_eruption_file(name)["time_min"]
+    columns = ["time_min", "station", "amplitude_mean"]
+    for kwargs in ({"end": times.min() - pd.Timedelta(minutes=1)},
+                   {"start": times.max() + pd.Timedelta(minutes=1)},
+                   {"start": times.iloc[2000], "end": times.iloc[1000]},
+                   {"stations": ["XXX"]}):
+        got = load_range(name, columns=columns, **kwargs)
+        assert got.empty and list(got.columns) == columns
+        assert isinstance(got["time_min"].dtype, pd.DatetimeTZDtype)
+
+
+def test_load_window_is_the_eruption_range(eruption_data):
+    name = eruption_data[1]
+    erupt = eruptions[name]["time"]
+    got = load_window(name, hours_before=6, hours_after=2, stations=["FOR"], columns=["time_min", "amplitude_mean"])
+    expected = _cleaned_slice(name, erupt - pd.Timedelta(hours=6), erupt + pd.Timedelta(hours=2), ["FOR"],
+                              ["time_min", "amplitude_mean"])
+    assert len(got) > 400
+    pd.testing.assert_frame_equal(got, expected)
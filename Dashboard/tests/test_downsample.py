@@ -0,0 +1,102 @@
+# ============================================
+# downsample.py : pyramide min/max et LTTB
+# ============================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import TracePyramid, downsample_frame, downsample_xy, lttb_indices, minmax_indices
+
+
+def _minmax_loop(x, y, step):
+    keep = set()
+    buckets = np.floor((x - x[0]) / step)
+    for b in np.unique(buckets):
+        rows = np.flatnonzero(buckets == b)
+        values = y[rows]
+        if np.isnan(values).all():
+            keep.add(rows[0])
+            continue
+        keep.add(rows[np.nanargmin(values)])
+        keep.add(rows[np.nanargmax(values)])
+    return np.array(sorted(keep))
+
+
+def _lttb_loop(x, y, n_out):
+    valid = np.flatnonzero(~np.isnan(y))
+    xs, ys = x[valid], y[valid]
+    edges = np.linspace(1, len(xs) - 1, n_out - 1).astype(np.intp)
+    keep, prev = [0], 0
+    for k in range(n_out - 2):
+        a, b = edges[k], edges[k + 1]
+        if k + 2 < len(edges):
+            nx, ny = xs[b:edges[k + 2]].mean(), ys[b:edges[k + 2]].mean()
+        else:
+            nx, ny = xs[-1], ys[-1]
+        best, best_area = a, -1.0
+        for i in range(a, b):
+            area = abs((xs[prev] - nx) * (ys[i] - ys[prev]) - (xs[prev] - xs[i]) * (ny - ys[prev]))
+            if area > best_area:
+                best, best_area = i, area
+        keep.append(best)
+        prev = best
+    keep.append(len(xs) - 1)
+    return valid[keep]
+
+
+@pytest.fixture
+def trace():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 5000))
+    y = np.abs(rng.standard_cauchy(len(x))) * 100
+    y[1000:1100] = np.nan  # trou plus large qu'un pas
+    return x, y
+
+
+@pytest.mark.parametrize("step", [10.0, 60.0])
+def test_minmax_keeps_extremes_of_every_step(trace, step):
+    x, y = trace
+    np.testing.assert_array_equal(minmax_indices(x, y, step), _minmax_loop(x, y, step))
+
+
+@pytest.mark.parametrize("n_out", [3, 50, 700])
+def test_lttb_matches_reference_loop(trace, n_out):
+    x, y = trace
+    idx = lttb_indices(x, y, n_out)
+    assert len(idx) == n_out
+    np.testing.assert_array_equal(idx, _lttb_loop(x, y, n_out))
+
+
+def test_pyramid_uses_finest_level_within_budget():
+    times = pd.Series(pd.date_range("2024-01-01", periods=3 * 1440, freq="min", tz="UTC"))
+    y = np.abs(np.random.default_rng(1).standard_cauchy(len(times)))
+    p = TracePyramid(times, y)
+    assert [step for step, _ in p.levels] == [None, "10min", "1h"]
+    assert len(p.indices(width_px=5000)) == len(times)
+    assert len(p.indices(width_px=1000)) == len(p.levels[1][1])  # 10 min : 432 pas × 2 ≤ 1000
+    assert len(p.indices(width_px=500)) == len(p.levels[2][1])   # 1 h : 72 pas × 2
+    assert len(p.indices(width_px=50)) == 50                     # LTTB au-delà du niveau 1 h
+
+    # Zoom : la plage visible seulement, au niveau le plus fin qui tient
+    start, end = times.iloc[1440], times.iloc[1440 + 600]
+    idx = p.indices(width_px=1000, x_range=(start, end))
+    assert len(idx) == 601 and times.iloc[idx[0]] == start
+
+
+def test_peaks_are_kept(trace):
+    x, y = trace
+    hours = pd.Series(x / 60)
+    xs, ys = downsample_xy(hours, pd.Series(y), width_px=300, x_unit="1h")
+    assert len(ys) < len(y) / 5
+    assert ys.max() == np.nanmax(y) and ys.min() == np.nanmin(y)
+    assert ys.isna().any()  # le trou reste visible
+
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"time_min": np.tile(pd.date_range("2024-01-01", periods=1440, freq="min"), 3),
+                       "station": np.repeat(["A", "B", "C"], 1440),
+                       "RSAM": rng.normal(300, 80, 3 * 1440)})
+    reduced = downsample_frame(df, "time_min", "RSAM", by="station", width_px=200)
+    assert len(reduced) < len(df) / 3
+    pd.testing.assert_series_equal(reduced.groupby("station")["RSAM"].max(), df.groupby("station")["RSAM"].max())
+    pd.testing.assert_series_equal(reduced.groupby("station")["RSAM"].min(), df.groupby("station")["RSAM"].min())
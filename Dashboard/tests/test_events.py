@@ -0,0 +1,67 @@
+# ============================================
+# events.py : détection STA/LTA et catalogue persistant
+# ============================================
+
+import numpy as np
+import pandas as pd
+
+import events
+from constants import DATA_DIR, eruptions
+
+# Seuils bas : le bruit gaussien des données synthétiques déclenche quelques événements
+LOW_PARAMS = {"on": 1.8, "off": 1.2, "min_stations": 2}
+
+
+def test_detect_events_finds_network_burst():
+    times = pd.date_range("2024-01-01", periods=400, freq="1min", tz="UTC")
+    rng = np.random.default_rng(1)
+    frames = []
+    for station in ["AAA", "BBB", "CCC", "DDD"]:
+        amp = 1 + 0.01 * rng.standard_normal(len(times))
+        if station != "DDD":
+            amp[300:310] = 20  # salve sur trois stations sur quatre
+        frames.append(pd.DataFrame({"time_min": times, "station": station, "amplitude_mean": amp}))
+    found = events.detect_events(pd.concat(frames, ignore_index=True), sta_min=5, lta_min=120,
+                                 on=3.0, off=1.5, min_stations=3)
+
+    assert sorted(found["station"]) == ["AAA", "BBB", "CCC"]
+    assert (found["event"] == 0).all() and (found["n_stations"] == 3).all()
+    assert (found["time_min"] == times[300]).all() and (found["event_time"] == times[300]).all()
+
+
+def test_hourly_counts_match_catalog(eruption_data):
+    events._catalog_meta.clear()
+    name = eruption_data[0]
+    catalog = events.build_catalog(eruption_data, LOW_PARAMS)
+    assert catalog["event_id"].nunique() > 1
+
+    erupt_time = eruptions[name]["time"]
+    start, end = erupt_time - pd.Timedelta(hours=72), erupt_time + pd.Timedelta(hours=12)
+    for stations in (None, ["BON", "FOR"]):
+        counts = events.hourly_event_counts(name, stations, params=LOW_PARAMS)
+
+        # Référence : catalogue complet filtré en mémoire, premier déclenchement de chaque événement
+        sel = catalog[(catalog["eruption"] == name) & catalog["time_min"].between(start, end)]
+        if stations is not None:
+            sel = sel[sel["station"].isin(stations)]
+        first = sel.groupby("event_id")["time_min"].min().dt.floor("1h").value_counts()
+        expected = first.reindex(counts["time_min"], fill_value=0).to_numpy()
+
+        np.testing.assert_array_equal(counts["events"].to_numpy(), expected)
+        assert 0 < counts["events"].sum() == sel["event_id"].nunique()
+    events._catalog_meta.clear()
+
+
+def test_hourly_counts_without_any_event(eruption_data):
+    # Une seule station : aucune coïncidence réseau possible, catalogue vide
+    for name in eruption_data:
+        path = DATA_DIR / eruptions[name]["file"]
+        df = pd.read_csv(path)
+        df[df["station"] == "BON"].to_csv(path, index=False)
+    events._catalog_meta.clear()
+
+    catalog = events.query_events()
+    assert catalog.empty and isinstance(catalog["time_min"].dtype, pd.DatetimeTZDtype)
+    counts = events.hourly_event_counts(eruption_data[0])
+    assert len(counts) == 72 + 12 + 1 and (counts["events"] == 0).all()
+    events._catalog_meta.clear()
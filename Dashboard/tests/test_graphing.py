@@ -0,0 +1,78 @@
+# ============================================
+# graphing.py : figures construites hors Streamlit
+# ============================================
+
+import numpy as np
+import pandas as pd
+
+from constants import eruptions
+
+
+def test_event_count_figure_has_one_bar_per_hour(eruption_data):
+    import graphing
+
+    name = eruption_data[0]
+    fig = graphing.figure_event_count(name)
+    bars = fig.data[0]
+    hours = pd.DatetimeIndex(bars.x)
+    erupt_time = eruptions[name]["time"]
+    assert len(hours) == 72 + 12 + 1
+    assert hours[0] == (erupt_time - pd.Timedelta(hours=72)).floor("1h").tz_convert(None)
+    assert (hours[1:] - hours[:-1] == pd.Timedelta(hours=1)).all()
+    assert (np.asarray(bars.y) >= 0).all()
+
+
+def test_waterfall_grid_matches_groupby(eruption_data):
+    import graphing
+    from data_loader import load_window
+
+    name = eruption_data[1]
+    graphing._waterfall_grids.clear()
+    grid = graphing.waterfall_grid(name)
+    before, after = graphing.WATERFALL_HOURS_BEFORE, graphing.WATERFALL_HOURS_AFTER
+    step = graphing.waterfall_step(before, after)
+    n_bins = int(pd.Timedelta(hours=before + after) / step)
+
+    # Référence pandas : pas entiers depuis le début de la fenêtre, moyenne par (station, pas)
+    df = load_window(name, hours_before=before, hours_after=after,
+                     columns=["time_min", "station", "amplitude_mean"])
+    start = eruptions[name]["time"] - pd.Timedelta(hours=before)
+    df["bin"] = np.minimum((df["time_min"] - start) // step, n_bins - 1)
+    energy = (df["amplitude_mean"] ** 2).groupby(df["station"]).sum().sort_values(ascending=False)
+    expected = (df.groupby(["station", "bin"])["amplitude_mean"].mean().unstack(fill_value=0)
+                .reindex(index=energy.index, columns=range(n_bins), fill_value=0))
+
+    assert grid["step"] == step
+    assert grid["stations"] == list(expected.index)
+    np.testing.assert_allclose(grid["hours"], -before + (np.arange(n_bins) + 0.5) * (step / pd.Timedelta(hours=1)))
+    np.testing.assert_allclose(grid["z"], expected.to_numpy(), rtol=1e-6)
+    assert graphing.waterfall_grid(name) is grid  # deuxième appel servi par le cache
+
+
+def test_parallel_figures_keep_order_and_report_failures():
+    import time
+
+    import graphing
+
+    def builder(i):
+        def build():
+            time.sleep(0.05 * (5 - i))  # les premiers finissent en dernier
+            if i == 2:
+                raise ValueError("colonne manquante")
+            return f"figure {i}"
+        return build
+
+    key = ("ordre", time.perf_counter())
+    charts = [f"chart_{i}" for i in range(5)]
+    results = graphing.figure_results(graphing.compute_figures(key, {c: builder(i) for i, c in enumerate(charts)}))
+
+    assert list(results) == charts
+    for i, chart in enumerate(charts):
+        fig, error = results[chart]
+        if i == 2:
+            assert fig is None and isinstance(error, ValueError)
+        else:
+            assert (fig, error) == (f"figure {i}", None)
+    # Échec non mis en cache : reconstruit au prochain appel, les autres servis par le cache
+    assert ("chart_2", key) not in graphing._figure_cache
+    assert all((c, key) in graphing._figure_cache for c in charts if c != "chart_2")
@@ -0,0 +1,56 @@
+import numpy as np
+
+from prediction import WINDOW_ROWS, risk_cache_stats, run_model_batch
+
+
+def test_cache_hit_replays_risks_and_generator_state():
+    windows = np.abs(np.random.default_rng(0).normal(500, 300, (50, WINDOW_ROWS)))
+    key = ("test", "cache-hit")
+
+    miss_rng, hit_rng = np.random.default_rng(7), np.random.default_rng(7)
+    first = run_model_batch(windows, miss_rng, cache_key=key)
+    hits = risk_cache_stats()["hits"]
+    second = run_model_batch(windows, hit_rng, cache_key=key)
+
+    assert risk_cache_stats()["hits"] == hits + 1
+    np.testing.assert_array_equal(first, second)
+    assert miss_rng.random() == hit_rng.random()
+
+
+def test_other_generator_state_is_not_served_from_cache():
+    windows = np.abs(np.random.default_rng(1).normal(500, 300, (50, WINDOW_ROWS)))
+    key = ("test", "other-state")
+    first = run_model_batch(windows, np.random.default_rng(1), cache_key=key)
+    second = run_model_batch(windows, np.random.default_rng(2), cache_key=key)
+    assert not np.array_equal(first, second)
+
+
+def test_without_key_nothing_is_cached():
+    windows = np.abs(np.random.default_rng(2).normal(500, 300, (5, WINDOW_ROWS)))
+    before = risk_cache_stats()
+    run_model_batch(windows, np.random.default_rng(3))
+    after = risk_cache_stats()
+    assert (after["hits"], after["misses"], after["entries"]) == (before["hits"], before["misses"], before["entries"])
+
+
+def test_batch_stats_match_run_model(monkeypatch):
+    import pandas as pd
+
+    import prediction
+
+    recorded = []
+    monkeypatch.setattr(prediction, "_risk_from_stats", lambda *stats: recorded.append(stats[:5]) or 0.0)
+
+    rng = np.random.default_rng(4)
+    lengths = np.array([12, 95, 150, 180, 181, 700, WINDOW_ROWS])
+    windows = np.full((len(lengths), WINDOW_ROWS), np.nan)
+    for row, n in enumerate(lengths):
+        values = np.abs(rng.normal(500, 300, n))
+        values[::17] = np.nan
+        windows[row, WINDOW_ROWS - n:] = values
+        prediction.run_model(pd.DataFrame({"time_min": np.arange(n), "RSAM": values}))
+
+    expected = np.array(recorded, dtype=float)
+    np.testing.assert_array_equal(expected[:, 0], lengths)
+    for got, want in zip(prediction._batch_stats(windows, lengths), expected[:, 1:].T):
+        np.testing.assert_allclose(got, want, rtol=1e-12)
@@ -0,0 +1,38 @@
+import threading
+
+from prediction_service import MicroBatcher
+
+
+def _submit_all(batcher, items):
+    outcomes = [None] * len(items)
+
+    def worker(i):
+        try:
+            outcomes[i] = batcher.submit(items[i], timeout=5)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes
+
+
+def test_results_follow_requests():
+    batcher = MicroBatcher(lambda items: [2 * x for x in items], max_batch=8, max_wait_ms=20)
+    try:
+        assert _submit_all(batcher, list(range(20))) == [2 * x for x in range(20)]
+    finally:
+        batcher.close()
+
+
+def test_short_result_list_fails_every_request():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch=8, max_wait_ms=50)
+    try:
+        outcomes = _submit_all(batcher, list(range(4)))
+        assert all(isinstance(o, RuntimeError) for o in outcomes)
+        assert batcher.metrics()["errors"] >= 1
+    finally:
+        batcher.close()
@@ -0,0 +1,181 @@
+# ============================================
+# preprocess.py : calculs batchés identiques aux boucles des notebooks
+# ============================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("scipy")
+from scipy import stats as scipy_stats
+from scipy.signal import welch
+
+from preprocess import (WINDOW_FEATURES, compute_spectral_entropy, compute_window_features, sliding_spectral_entropy,
+                        window_features)
+
+
+def _notebook_window(seg: np.ndarray) -> dict:
+    """Corps de la boucle "for i in indices" des notebooks, pour une fenêtre."""
+    p, _ = np.histogram(seg, bins=50, density=True)
+    p = p[p > 0]
+    med = np.median(np.abs(seg))
+    per90, per10 = np.percentile(seg, 90), np.percentile(seg, 10)
+    return {
+        "SE": -np.sum(p * np.log2(p)),
+        "Kurtosis": float(scipy_stats.kurtosis(seg, fisher=True, bias=False)),
+        "FI": np.sum(seg[np.abs(seg) > med] ** 2) / np.sum(seg[np.abs(seg) <= med] ** 2),
+        "std": np.std(seg),
+        "mean": np.mean(seg),
+        "median": np.median(seg),
+        "per90": per90,
+        "per10": per10,
+        "tension": per90 - per10,
+    }
+
+
+def _notebook_loop(signal: np.ndarray, win: int, step: int) -> dict:
+    rows = [_notebook_window(signal[i:i + win]) for i in range(0, len(signal) - win + 1, step)]
+    return {f: np.array([row[f] for row in rows]) for f in WINDOW_FEATURES}
+
+
+@pytest.mark.filterwarnings("ignore:Precision loss")  # SciPy, fenêtres plates
+@pytest.mark.parametrize("win, step", [(10, 10), (10, 3), (60, 60)])
+def test_window_features_match_notebook_loop(win, step):
+    signal = np.abs(np.random.default_rng(win + step).normal(100, 30, 3000))
+    signal[500:520] = 42.0  # fenêtres plates : histogramme sur [x - 0.5, x + 0.5]
+    batch = window_features(signal, win, step)
+    loop = _notebook_loop(signal, win, step)
+    for feature in WINDOW_FEATURES:
+        np.testing.assert_array_equal(batch[feature], loop[feature], err_msg=feature)
+    np.testing.assert_array_equal(batch["end"], np.arange(len(loop["SE"])) * step + win - 1)
+
+
+def test_window_with_nan_gives_nan():
+    signal = np.abs(np.random.default_rng(0).normal(100, 30, 100))
+    signal[25] = np.nan
+    batch = window_features(signal, 10, 10)
+    for feature in WINDOW_FEATURES:
+        assert np.isnan(batch[feature][2])
+        assert not np.isnan(batch[feature][[0, 1, 3]]).any()
+
+
+def test_groups_are_computed_separately_and_sorted_by_time():
+    rng = np.random.default_rng(1)
+    n = 200
+    df = pd.DataFrame({
+        "time_min": np.tile(pd.date_range("2024-01-01", periods=n, freq="min", tz="UTC"), 4),
+        "station": np.repeat(["A", "B"], 2 * n),
+        "channel": np.tile(np.repeat(["HHZ", "HHE"], n), 2),
+        "amplitude_mean": np.abs(rng.normal(100, 30, 4 * n)),
+    }).sample(frac=1, random_state=0)
+
+    out = compute_window_features(df)
+    assert list(out.columns) == ["time_min", "station", "channel", *WINDOW_FEATURES]
+    for (station, channel), g in df.groupby(["station", "channel"]):
+        g = g.sort_values("time_min")
+        got = out[(out["station"] == station) & (out["channel"] == channel)]
+        expected = _notebook_loop(g["amplitude_mean"].to_numpy(), 10, 10)
+        np.testing.assert_array_equal(got["SE"].to_numpy(), expected["SE"])
+        assert list(got["time_min"]) == list(g["time_min"].iloc[9::10])
+
+    pd.testing.assert_frame_equal(compute_window_features(df, workers=2), out)
+
+
+def _entropy_loop(x: np.ndarray, fs: float, window: int, nperseg: int) -> np.ndarray:
+    """Une fenêtre arrière à la fois : un welch et une entropie par ligne."""
+    out = np.full(len(x), np.nan)
+    for i in range(window - 1, len(x)):
+        _, pxx = welch(x[i - window + 1:i + 1], fs=fs, nperseg=min(nperseg, window))
+        p = pxx / (np.sum(pxx) + 1e-12)
+        out[i] = -np.sum(p * np.log2(p + 1e-12))
+    return out
+
+
+@pytest.mark.parametrize("window,nperseg,chunk", [(256, 64, 4096), (64, 64, 37), (40, 64, 1), (256, 64, 300)])
+def test_sliding_entropy_matches_window_loop(window, nperseg, chunk):
+    x = np.abs(np.random.default_rng(window).normal(100, 30, 700)).cumsum() % 500
+    got = sliding_spectral_entropy(x, 1 / 60, window, nperseg, chunk)
+    np.testing.assert_allclose(got, _entropy_loop(x, 1 / 60, window, nperseg), rtol=1e-10)
+    assert np.isnan(got[:window - 1]).all() and not np.isnan(got[window - 1:]).any()
+
+
+def test_spectral_entropy_per_station():
+    rng = np.random.default_rng(5)
+    frames = []
+    for station, n in [("AAA", 400), ("BBB", 90), ("CCC", 150)]:
+        amp = np.abs(rng.normal(100, 40, n))
+        amp[rng.random(n) < 0.05] = np.nan
+        frames.append(pd.DataFrame({"station": station, "amplitude_mean": amp,
+                                    "time_min": pd.date_range("2024-01-01", periods=n, freq="1min")}))
+    df = pd.concat(frames, ignore_index=True)
+    df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+    got = compute_spectral_entropy(df.copy(), window=100, nperseg=32)
+    for station, g in df.groupby("station"):
+        g = g.sort_values("time_min")
+        expected = _entropy_loop(g["amplitude_mean"].ffill().to_numpy(), 1 / 60, 100, 32)
+        np.testing.assert_allclose(got.loc[g.index, "SE"].to_numpy(), expected, rtol=1e-10, err_msg=station)
+
+
+def test_incremental_features_match_batch():
+    from preprocess import INCREMENTAL_FEATURES, append_features, compute_frequency_index, compute_kurtosis, \
+        compute_rsam, smooth_envelopes
+
+    rng = np.random.default_rng(2)
+    n, stations = 300, ["A", "B", "C"]
+    df = pd.DataFrame({
+        "time_min": np.repeat(pd.date_range("2024-01-01", periods=n, freq="min", tz="UTC"), len(stations)),
+        "station": np.tile(stations, n),
+        "amplitude_mean": np.abs(rng.normal(100, 30, n * len(stations))),
+        "SE": rng.uniform(0, 5, n * len(stations)),
+    })
+    df.loc[df.index[::53], "amplitude_mean"] = np.nan
+
+    parts = []
+    for _, g in df.groupby("station", sort=False):
+        g = g.copy()
+        for fn in (compute_rsam, compute_frequency_index, compute_kurtosis, smooth_envelopes):
+            g = fn(g)
+        parts.append(g)
+    batch = pd.concat(parts).sort_index()
+
+    # Ajouts de tailles variables, y compris une ligne à la fois
+    states, data, start = {}, df.iloc[:0], 0
+    for size in [1, 7, 100, 1, 1, 250, 540]:
+        data = append_features(data, df.iloc[start:start + size], states)
+        start += size
+    assert start == len(df)
+
+    for col in INCREMENTAL_FEATURES:
+        np.testing.assert_array_equal(data[col].to_numpy(), batch[col].to_numpy(), err_msg=col)
+
+
+@pytest.mark.parametrize("stride", [1, 3])
+def test_sequences_match_slices_and_share_memory(stride):
+    from preprocess import make_sequences, sequence_ends
+
+    X = np.random.default_rng(3).normal(size=(200, 4))
+    seqs = make_sequences(X, seq_len=30, stride=stride)
+    ends = sequence_ends(len(X), 30, stride)
+    expected = np.stack([X[end - 29:end + 1] for end in ends])
+    np.testing.assert_array_equal(np.asarray(seqs), expected)
+    assert np.shares_memory(seqs, X)
+
+
+@pytest.mark.parametrize("n_rows, stride", [(200, 1), (200, 7), (12, 1), (12, 5)])
+def test_padded_sequences_match_make_sequence(n_rows, stride, tmp_path):
+    from preprocess import make_sequence, make_sequences, sequence_ends
+
+    df = pd.DataFrame(np.random.default_rng(4).normal(size=(n_rows, 3)), columns=["a", "b", "c"])
+    features = ["a", "b", "c"]
+    seqs = make_sequences(df, features, seq_len=30, stride=stride, pad=True)
+    ends = sequence_ends(n_rows, 30, stride, pad=True)
+    expected = np.concatenate([make_sequence(df.iloc[:end + 1], features, seq_len=30) for end in ends])
+
+    assert seqs.shape == expected.shape
+    np.testing.assert_array_equal(np.asarray(seqs), expected)
+    np.testing.assert_array_equal(seqs[-1], expected[-1])
+    np.testing.assert_array_equal(seqs[[0, len(ends) - 1]], expected[[0, -1]])
+    on_disk = make_sequences(df, features, seq_len=30, stride=stride, pad=True, path=tmp_path / "seq.npy", chunk=4)
+    np.testing.assert_array_equal(np.load(tmp_path / "seq.npy"), expected)
+    assert on_disk.shape == expected.shape
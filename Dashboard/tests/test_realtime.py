@@ -0,0 +1,291 @@
+# ============================================
+# Temps réel : téléchargement par tranches, fusion dans le tampon, features
+# ============================================
+
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("obspy")
+from obspy import Stream, Trace, UTCDateTime
+
+import real_time_update
+from fdsn_client import fetch_stations
+from preprocess import INCREMENTAL_FEATURES, append_features
+from real_time_update import (MinuteRingBuffer, StationFeatures, merge_delta, minute_means, realtime_features,
+                              station_starttimes, waveforms_to_minutes)
+
+
+@pytest.fixture
+def fdsn_server():
+    """Serveur dataselect local (100 Hz) ; les tranches dont le début est dans `failing` répondent 404."""
+    failing = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            q = parse_qs(urlparse(self.path).query)
+            t0, t1 = UTCDateTime(q["starttime"][0]), UTCDateTime(q["endtime"][0])
+            body = b""
+            if t0.timestamp in failing:
+                self.send_response(404)
+            else:
+                rng = np.random.default_rng(int(t0.timestamp))
+                tr = Trace(data=rng.normal(0, 500, int((t1 - t0) * 100)).astype(np.int32))
+                tr.stats.update({"network": "PF", "station": q["station"][0], "channel": "HHZ",
+                                 "sampling_rate": 100.0, "starttime": t0})
+                buf = io.BytesIO()
+                tr.write(buf, format="MSEED")
+                body = buf.getvalue()
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/fdsnws/dataselect/1/query", failing
+    server.shutdown()
+    server.server_close()
+
+
+def test_failed_chunk_is_fetched_again(fdsn_server):
+    url, failing = fdsn_server
+    buffer = MinuteRingBuffer()
+    end = UTCDateTime(2024, 1, 1, 1, 0)
+    starts = {"SNE": end - 1800}
+
+    # Tranche du milieu en échec, la suivante réussit
+    failing.add((end - 1200).timestamp)
+    stream, stats = fetch_stations(starts, end, url=url, chunk_s=600, retries=0)
+    assert [(station, t0) for station, t0, *_ in stats["failed"]] == [("SNE", end - 1200)]
+    merge_delta(waveforms_to_minutes(stream), starts, buffer, stats["failed"])
+    assert buffer.last_end["SNE"] == end - 1200
+
+    # Actualisation suivante : la plage manquante est redemandée et réécrite
+    failing.clear()
+    later = end + 600
+    starts = station_starttimes(["SNE"], later, buffer)
+    assert starts["SNE"] <= end - 1200
+    stream, stats = fetch_stations(starts, later, url=url, chunk_s=600, retries=0)
+    assert not stats["failed"]
+    merge_delta(waveforms_to_minutes(stream), starts, buffer, stats["failed"])
+
+    df = buffer.to_frame(later)
+    expected = pd.date_range((end - 1800).datetime, (later - 60).datetime, freq="1min")
+    assert set(expected) <= set(df["time_min"])
+    refetched = df[(df["time_min"] >= (end - 1200).datetime) & (df["time_min"] < (end - 600).datetime)]
+    assert (refetched["amplitude_mean"] > 1).all()  # plus les zéros de bouchage du trou
+
+
+def _resampled(data: np.ndarray, start: pd.Timestamp, dt: pd.Timedelta) -> pd.Series:
+    """Ancienne agrégation : index temporel complet puis resample('1min').mean()."""
+    return pd.Series(data, index=pd.date_range(start, periods=len(data), freq=dt)).resample("1min").mean()
+
+
+def test_minute_means_match_resample():
+    rng = np.random.default_rng(3)
+    cases = [
+        ("2024-01-01 00:00:00", "250ms", 240 * 5),        # minutes entières
+        ("2024-01-01 00:00:17.5", "250ms", 1000),        # première et dernière minutes partielles
+        ("2024-01-01 00:00:59.75", "250ms", 2),          # une ligne de chaque côté d'une frontière
+        ("2024-01-01 23:59:40.123456789", "10ms", 9001),  # pas qui ne divise pas les secondes du début
+        ("2024-01-01 00:00:30", "7ms", 30000),
+        ("2024-01-01 00:00:30", "250ms", 1),
+    ]
+    for start, dt, n in cases:
+        start, dt = pd.Timestamp(start), pd.Timedelta(dt)
+        data = np.abs(rng.normal(0, 100, n))
+        minutes, means = minute_means(data, start.value, dt.value)
+        expected = _resampled(data, start, dt)
+        assert list(minutes.astype("datetime64[m]").astype("datetime64[ns]")) == list(expected.index.to_numpy())
+        np.testing.assert_allclose(means, expected.to_numpy(), rtol=1e-12, err_msg=f"{start} {dt}")
+
+
+def _trace(station: str, start: UTCDateTime, n: int, seed: int) -> Trace:
+    tr = Trace(data=np.random.default_rng(seed).normal(0, 500, n).astype(np.int32))
+    tr.stats.update({"network": "PF", "station": station, "channel": "HHZ", "sampling_rate": 100.0,
+                     "starttime": start})
+    return tr
+
+
+def test_waveforms_to_minutes_matches_resample():
+    t0 = UTCDateTime(2024, 1, 1, 0, 0, 13.37)
+    stream = Stream([
+        _trace("SNE", t0, 100 * 600, 1),
+        _trace("BOR", t0 + 41, 100 * 300, 2),
+        _trace("BOR", t0 + 41 + 300 + 90.5, 100 * 200, 3),  # trou de 90,5 s, bouché par des zéros
+    ])
+    got = waveforms_to_minutes(stream.copy())
+
+    # Référence : même prétraitement obspy, puis resample pandas par trace
+    ref = stream.copy()
+    ref.merge(method=1, fill_value=0)
+    ref.detrend("linear")
+    ref.filter("bandpass", freqmin=1.0, freqmax=16.0, corners=4, zerophase=True)
+    frames = []
+    for tr in ref:
+        tr.decimate(25, no_filter=True)
+        series = _resampled(np.abs(tr.data).astype("float64") / 25.0, pd.Timestamp(tr.stats.starttime.datetime),
+                            pd.Timedelta(seconds=tr.stats.delta))
+        frames.append(pd.DataFrame({"time_min": series.index, "station": tr.stats.station,
+                                    "amplitude_mean": series.to_numpy()}))
+    expected = pd.concat(frames, ignore_index=True)
+
+    assert set(got["station"]) == {"SNE", "BOR"}
+    for station, g in expected.groupby("station"):
+        mine = got[got["station"] == station].reset_index(drop=True)
+        assert list(mine["time_min"]) == list(g["time_min"].astype("datetime64[ns]"))
+        np.testing.assert_allclose(mine["amplitude_mean"], g["amplitude_mean"], rtol=1e-12)
+
+
+def _minutes(stations, start: UTCDateTime, n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start.datetime, periods=n, freq="1min")
+    return pd.DataFrame({
+        "time_min": np.tile(times, len(stations)),
+        "station": np.repeat(stations, n),
+        "amplitude_mean": np.abs(rng.normal(100, 30, n * len(stations))),
+    })
+
+
+def _from_scratch(buffer: MinuteRingBuffer, now: UTCDateTime) -> dict:
+    df = buffer.to_frame(now)
+    return {station: append_features(g.iloc[:0], g.reset_index(drop=True), {})
+            for station, g in df.groupby("station")}
+
+
+def _assert_same(actual: pd.DataFrame, expected: dict, skip: int = 0, rtol: float = 0) -> None:
+    for station, ref in expected.items():
+        got = actual[actual["station"] == station].reset_index(drop=True)
+        assert list(got["time_min"]) == list(ref["time_min"])
+        for col in INCREMENTAL_FEATURES:
+            np.testing.assert_allclose(got[col].to_numpy()[skip:], ref[col].to_numpy()[skip:], rtol=rtol)
+
+
+def test_incremental_features_match_full_recompute():
+    buffer, features = MinuteRingBuffer(seconds=3 * 3600), StationFeatures()
+    stations = ["SNE", "BOR"]
+    start = UTCDateTime(2024, 1, 1)
+
+    # Actualisations de 7 minutes ; la dernière minute de chaque delta reste provisoire
+    for step in range(6):
+        t0 = start + step * 7 * 60
+        merge_delta(_minutes(stations, t0, 8, step), {s: t0 for s in stations}, buffer)
+        now = t0 + 8 * 60
+        _assert_same(features.update(buffer, now), _from_scratch(buffer, now))
+
+    # Minute déjà traitée réécrite (trou comblé) : la station est recalculée
+    patch = _minutes(["SNE"], start + 600, 1, 99)
+    buffer.merge(patch)
+    _assert_same(features.update(buffer, now), _from_scratch(buffer, now))
+
+    # Au-delà de la fenêtre du tampon : les plus vieilles lignes sortent de l'état
+    for step in range(6, 40):
+        t0 = start + step * 7 * 60
+        merge_delta(_minutes(stations, t0, 8, step), {s: t0 for s in stations}, buffer)
+    now = t0 + 8 * 60
+    # Les 60 premières lignes (Kurtosis_env : fenêtres 20 + 20 + 15) dépendent de l'historique sorti de la fenêtre ; au-delà,
+    # seules les compensations des sommes glissantes diffèrent (dernier bit)
+    _assert_same(features.update(buffer, now), _from_scratch(buffer, now), skip=60, rtol=1e-12)
+
+    out = realtime_features(now, ["SNE"], buffer, features)
+    assert set(out["station"]) == {"SNE"}
+    assert out["RSAM"].notna().all()
+
+
+def test_realtime_features_keep_baseline_columns():
+    buffer, features = MinuteRingBuffer(), StationFeatures()
+    start = UTCDateTime(2024, 1, 1)
+    merge_delta(_minutes(["SNE", "BOR"], start, 120, 0), {"SNE": start, "BOR": start}, buffer)
+    now = start + 120 * 60
+    out = realtime_features(now, None, buffer, features)
+
+    # Ancien calcul : RSAM = moyenne glissante (10, min 3) × 60 par station, trou de tête bouché par bfill
+    df = buffer.to_frame(now).sort_values("time_min", kind="stable")
+    rsam = df.groupby("station")["amplitude_mean"].transform(lambda x: x.rolling(10, min_periods=3).mean())
+    expected = (rsam * 60).bfill().reset_index(drop=True)
+
+    assert list(out.columns) == ["time_min", "station", "amplitude_mean", "RSAM", "SE_env", "Kurt_env"]
+    assert list(out["time_min"]) == list(df["time_min"]) and list(out["station"]) == list(df["station"])
+    np.testing.assert_allclose(out["RSAM"], expected, rtol=1e-12)
+    assert (out["SE_env"] == 0.1).all() and (out["Kurt_env"] == 3.0).all()
+
+
+# --------------------------------------------
+# Worker de fond
+# --------------------------------------------
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    """fetch_realtime_delta remplacé : 20 min de 100 Hz par station, bloquant tant que `gate` est fermé."""
+    gate, calls = threading.Event(), []
+    gate.set()
+    failing = {"error": None}
+
+    def fetch(stations, endtime, url=None, buffer=None):
+        calls.append(list(stations))
+        gate.wait(10)
+        if failing["error"] is not None:
+            raise failing["error"]
+        stream = Stream([_trace(station, endtime - 1200, 100 * 1200, k) for k, station in enumerate(stations)])
+        return {"stream": stream, "starts": {station: endtime - 1200 for station in stations},
+                "stats": {"bytes": 0, "failed": []}}
+
+    monkeypatch.setattr(real_time_update, "fetch_realtime_delta", fetch)
+    real_time_update.realtime_buffer.clear()
+    real_time_update.station_features.clear()
+    yield gate, calls, failing
+    gate.set()
+    real_time_update.realtime_buffer.clear()
+    real_time_update.station_features.clear()
+
+
+def _wait(job, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished, job.message
+    return job
+
+
+def test_worker_lifecycle(fake_fetch):
+    gate, calls, failing = fake_fetch
+    worker = real_time_update.get_worker()
+    assert worker.is_alive() and worker.daemon
+    assert real_time_update.get_worker() is worker  # un seul worker par processus
+
+    # Job en cours : une demande identique réutilise le même job
+    gate.clear()
+    job = worker.submit(["SNE", "BOR"])
+    assert worker.submit(["SNE", "BOR"]) is job and worker.get(job.id) is job
+    gate.set()
+    _wait(job)
+    assert job.status == "done" and job.progress == 100 and job.error is None
+    assert set(job.df["station"]) == {"SNE", "BOR"} and len(job.df) >= 2 * 19
+    assert job.risk is not None and calls == [["SNE", "BOR"]]
+
+    # Échec du téléchargement : le job passe en erreur, le worker continue
+    failing["error"] = RuntimeError("Échec du téléchargement : HTTP 503")
+    failed = _wait(worker.submit(["SNE"]))
+    assert failed.status == "error" and failed.error == "Échec du téléchargement" and failed.df is None
+
+    # Erreur de traitement (aucune donnée pour la station) : message propagé au job
+    failing["error"] = None
+    empty = _wait(worker.submit([]))
+    assert empty.status == "error" and empty.error.startswith("Erreur traitement")
+
+    # Un job terminé n'est pas réutilisé : une nouvelle demande repart
+    again = _wait(worker.submit(["SNE", "BOR"]))
+    assert again.id != job.id and again.status == "done"
+    assert real_time_update.get_worker() is worker and worker.is_alive()
@@ -0,0 +1,51 @@
+# ============================================
+# rolling.py : résultats identiques aux fenêtres pandas
+# ============================================
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling import RollingMean, RollingQuantiles, rolling_quantiles
+
+
+@pytest.fixture
+def series():
+    x = np.random.default_rng(0).normal(100, 30, 5000)
+    x[::37] = np.nan
+    return x
+
+
+@pytest.mark.parametrize("window", [5, 20])  # réseau de comparaisons / np.sort
+@pytest.mark.parametrize("interpolation", ["linear", "midpoint"])
+def test_rolling_quantiles_match_pandas(series, window, interpolation):
+    qs = [0.1, 0.5, 0.9]
+    out = rolling_quantiles(series, window, qs, min_periods=3, interpolation=interpolation)
+    s = pd.Series(series)
+    for q, o in zip(qs, out):
+        expected = s.rolling(window, min_periods=3).quantile(q, interpolation=interpolation).to_numpy()
+        np.testing.assert_array_equal(o, expected)
+
+
+@pytest.mark.parametrize("window", [5, 20])
+def test_grouped_columns_do_not_mix_stations(series, window):
+    groups = np.repeat([0, 1, 2], [1000, 2500, 1500])
+    values = np.column_stack([series, series[::-1]])
+    out = rolling_quantiles(values, window, [0.9], min_periods=2, center=True, groups=groups)
+    expected = (pd.DataFrame(values).groupby(groups).rolling(window, min_periods=2, center=True)
+                .quantile(0.9).to_numpy())
+    np.testing.assert_array_equal(out[0], expected)
+
+
+def test_streaming_quantiles_match_pandas(series):
+    rq = RollingQuantiles(20, [0.1, 0.9], min_periods=5)
+    out = np.array([rq.update(v) for v in series])
+    s = pd.Series(series).rolling(20, min_periods=5)
+    np.testing.assert_array_equal(out[:, 0], s.quantile(0.1).to_numpy())
+    np.testing.assert_array_equal(out[:, 1], s.quantile(0.9).to_numpy())
+
+
+def test_streaming_mean_matches_pandas(series):
+    rm = RollingMean(10, 3)
+    out = np.array([rm.update(v) for v in series])
+    np.testing.assert_array_equal(out, pd.Series(series).rolling(10, min_periods=3).mean().to_numpy())